@@ -0,0 +1,94 @@
+#------------------------------------------------------------------------------
+# Curry Company - Benchmark da limpeza dos dados
+#
+# Uso ( a partir da raiz do projeto ):
+#     python -m bench.clean_data train.csv --rows 1000000
+#------------------------------------------------------------------------------
+
+# Libraries
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from curry.data import clean_data, read_orders
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+def clean_data_linha_a_linha( df ):
+    """ Versão original de clean_data ( apply por linha ), mantida só como
+        referência de desempenho e de resultado.
+    """
+    linhas = ( (df['Delivery_person_Age']!='NaN ') & 
+            (df['Delivery_person_Ratings']!='NaN ') & 
+            (df['Road_traffic_density']!='NaN ') &
+            (df['City']!='NaN ') &
+            (df['multiple_deliveries']!='NaN ') &
+            (df['Weatherconditions']!='conditions NaN')
+            )
+    df1 = df.loc[linhas, :].copy()
+
+    df1.loc[:, 'ID'] = df1.loc[:, 'ID'].str.strip()
+    df1.loc[:, 'Road_traffic_density'] = df1.loc[:, 'Road_traffic_density'].str.strip()
+    df1.loc[:, 'Type_of_order'] = df1.loc[:, 'Type_of_order'].str.strip()
+    df1.loc[:, 'Type_of_vehicle'] = df1.loc[:, 'Type_of_vehicle'].str.strip()
+    df1.loc[:, 'City'] = df1.loc[:, 'City'].str.strip()
+
+    df1['Delivery_person_Age'] = df1['Delivery_person_Age'].astype(int)
+    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype(int)
+    df1['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype(float)
+
+    df1['Time_taken(min)'] = df1['Time_taken(min)'].apply( lambda x: x.split( '(min) ' )[1] )
+    df1['Time_taken(min)'] = df1['Time_taken(min)'].astype(int)
+
+    df1['Order_Date'] = pd.to_datetime( df1['Order_Date'], format='%d-%m-%Y' )
+
+    return df1
+
+def amplia_csv( origem, destino, rows ):
+    """ Repete as linhas do CSV de origem até atingir 'rows' linhas. """
+    df = pd.read_csv( origem, dtype=str, keep_default_na=False )
+    repeticoes = int( np.ceil( rows / len( df ) ) )
+    df = pd.concat( [df] * repeticoes, ignore_index=True ).head( rows )
+    df.to_csv( destino, index=False )
+
+def cronometra( func, *args ):
+    inicio = time.perf_counter()
+    resultado = func( *args )
+    return resultado, time.perf_counter() - inicio
+
+def main():
+    parser = argparse.ArgumentParser( description='Benchmark de clean_data' )
+    parser.add_argument( 'csv', help='CSV de pedidos ( formato train.csv )' )
+    parser.add_argument( '--rows', type=int, default=1_000_000 )
+    parser.add_argument( '--sem-original', action='store_true',
+                         help='não executa a versão linha a linha' )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join( pasta, 'orders.csv' )
+        amplia_csv( args.csv, caminho, args.rows )
+
+        print( '{:>24} {:>10} {:>10} {:>14}'.format( 'etapa', 'leitura s', 'limpeza s', 'linhas/s' ) )
+
+        df, leitura = cronometra( read_orders, caminho )
+        df1, limpeza = cronometra( clean_data, df )
+        print( '{:>24} {:>10.2f} {:>10.2f} {:>14,.0f}'.format(
+               'vetorizada', leitura, limpeza, args.rows / ( leitura + limpeza ) ) )
+
+        if not args.sem_original:
+            df, leitura = cronometra( pd.read_csv, caminho )
+            ref, limpeza = cronometra( clean_data_linha_a_linha, df )
+            print( '{:>24} {:>10.2f} {:>10.2f} {:>14,.0f}'.format(
+                   'linha a linha', leitura, limpeza, args.rows / ( leitura + limpeza ) ) )
+            # As duas versões precisam produzir o mesmo resultado
+            pd.testing.assert_frame_equal( df1, ref )
+            print( 'resultados idênticos' )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+#------------------------------------------------------------------------------
+# Curry Company - Benchmark das funções do Dashboard, sem o Streamlit
+#
+# Uso ( a partir da raiz do projeto ):
+#     python -m bench.dashboard --scales 10000 100000 1000000
+#     CURRY_BACKEND=sqlite python -m bench.dashboard --scales 100000
+#------------------------------------------------------------------------------
+
+# Libraries
+import argparse
+import ast
+import datetime
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+
+from bench.generate import generate
+from curry.cube import filtered_cube
+from curry.data import clean_data, ingest, load_data, read_orders
+from curry.index import filtered_rows
+from curry.metrics import ( CUBO_CLIMA, CUBO_ENTREGADORES, CUBO_PEDIDOS, CUBO_RESTAURANTES, ratings_by,
+                            ratings_by_driver, time_by_city_order )
+from curry.ranking import rank_drivers
+from curry.store import build_store, use_store
+
+#------------------------------------------------------------------------------
+# CONSTANTES
+#------------------------------------------------------------------------------
+
+RAIZ = os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+
+# Todas as páginas ( ver bench/imports.py ); o benchmark das funções usa só as
+# que têm funções sem decorador ( ver casos )
+PAGINAS = { 'empresa' : os.path.join( RAIZ, 'pages', '1_Visao_Empresa.py' ),
+            'entregadores' : os.path.join( RAIZ, 'pages', '2_Visao_Entregadores.py' ),
+            'restaurantes' : os.path.join( RAIZ, 'pages', '3_Visao_Restaurantes.py' ) }
+
+# Filtros padrão da barra lateral das páginas
+DATA_LIMITE = datetime.datetime( 2022, 4, 13 )
+TRANSITO = ( 'Low', 'Medium' )
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+def page_functions( path ):
+    """ Carrega só as funções de uma página ( e as constantes simples e os
+        módulos adiados que elas usam ), sem executar o layout do Streamlit.
+        As funções memorizadas das abas ( com decorador ) ficam de fora.
+
+        Input: caminho do arquivo da página
+        Output: dicionário nome -> objeto
+    """
+    with open( path, encoding='utf-8' ) as arquivo:
+        arvore = ast.parse( arquivo.read(), path )
+    corpo = []
+    for no in arvore.body:
+        if isinstance( no, ( ast.Import, ast.ImportFrom ) ):
+            corpo.append( no )
+        elif isinstance( no, ast.FunctionDef ) and not no.decorator_list:
+            corpo.append( no )
+        elif isinstance( no, ast.Assign ) and isinstance( no.value, ast.Constant ):
+            corpo.append( no )
+        elif isinstance( no, ast.Assign ) and getattr( getattr( no.value, 'func', None ), 'id', None ) == 'lazy_import':
+            # px = lazy_import( 'plotly.express' ) ( ver curry/lazy.py )
+            corpo.append( no )
+    namespace = {}
+    exec( compile( ast.Module( corpo, type_ignores=[] ), path, 'exec' ), namespace )
+    return namespace
+
+def mede( func, *args ):
+    """ Executa func( *args ) medindo o tempo de parede e o pico de memória
+        alocada durante a chamada ( tracemalloc ).
+
+        Output: ( resultado, segundos, pico em MB )
+    """
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = func( *args )
+    segundos = time.perf_counter() - inicio
+    pico = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return resultado, segundos, pico
+
+def casos( csv ):
+    """ Funções medidas, com as mesmas entradas que as páginas usam com os
+        filtros padrão. As entradas ( cubos, linhas filtradas ) são montadas
+        na primeira chamada de cada etapa, que também entra na medição.
+
+        Output: lista de ( nome, função sem argumentos )
+    """
+    p1 = page_functions( PAGINAS['empresa'] )
+    p3 = page_functions( PAGINAS['restaurantes'] )
+
+    def cubo( dimensoes, medidas ):
+        # Mesmos cubos das páginas ( ver curry/metrics.py )
+        return filtered_cube( dimensoes, medidas, DATA_LIMITE, TRANSITO, csv )
+
+    def linhas( colunas ):
+        return filtered_rows( colunas, DATA_LIMITE, TRANSITO, csv )
+
+    empresa = lambda: cubo( *CUBO_PEDIDOS )
+    entregadores = lambda: cubo( *CUBO_ENTREGADORES )
+    clima = lambda: cubo( *CUBO_CLIMA )
+    restaurantes = lambda: cubo( *CUBO_RESTAURANTES )
+    semanal = lambda: linhas( ['ID','day','week','Delivery_person_ID'] )
+
+    return [
+        ( 'read_orders', lambda: read_orders( csv ) ),
+        ( 'clean_data', lambda: clean_data( read_orders( csv ) ) ),
+        ( 'ingest', lambda: ingest( csv ) ),
+        ( 'load_data', lambda: load_data( csv ) ),
+        # Com CURRY_BACKEND=sqlite os cubos e as linhas vêm da base ( ver curry/store.py )
+        *( [ ( 'build_store', lambda: build_store( csv ) ) ] if use_store() else [] ),
+        ( 'cubo empresa', empresa ),
+        ( 'cubo entregadores', entregadores ),
+        ( 'cubo clima', clima ),
+        ( 'cubo restaurantes', restaurantes ),
+        ( 'order_metric', lambda: p1['order_metric']( empresa() ) ),
+        ( 'traffic_order_share', lambda: p1['traffic_order_share']( empresa() ) ),
+        ( 'traffic_order_city', lambda: p1['traffic_order_city']( empresa() ) ),
+        ( 'order_by_week', lambda: p1['order_by_week']( semanal() ) ),
+        ( 'order_share_by_week', lambda: p1['order_share_by_week']( semanal() ) ),
+        ( 'order_trend', lambda: p1['order_trend']( semanal() ) ),
+        ( 'rank_drivers', lambda: rank_drivers( entregadores() ) ),
+        ( 'ratings_by_driver', lambda: ratings_by_driver( entregadores() ) ),
+        ( 'ratings_by', lambda: ratings_by( clima(), 'Weatherconditions' ) ),
+        ( 'distance', lambda: p3['distance']( restaurantes() ) ),
+        ( 'time_by_city_order', lambda: time_by_city_order( restaurantes() ) ),
+        ( 'avg_std_time_graph', lambda: p3['avg_std_time_graph']( restaurantes() ) ),
+        ( 'avg_std_time_on_traffic', lambda: p3['avg_std_time_on_traffic']( restaurantes() ) ),
+    ]
+
+def main():
+    parser = argparse.ArgumentParser( description='Benchmark das funções do Dashboard' )
+    parser.add_argument( '--scales', type=int, nargs='+', default=[10000, 100000, 1000000],
+                         help='quantidades de linhas ( até 10M )' )
+    parser.add_argument( '--seed', type=int, default=0 )
+    args = parser.parse_args()
+
+    raiz = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        # Sempre o mesmo caminho: cada escala é uma nova versão do arquivo e
+        # os caches da anterior são descartados ( ver curry/data.py )
+        csv = os.path.join( pasta, 'train.csv' )
+        os.chdir( pasta )
+        try:
+            # Aquecimento: a primeira figura do plotly carrega templates e
+            # validadores, custo que não é da função medida
+            generate( csv, 1000, args.seed )
+            for _, func in casos( csv ):
+                func()
+
+            for linhas in args.scales:
+                generate( csv, linhas, args.seed )
+                print( '\n# {:,} linhas'.format( linhas ) )
+                print( '{:>26} {:>10} {:>12}'.format( 'função', 'tempo s', 'pico MB' ) )
+                for nome, func in casos( csv ):
+                    _, segundos, pico = mede( func )
+                    print( '{:>26} {:>10.3f} {:>12.1f}'.format( nome, segundos, pico ) )
+                maximo = resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss / 1024
+                print( '{:>26} {:>23.1f}'.format( 'pico do processo ( RSS )', maximo ) )
+        finally:
+            os.chdir( raiz )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#------------------------------------------------------------------------------
+# Curry Company - Gerador de pedidos sintéticos ( formato train.csv )
+#
+# Uso ( a partir da raiz do projeto ):
+#     python -m bench.generate orders.csv --rows 1000000
+#------------------------------------------------------------------------------
+
+# Libraries
+import argparse
+
+import numpy as np
+import pandas as pd
+
+#------------------------------------------------------------------------------
+# CONSTANTES
+#------------------------------------------------------------------------------
+
+# Colunas do train.csv, na ordem do arquivo original
+COLUNAS = ['ID','Delivery_person_ID','Delivery_person_Age','Delivery_person_Ratings',
+           'Restaurant_latitude','Restaurant_longitude','Delivery_location_latitude',
+           'Delivery_location_longitude','Order_Date','Time_Orderd','Time_Order_picked',
+           'Weatherconditions','Road_traffic_density','Vehicle_condition','Type_of_order',
+           'Type_of_vehicle','multiple_deliveries','Festival','City','Time_taken(min)']
+
+# Prefixos das cidades dos entregadores ( 'INDORES13DEL02 ' )
+PREFIXOS = ['INDO','BANG','COIMB','CHEN','HYD','RANCHI','MYS','DEH','KOC','PUNE',
+            'LUDH','KNP','MUM','KOL','JAP','SUR','GOA','AURG','AGR','VAD','ALH','BHP']
+
+CLIMAS = ['Sunny','Stormy','Sandstorms','Cloudy','Fog','Windy']
+TRANSITO = ['Low ','Medium ','High ','Jam ']
+PEDIDOS = ['Snack ','Meal ','Drinks ','Buffet ']
+VEICULOS = ['motorcycle ','scooter ','electric_scooter ','bicycle ']
+CIDADES = ['Metropolitian ','Urban ','Semi-Urban ']
+
+# Fração de linhas com cada sentinela de dado faltante
+TAXA_FALTANTE = 0.01
+
+CHUNK_ROWS = 500000
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+def _faltante( rng, valores, sentinela='NaN ', taxa=TAXA_FALTANTE ):
+    valores = valores.astype( object )
+    valores[rng.random( len( valores ) ) < taxa] = sentinela
+    return valores
+
+def _bloco( rng, inicio, n, datas ):
+    # Um bloco de n pedidos, com os mesmos textos sujos do arquivo original:
+    # espaços no fim, 'NaN ', 'conditions NaN' e '(min) 24'
+    entregadores = np.array( [ '{}RES{:02d}DEL{:02d} '.format( p, r, d )
+                               for p in PREFIXOS for r in range( 1, 21 ) for d in range( 1, 4 ) ] )
+    restaurante_lat = np.round( rng.uniform( 9, 31, n ), 6 )
+    restaurante_lng = np.round( rng.uniform( 72, 89, n ), 6 )
+    pedido = rng.integers( 8, 23, n ) * 60 + rng.choice( [0,15,30,45], n )
+    coleta = pedido + rng.choice( [5,10,15], n )
+    return pd.DataFrame( {
+        'ID' : [ '0x{:04x} '.format( i ) for i in range( inicio, inicio + n ) ],
+        'Delivery_person_ID' : rng.choice( entregadores, n ),
+        'Delivery_person_Age' : _faltante( rng, rng.integers( 20, 40, n ).astype( str ) ),
+        'Delivery_person_Ratings' : _faltante( rng, np.round( rng.uniform( 2.5, 5, n ), 1 ).astype( str ) ),
+        'Restaurant_latitude' : restaurante_lat,
+        'Restaurant_longitude' : restaurante_lng,
+        'Delivery_location_latitude' : np.round( restaurante_lat + rng.uniform( -0.15, 0.15, n ), 6 ),
+        'Delivery_location_longitude' : np.round( restaurante_lng + rng.uniform( -0.15, 0.15, n ), 6 ),
+        'Order_Date' : rng.choice( datas, n ),
+        'Time_Orderd' : _faltante( rng, np.char.add( np.char.zfill( ( pedido // 60 ).astype( str ), 2 ),
+                                   np.char.add( ':', np.char.add( np.char.zfill( ( pedido % 60 ).astype( str ), 2 ), ':00' ) ) ) ),
+        'Time_Order_picked' : np.char.add( np.char.zfill( ( coleta // 60 % 24 ).astype( str ), 2 ),
+                              np.char.add( ':', np.char.add( np.char.zfill( ( coleta % 60 ).astype( str ), 2 ), ':00' ) ) ),
+        'Weatherconditions' : _faltante( rng, np.char.add( 'conditions ', rng.choice( CLIMAS, n ) ), 'conditions NaN' ),
+        'Road_traffic_density' : _faltante( rng, rng.choice( TRANSITO, n, p=[.34,.25,.1,.31] ) ),
+        'Vehicle_condition' : rng.integers( 0, 4, n ),
+        'Type_of_order' : rng.choice( PEDIDOS, n ),
+        'Type_of_vehicle' : rng.choice( VEICULOS, n, p=[.58,.33,.08,.01] ),
+        'multiple_deliveries' : _faltante( rng, rng.choice( [0,1,2,3], n, p=[.31,.62,.05,.02] ).astype( str ) ),
+        'Festival' : _faltante( rng, rng.choice( ['No ','Yes '], n, p=[.98,.02] ) ),
+        'City' : _faltante( rng, rng.choice( CIDADES, n, p=[.75,.22,.03] ) ),
+        'Time_taken(min)' : np.char.add( '(min) ', rng.integers( 10, 55, n ).astype( str ) ),
+    }, columns=COLUNAS )
+
+def generate( path, rows, seed=0, start='2022-02-11', days=55, chunk_rows=CHUNK_ROWS ):
+    """ Grava 'rows' pedidos sintéticos no formato do train.csv, em blocos de
+        'chunk_rows' linhas ( a memória não cresce com o tamanho do arquivo ).
+        O mesmo seed e os mesmos parâmetros geram sempre o mesmo arquivo.
+
+        Input: caminho do CSV, quantidade de linhas, seed, primeira data,
+               quantidade de dias do histórico, linhas por bloco
+        Output: caminho do CSV
+    """
+    datas = pd.date_range( start, periods=days ).strftime( '%d-%m-%Y' ).to_numpy()
+    with open( path, 'w', newline='' ) as arquivo:
+        for numero, inicio in enumerate( range( 0, rows, chunk_rows ) ):
+            rng = np.random.default_rng( [seed, numero] )
+            bloco = _bloco( rng, inicio, min( chunk_rows, rows - inicio ), datas )
+            bloco.to_csv( arquivo, index=False, header=( inicio == 0 ) )
+    return path
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Gera pedidos sintéticos no formato train.csv' )
+    parser.add_argument( 'csv' )
+    parser.add_argument( '--rows', type=int, default=45593 )
+    parser.add_argument( '--seed', type=int, default=0 )
+    parser.add_argument( '--start', default='2022-02-11', help='primeira data ( AAAA-MM-DD )' )
+    parser.add_argument( '--days', type=int, default=55 )
+    args = parser.parse_args()
+    print( generate( args.csv, args.rows, args.seed, args.start, args.days ) )
@@ -0,0 +1,91 @@
+#------------------------------------------------------------------------------
+# Curry Company - Tempo de importação de cada página ( partida a frio )
+#
+# Uso ( a partir da raiz do projeto ):
+#     python -m bench.imports
+#     python -m bench.imports --top 15
+#------------------------------------------------------------------------------
+
+# Libraries
+import argparse
+import ast
+import os
+import subprocess
+import sys
+
+from bench.dashboard import PAGINAS, RAIZ
+
+#------------------------------------------------------------------------------
+# CONSTANTES
+#------------------------------------------------------------------------------
+
+# Quantas vezes cada medição é repetida ( fica a menor )
+REPETICOES = 3
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+def page_imports( path ):
+    """ Importações de uma página: as do topo do arquivo ( pagas ao abrir a
+        página ) e os módulos de lazy_import ( pagos só quando o componente
+        que os usa é desenhado, ver curry/lazy.py ).
+
+        Input: caminho do arquivo da página
+        Output: ( código das importações do topo, lista de módulos adiados )
+    """
+    with open( path, encoding='utf-8' ) as arquivo:
+        arvore = ast.parse( arquivo.read(), path )
+    imediatas = [ ast.unparse( no ) for no in arvore.body if isinstance( no, ( ast.Import, ast.ImportFrom ) ) ]
+    adiados = [ no.args[0].value for no in ast.walk( arvore )
+                if isinstance( no, ast.Call ) and getattr( no.func, 'id', None ) == 'lazy_import'
+                and no.args and isinstance( no.args[0], ast.Constant ) ]
+    return '\n'.join( imediatas ), adiados
+
+def importtime( codigo ):
+    """ Executa 'codigo' num interpretador novo com -X importtime.
+
+        Output: ( segundos totais, {pacote de topo: segundos} )
+    """
+    processo = subprocess.run( [sys.executable, '-X', 'importtime', '-c', codigo],
+                               cwd=RAIZ, capture_output=True, text=True,
+                               env=dict( os.environ, PYTHONPATH=RAIZ ) )
+    if processo.returncode != 0:
+        raise RuntimeError( processo.stderr.strip().splitlines()[-1] )
+    pacotes = {}
+    for linha in processo.stderr.splitlines():
+        if not linha.startswith( 'import time:' ) or 'cumulative' in linha:
+            continue
+        _, cumulativo, nome = linha.split( '|' )
+        # Só os módulos importados diretamente ( sem recuo ): o cumulativo
+        # deles já inclui as dependências
+        if not nome.startswith( '  ' ):
+            pacote = nome.strip().split( '.' )[0]
+            pacotes[pacote] = pacotes.get( pacote, 0 ) + int( cumulativo ) / 1e6
+    return sum( pacotes.values() ), pacotes
+
+def melhor( codigo, repeticoes=REPETICOES ):
+    # Menor total entre as repetições ( menos ruído do disco / cache do SO )
+    return min( ( importtime( codigo ) for _ in range( repeticoes ) ), key=lambda r: r[0] )
+
+def main():
+    parser = argparse.ArgumentParser( description='Tempo de importação de cada página' )
+    parser.add_argument( '--top', type=int, default=8, help='pacotes mais lentos listados por página' )
+    parser.add_argument( '--repeat', type=int, default=REPETICOES )
+    args = parser.parse_args()
+
+    for nome, path in PAGINAS.items():
+        codigo, adiados = page_imports( path )
+        total, pacotes = melhor( codigo, args.repeat )
+        print( '\n{}: {:.3f} s ao abrir a página'.format( nome, total ) )
+        for pacote, segundos in sorted( pacotes.items(), key=lambda p: -p[1] )[:args.top]:
+            print( '    {:<28} {:8.3f} s'.format( pacote, segundos ) )
+        # Custo de cada módulo adiado, além do que a página já importou
+        for modulo in adiados:
+            raiz = modulo.split( '.' )[0]
+            _, com_modulo = melhor( codigo + '\nimport ' + modulo, args.repeat )
+            segundos = com_modulo.get( raiz, 0 ) - pacotes.get( raiz, 0 )
+            print( '    adiado: {:<20} {:8.3f} s no primeiro uso'.format( modulo, segundos ) )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+#------------------------------------------------------------------------------
+# Curry Company - Memória por linha do Dataframe limpo, antes e depois do
+# esquema compacto ( ver curry/schema.py )
+#
+# Uso ( a partir da raiz do projeto ):
+#     python -m bench.memory train.csv
+#------------------------------------------------------------------------------
+
+# Libraries
+import argparse
+import time
+
+import pandas as pd
+
+from curry.data import clean_data, derive_columns, read_orders
+from curry.schema import compact, memory_report
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+def cronometra_groupby( df1, repeticoes=5 ):
+    """ Melhor tempo de um agrupamento por cidade e trânsito ( o das páginas ). """
+    melhor = float( 'inf' )
+    for _ in range( repeticoes ):
+        inicio = time.perf_counter()
+        df1.groupby( ['City','Road_traffic_density'], observed=True )['Time_taken(min)'].agg( ['mean','std'] )
+        melhor = min( melhor, time.perf_counter() - inicio )
+    return melhor
+
+def main():
+    parser = argparse.ArgumentParser( description='Memória por linha, antes e depois de compact' )
+    parser.add_argument( 'csv', nargs='?', default='train.csv' )
+    args = parser.parse_args()
+
+    antes = derive_columns( clean_data( read_orders( args.csv ) ) )
+    depois = compact( antes.copy() )
+    with pd.option_context( 'display.width', 200, 'display.max_columns', 10 ):
+        print( memory_report( antes, depois ).round( 2 ).to_string() )
+    print( '\n{:,} linhas'.format( len( antes ) ) )
+    print( 'groupby City x trânsito: {:.4f} s -> {:.4f} s'.format(
+           cronometra_groupby( antes ), cronometra_groupby( depois ) ) )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,8 @@
+#------------------------------------------------------------------------------
+# Projeto de Dashboard "Curry Company" - módulos compartilhados pelas páginas
+#------------------------------------------------------------------------------
+""" Pacote com a camada de dados comum às páginas do Dashboard. Sem
+    importações aqui: cada página importa só os módulos que usa ( ex.:
+    from curry.data import load_data ), e python -m curry.data não carrega
+    o módulo duas vezes.
+"""
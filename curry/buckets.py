@@ -0,0 +1,113 @@
+#------------------------------------------------------------------------------
+# Curry Company - Chaves inteiras de dia / semana / mês e janelas móveis
+#------------------------------------------------------------------------------
+
+# Libraries
+import numpy as np
+import pandas as pd
+
+#------------------------------------------------------------------------------
+# CONSTANTES
+#------------------------------------------------------------------------------
+
+# Colunas criadas na ingestão ( ver curry/data.py )
+COLUNAS_BUCKETS = ['day','week','month']
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+def add_buckets( df1 ):
+    """ Acrescenta chaves inteiras de calendário calculadas de Order_Date,
+        sem formatar texto linha a linha:
+          - day: dias desde 1970-01-01
+          - week: 'day' do domingo que começa a semana ( a mesma semana do
+            strftime( '%U' ), mas contínua entre os anos: a semana de
+            29-12-2022 a 04-01-2023 é uma só )
+          - month: meses desde jan/1970
+
+        Input: Dataframe limpo
+        Output: o mesmo Dataframe, com as colunas de COLUNAS_BUCKETS
+    """
+    datas = df1['Order_Date'].to_numpy( dtype='datetime64[ns]' )
+    dia = datas.astype( 'datetime64[D]' ).astype( np.int64 )
+    # 01-01-1970 foi uma quinta-feira: ( dia + 4 ) % 7 é a distância ao domingo
+    df1['day'] = dia.astype( np.int32 )
+    df1['week'] = ( dia - ( dia + 4 ) % 7 ).astype( np.int32 )
+    df1['month'] = datas.astype( 'datetime64[M]' ).astype( np.int64 ).astype( np.int32 )
+    return df1
+
+def bucket_dates( chaves, unit='day' ):
+    """ Data de início de cada chave ( 'day' / 'week' / 'month' ). """
+    chaves = np.asarray( chaves, dtype=np.int64 )
+    if unit == 'month':
+        return pd.to_datetime( chaves.astype( 'datetime64[M]' ) )
+    return pd.to_datetime( chaves.astype( 'datetime64[D]' ) )
+
+def _serie_completa( chaves, passo ):
+    # Contagem por chave, incluindo as chaves sem pedidos entre a primeira e a última
+    if len( chaves ) == 0:
+        return np.array( [], dtype=np.int64 ), np.array( [], dtype=np.int64 )
+    inicio = chaves.min()
+    contagem = np.bincount( ( chaves - inicio ) // passo )
+    return inicio + passo * np.arange( len( contagem ) ), contagem
+
+def _soma_movel( valores, janela ):
+    acumulado = np.concatenate( [[0], np.cumsum( valores )] )
+    return acumulado[janela:] - acumulado[:-janela] if len( valores ) >= janela else np.array( [] )
+
+def _movel( valores, janela ):
+    # Soma dos últimos 'janela' valores; NaN enquanto a janela não está cheia
+    resultado = np.full( len( valores ), np.nan )
+    resultado[janela - 1:] = _soma_movel( valores, janela )
+    return resultado
+
+def rolling_orders( df1, window=7, unit='day' ):
+    """ Pedidos por dia ( ou semana ) e a soma móvel dos últimos 'window'
+        dias ( ou semanas ), com os períodos sem pedidos contados como zero.
+
+        Input: Dataframe com a coluna de 'unit', tamanho da janela, 'day' ou 'week'
+        Output: Dataframe com date, orders e orders_<window><d|w>
+    """
+    passo = 7 if unit == 'week' else 1
+    chaves, contagem = _serie_completa( df1[unit].to_numpy( dtype=np.int64 ), passo )
+    return pd.DataFrame( {
+        'date' : bucket_dates( chaves ),
+        'orders' : contagem,
+        'orders_{}{}'.format( window, unit[0] ) : _movel( contagem, window ),
+    } )
+
+def rolling_orders_per_driver( df1, window=28 ):
+    """ Pedidos por entregador ativo numa janela móvel de 'window' dias:
+        pedidos da janela / entregadores distintos com pedido na janela.
+
+        Input: Dataframe com day e Delivery_person_ID, janela em dias
+        Output: Dataframe com date, orders, drivers e order_by_deliver
+    """
+    dias, contagem = _serie_completa( df1['day'].to_numpy( dtype=np.int64 ), 1 )
+    if len( dias ) == 0:
+        return pd.DataFrame( columns=['date','orders','drivers','order_by_deliver'] )
+
+    # Cada entregador conta nos fins de janela cobertos por algum dia em que
+    # trabalhou: [dia, dia + window), cortado no próximo dia dele para não
+    # contar duas vezes. A soma acumulada das marcas dá os distintos por janela.
+    pares = ( pd.DataFrame( { 'd' : pd.factorize( df1['Delivery_person_ID'] )[0],
+                              'dia' : df1['day'].to_numpy( dtype=np.int64 ) - dias[0] } )
+                .drop_duplicates()
+                .sort_values( ['d','dia'] ) )
+    dia = pares['dia'].to_numpy()
+    proximo = np.where( pares['d'].to_numpy()[1:] == pares['d'].to_numpy()[:-1], dia[1:], np.iinfo( np.int64 ).max )
+    fim = np.minimum( dia + window, np.append( proximo, np.iinfo( np.int64 ).max ) )
+    marcas = np.bincount( dia, minlength=len( dias ) + window + 1 ).astype( np.int64 )
+    marcas -= np.bincount( np.minimum( fim, len( dias ) + window ), minlength=len( marcas ) )
+    entregadores = np.cumsum( marcas )[:len( dias )]
+
+    pedidos = _movel( contagem, window )
+    with np.errstate( divide='ignore', invalid='ignore' ):
+        por_entregador = pedidos / entregadores
+    return pd.DataFrame( {
+        'date' : bucket_dates( dias ),
+        'orders' : pedidos,
+        'drivers' : entregadores,
+        'order_by_deliver' : por_entregador,
+    } )
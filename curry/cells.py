@@ -0,0 +1,63 @@
+#------------------------------------------------------------------------------
+# Curry Company - Agregados por célula: cache incremental e filtro das células
+#------------------------------------------------------------------------------
+
+# Libraries
+from curry.data import file_key, load_data, snapshot_info
+from curry.instrument import stage
+from curry.parallel import map_partitions
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+def incremental_cache( cache, lock, build, merge, path, columns, *args, name='agregado' ):
+    """ Agregado por célula do dataset atual ( cubo, sketches, quantis... ),
+        calculado uma única vez por processo, versão do arquivo e 'args':
+          1. Procura no cache ( chave: versão do arquivo + args )
+          2. Se a versão atual só acrescentou linhas a uma versão cujo
+             agregado está no cache, agrega só as linhas novas e junta ao
+             anterior: merge( anterior, build( novas, *args ) )
+          3. Senão agrega tudo por partições de datas ( ver
+             curry/parallel.py ) e junta as partes: cada célula sai inteira
+             de uma partição, então o resultado é o mesmo do cálculo serial
+        Versões antigas do mesmo arquivo e dos mesmos args saem do cache.
+
+        Input: cache ( dicionário do módulo ) e o seu lock, build( df1,
+               *args ) ( função de módulo ), merge( *partes ), caminho do
+               CSV, colunas usadas, args ( hasheáveis ), nome da etapa
+               ( ver curry/instrument.py )
+        Output: o agregado
+    """
+    chave = file_key( path ) + args
+    with lock:
+        agregado = cache.get( chave )
+        if agregado is None:
+            df1 = load_data( path, columns=columns )
+
+            info = snapshot_info( path )
+            anterior = None
+            if info.get( 'previous_key' ):
+                anterior = cache.get( chave[:1] + tuple( info['previous_key'] ) + chave[3:] )
+            with stage( name ):
+                if anterior is None:
+                    partes = map_partitions( build, df1, 'Order_Date', *args )
+                    agregado = partes[0] if len( partes ) == 1 else merge( *partes )
+                else:
+                    novos = df1.loc[df1.index >= info['delta_start'], :]
+                    agregado = merge( anterior, build( novos, *args ) )
+
+            for antiga in [ k for k in cache if k[0] == chave[0] and k[3:] == chave[3:] ]:
+                del cache[antiga]
+            cache[chave] = agregado
+        return agregado
+
+def cell_mask( cells, date_limit, traffic_options ):
+    """ Filtros da barra lateral ( data limite exclusiva e trânsito ) sobre
+        as células de um agregado ( colunas Order_Date e
+        Road_traffic_density ).
+
+        Output: array booleano, uma posição por célula
+    """
+    return ( ( cells['Order_Date'] < date_limit ) &
+             ( cells['Road_traffic_density'].isin( traffic_options ) ) ).to_numpy()
@@ -0,0 +1,112 @@
+#------------------------------------------------------------------------------
+# Curry Company - Cache de figuras e redução do tamanho dos gráficos
+#------------------------------------------------------------------------------
+
+# Libraries
+import collections
+import functools
+import threading
+
+import numpy as np
+import plotly.graph_objects as go
+
+#------------------------------------------------------------------------------
+# CONSTANTES
+#------------------------------------------------------------------------------
+
+# Quantas chamadas ( função x estado dos filtros x versão do arquivo ) ficam em cache
+FIGURE_CACHE_ENTRIES = 64
+
+# Pontos por série enviados ao navegador ( ver downsample )
+MAX_PONTOS = 1500
+
+# A partir de quantos pontos um traço de linha / dispersão usa WebGL
+# ( o mesmo limite do render_mode='auto' do plotly express )
+WEBGL_PONTOS = 1000
+
+# Cache do processo: ( arquivo, função, argumentos ) -> resultado, em ordem de uso
+_FIGURAS = collections.OrderedDict()
+_LOCK = threading.Lock()
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+def figure_cache( func ):
+    """ Memoriza as figuras ( ou o que a função devolver ) por função e
+        argumentos, num cache LRU de FIGURE_CACHE_ENTRIES entradas comum a
+        todas as funções decoradas. Os argumentos devem ser hasheáveis: o
+        estado dos filtros ( data limite, tupla de trânsito ) e a versão do
+        arquivo ( curry.data.file_key ), para que um train.csv novo gere
+        figuras novas. Os objetos devolvidos são compartilhados entre sessões
+        e não devem ser alterados.
+    """
+    # O arquivo, e não o módulo: no Streamlit toda página roda como __main__
+    nome = ( func.__code__.co_filename, func.__qualname__ )
+
+    @functools.wraps( func )
+    def memorizada( *args ):
+        chave = nome + args
+        with _LOCK:
+            if chave in _FIGURAS:
+                _FIGURAS.move_to_end( chave )
+                return _FIGURAS[chave]
+        # Calculado fora do lock: abas diferentes não esperam umas pelas outras
+        resultado = func( *args )
+        with _LOCK:
+            _FIGURAS[chave] = resultado
+            while len( _FIGURAS ) > FIGURE_CACHE_ENTRIES:
+                _FIGURAS.popitem( last=False )
+        return resultado
+
+    return memorizada
+
+def _extremos( valores, baldes ):
+    # Posições do menor e do maior valor de cada balde ( NaN é ignorado, a
+    # não ser que o balde inteiro seja NaN )
+    menor = np.lexsort( ( np.where( np.isnan( valores ), np.inf, valores ), baldes ) )
+    maior = np.lexsort( ( np.where( np.isnan( valores ), -np.inf, valores ), baldes ) )
+    fronteiras = np.flatnonzero( np.diff( baldes[menor] ) )
+    return np.concatenate( [ menor[np.append( 0, fronteiras + 1 )], maior[np.append( fronteiras, -1 )] ] )
+
+def downsample( df2, x, y, max_points=MAX_PONTOS ):
+    """ Reduz uma série ordenada por 'x' a no máximo ~max_points linhas: as
+        linhas são divididas em baldes consecutivos e de cada balde ficam o
+        menor e o maior valor de cada coluna de 'y' ( picos e vales continuam
+        visíveis ), além da primeira e da última linha. Séries curtas voltam
+        sem mudança.
+
+        Input: Dataframe ordenado por x, coluna x, coluna ( ou lista ) y,
+               quantidade máxima de pontos
+        Output: Dataframe com um subconjunto das linhas, na ordem original
+    """
+    colunas = [y] if isinstance( y, str ) else list( y )
+    if len( df2 ) <= max_points:
+        return df2
+    quantidade = max( max_points // ( 2 * len( colunas ) ), 1 )
+    baldes = np.arange( len( df2 ) ) * quantidade // len( df2 )
+    posicoes = [ np.array( [0, len( df2 ) - 1] ) ]
+    for coluna in colunas:
+        posicoes.append( _extremos( df2[coluna].to_numpy( dtype=float ), baldes ) )
+    return df2.iloc[np.unique( np.concatenate( posicoes ) )]
+
+def use_webgl( fig, min_points=WEBGL_PONTOS ):
+    """ Troca os traços Scatter com muitos pontos por Scattergl ( desenhados
+        pela GPU do navegador ); os demais traços ficam como estão.
+
+        Input: figura, quantidade de pontos a partir da qual usar WebGL
+        Output: a mesma figura, ou uma nova com os traços trocados
+    """
+    def grande( traco ):
+        return traco.type == 'scatter' and traco.x is not None and len( traco.x ) >= min_points
+    if not any( grande( traco ) for traco in fig.data ):
+        return fig
+    tracos = []
+    for traco in fig.data:
+        if grande( traco ):
+            dados = traco.to_plotly_json()
+            dados.pop( 'type' )
+            # Propriedades que só existem no Scatter ( ex.: cliponaxis ) são descartadas
+            traco = go.Scattergl( dados, skip_invalid=True )
+        tracos.append( traco )
+    return go.Figure( data=tracos, layout=fig.layout )
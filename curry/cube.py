@@ -0,0 +1,131 @@
+#------------------------------------------------------------------------------
+# Curry Company - Cubo de agregados pré-calculados
+#------------------------------------------------------------------------------
+
+# Libraries
+import threading
+
+import numpy as np
+import pandas as pd
+
+from curry.cells import cell_mask, incremental_cache
+from curry.data import DATA_PATH
+from curry.moments import Moments, combine, group_codes
+from curry.schema import plain
+from curry.store import query_cube, use_store
+
+#------------------------------------------------------------------------------
+# CONSTANTES
+#------------------------------------------------------------------------------
+
+# Dimensões de filtro da barra lateral: sempre presentes em qualquer cubo
+DIMENSOES_FILTRO = ['Order_Date','Road_traffic_density']
+
+MEDIDAS = ['Time_taken(min)','Delivery_person_Ratings','distance']
+
+# Cache do processo: chave (arquivo, dimensões, medidas) -> cubo
+_CACHE = {}
+_LOCK = threading.Lock()
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+def build_cube( df1, dimensions, measures=MEDIDAS, filters=DIMENSOES_FILTRO ):
+    """ Agrega o Dataframe limpo nas células definidas pelas dimensões
+        ( mais as dimensões de filtro da barra lateral, 'filters' ).
+        Cada célula guarda acumuladores que se juntam ( mergeable, ver
+        curry/moments.py ):
+          - count: quantidade de pedidos
+          - <medida>_mean e <medida>_m2: média e soma dos quadrados dos
+            desvios à média
+        Com eles qualquer combinação de células dá contagem, média e desvio
+        padrão exatos, sem voltar às linhas ( ver rollup ).
+
+        Input: Dataframe limpo, lista de dimensões, lista de medidas,
+               dimensões de filtro
+        Output: Dataframe com uma linha por célula
+    """
+    dimensoes = list( dict.fromkeys( list( filters ) + list( dimensions ) ) )
+    # Célula de cada linha; linhas com NaN nas dimensões ficam de fora
+    codigos = group_codes( df1, dimensoes )
+    linhas = np.flatnonzero( codigos >= 0 )
+    codigos = codigos[linhas]
+    primeira = np.unique( codigos, return_index=True )[1]
+    n_celulas = len( primeira )
+
+    cubo = df1[dimensoes].iloc[linhas[primeira]].reset_index( drop=True )
+    cubo['count'] = np.bincount( codigos, minlength=n_celulas )
+    for m in measures:
+        # Média e M2 de cada célula direto dos valores ( duas passadas vetorizadas )
+        celulas = Moments.from_values( df1[m].to_numpy( dtype=float )[linhas], codigos, n_celulas )
+        cubo[m + '_mean'] = celulas.mean
+        cubo[m + '_m2'] = celulas.m2
+    return cubo
+
+def _medidas( cubo ):
+    return [ c[:-len( '_mean' )] for c in cubo.columns if c.endswith( '_mean' ) ]
+
+def merge_cubes( *cubos ):
+    """ Junta cubos das mesmas dimensões e medidas ( ex.: o cubo da versão
+        anterior e o das linhas acrescentadas ): os acumuladores das células
+        em comum se juntam um cubo de cada vez ( Moments.merge ).
+
+        Input: cubos
+        Output: Dataframe do cubo
+    """
+    medidas = _medidas( cubos[0] )
+    dimensoes = [ c for c in cubos[0].columns if c != 'count' and not c.endswith( ( '_mean', '_m2' ) ) ]
+    partes = np.repeat( np.arange( len( cubos ) ), [ len( cubo ) for cubo in cubos ] )
+    return combine( pd.concat( cubos, ignore_index=True ), dimensoes, medidas, parts=partes ).reset_index()
+
+def load_cube( dimensions, measures=MEDIDAS, path=DATA_PATH ):
+    """ Cubo do dataset atual, calculado uma única vez por processo e por
+        versão do arquivo ( mesma chave de load_data ). Se a versão atual só
+        acrescentou linhas a uma versão cujo cubo já está no cache, agrega
+        apenas as linhas novas e soma ao cubo anterior ( ver merge_cubes ).
+
+        Input: lista de dimensões, lista de medidas, caminho do CSV
+        Output: Dataframe do cubo
+    """
+    colunas = list( dict.fromkeys( DIMENSOES_FILTRO + list( dimensions ) + list( measures ) ) )
+    return incremental_cache( _CACHE, _LOCK, build_cube, merge_cubes, path, colunas,
+                              tuple( dimensions ), tuple( measures ), name='cubo' )
+
+def slice_cube( cubo, date_limit, traffic_options ):
+    """ Aplica os filtros da barra lateral ( data limite e trânsito ) às
+        células do cubo.
+
+        Input: cubo, data limite ( exclusiva ), lista de condições de trânsito
+        Output: cubo filtrado
+    """
+    return cubo.loc[cell_mask( cubo, date_limit, traffic_options ), :]
+
+def filtered_cube( dimensions, measures, date_limit, traffic_options, path=DATA_PATH ):
+    """ Células do cubo com os filtros da barra lateral, do backend escolhido
+        ( ver curry/store.py ): fatia do cubo em memória ou GROUP BY no
+        SQLite. Os dois dão as mesmas células.
+
+        Input: lista de dimensões, lista de medidas, data limite
+               ( exclusiva ), condições de trânsito, caminho do CSV
+        Output: cubo filtrado
+    """
+    if use_store():
+        dimensoes = list( dict.fromkeys( DIMENSOES_FILTRO + list( dimensions ) ) )
+        return query_cube( dimensoes, measures, date_limit, traffic_options, path )
+    return slice_cube( load_cube( dimensions, measures, path ), date_limit, traffic_options )
+
+def rollup( cubo, by, measures=() ):
+    """ Junta as células do cubo por 'by' e calcula as estatísticas finais.
+
+        Input: cubo ( ou fatia ), lista de dimensões, medidas desejadas
+        Output: Dataframe com 'by' ( em texto ), 'count' e <medida>_mean /
+                <medida>_std ( desvio padrão amostral, ddof=1, como o .std()
+                do pandas )
+    """
+    df2 = combine( cubo, by, measures )
+    colunas = ['count']
+    for m in measures:
+        df2[m + '_std'] = Moments( df2['count'], df2[m + '_mean'], df2[m + '_m2'] ).std()
+        colunas += [m + '_mean', m + '_std']
+    return plain( df2.loc[:, colunas].reset_index( drop=not by ) )
@@ -0,0 +1,440 @@
+#------------------------------------------------------------------------------
+# Curry Company - Camada de carga e limpeza dos dados
+#------------------------------------------------------------------------------
+
+# Libraries
+import argparse
+import csv
+import glob
+import io
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from curry.buckets import add_buckets
+from curry.geo import add_distance
+from curry.instrument import stage
+from curry.schema import append_compact, compact
+from curry.snapshot import read_snapshot, snapshot_metadata, write_snapshot
+
+#------------------------------------------------------------------------------
+# CONSTANTES
+#------------------------------------------------------------------------------
+
+DATA_PATH = 'train.csv'
+CACHE_DIR = '.cache'
+
+# Muda sempre que o conteúdo do snapshot muda ( colunas derivadas, tipos... )
+SNAPSHOT_VERSION = 7
+
+# Bytes do fim da parte já ingerida do CSV, guardados para reconhecer um append
+FINGERPRINT_BYTES = 64
+
+# Segmentos de acréscimos lidos junto com o snapshot base; no próximo
+# acréscimo além deste número, tudo é compactado num novo snapshot base
+SEGMENTOS_MAX = 8
+
+# Valores que representam dado faltante no CSV, por coluna obrigatória
+SENTINELAS = {
+    'Delivery_person_Age' : 'NaN ',
+    'Delivery_person_Ratings' : 'NaN ',
+    'Road_traffic_density' : 'NaN ',
+    'City' : 'NaN ',
+    'multiple_deliveries' : 'NaN ',
+    'Weatherconditions' : 'conditions NaN',
+}
+
+# Cache do processo: chave (caminho, tamanho, mtime, colunas) -> DataFrame limpo.
+# O Streamlit executa cada rerun numa thread, por isso o lock.
+_CACHE = {}
+_LOCK = threading.Lock()
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+def _por_valores_distintos( serie, func ):
+    """ Aplica func apenas aos valores distintos da série e remonta o resultado
+        pelos códigos do factorize. As colunas de texto têm poucos valores
+        distintos ( City, Type_of_order, Time_taken... ), então o trabalho de
+        string cai de N linhas para algumas dezenas de valores.
+    """
+    codigos, distintos = pd.factorize( serie )
+    if ( codigos < 0 ).any():
+        # Ainda há NaN na coluna: segue pelo caminho linha a linha
+        return func( serie )
+    valores = func( pd.Series( distintos ) ).to_numpy()
+    return pd.Series( valores.take( codigos ), index=serie.index, name=serie.name )
+
+def read_orders( path=DATA_PATH, **kwargs ):
+    """ Lê o CSV de pedidos já marcando as sentinelas ( 'NaN ', 'conditions NaN' )
+        como dados faltantes. Assim as colunas numéricas ( idade, avaliação,
+        múltiplas entregas ) já chegam como float direto do parser de C.
+
+        Input: caminho do CSV ( kwargs repassados ao pd.read_csv )
+        Output: Dataframe bruto
+    """
+    na_values = { coluna : [sentinela] for coluna, sentinela in SENTINELAS.items() }
+    return pd.read_csv( path, na_values=na_values, **kwargs )
+
+def clean_data( df ):
+    """ Esta função tem a reaponsabilidade de limpar o dataframe
+        Tipos de limpeza:
+        1. Remoção dos dados NaN
+        2. Mudança do tipo da coluna de dados
+        3. Remoção dos espaços das variáveis de texto
+        4. Formatação da coluna de datas
+        5. Limpeza da coluna de tempo ( remoção de texto em variável numérica )
+
+        Aceita tanto o CSV lido por read_orders ( sentinelas já como NaN ) quanto
+        o lido por pd.read_csv puro ( sentinelas como texto ). Todas as etapas são
+        operações por coluna; cada coluna é copiada uma única vez, já filtrada.
+
+        Input: Dataframe
+        Output: Dataframe
+    """
+    # Linhas com dado faltante em qualquer coluna obrigatória: uma máscara
+    # booleana única, acumulada coluna a coluna direto nos arrays numpy
+    faltantes = np.zeros( len( df ), dtype=bool )
+    for coluna, sentinela in SENTINELAS.items():
+        valores = df[coluna].to_numpy()
+        faltantes |= pd.isna( valores )
+        if valores.dtype == object:
+            faltantes |= ( valores == sentinela )
+    linhas = ~faltantes
+
+    # Cada coluna é filtrada uma única vez ( sem o .copy() do frame inteiro )
+    if faltantes.any():
+        indice = df.index[linhas]
+        df1 = { coluna : pd.Series( df[coluna].to_numpy()[linhas], index=indice, name=coluna )
+                for coluna in df.columns }
+    else:
+        df1 = { coluna : df[coluna] for coluna in df.columns }
+
+    # Removendo os espaços dentro de strings/texto/objects
+    df1['ID'] = df1['ID'].str.strip()
+    for coluna in ['Road_traffic_density','Type_of_order','Type_of_vehicle','City']:
+        df1[coluna] = _por_valores_distintos( df1[coluna], lambda s: s.str.strip() )
+
+    # Converte colunas para int, float, datetime, etc
+    df1['Delivery_person_Age'] = df1['Delivery_person_Age'].astype(int)
+    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype(int)
+    df1['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype(float)
+
+    # Converte o TIME-TAKEN ( '(min) 24' -> 24 )
+    df1['Time_taken(min)'] = _por_valores_distintos( df1['Time_taken(min)'],
+                                lambda s: s.str.removeprefix( '(min) ' ).astype(int) )
+
+    # Converte DATA de string para DateTime ( to_datetime já faz cache dos distintos )
+    df1['Order_Date'] = pd.to_datetime( df1['Order_Date'], format='%d-%m-%Y' )
+
+    return pd.DataFrame( df1, copy=False )
+
+def derive_columns( df1 ):
+    """ Colunas calculadas uma única vez na ingestão, a partir do Dataframe
+        limpo: 'distance' ( ver curry/geo.py ) e as chaves de calendário
+        'day', 'week' e 'month' ( ver curry/buckets.py ).
+
+        Input: Dataframe limpo
+        Output: o mesmo Dataframe, com as colunas derivadas
+    """
+    return add_buckets( add_distance( df1 ) )
+
+def file_key( path ):
+    """ Identifica uma versão do arquivo de origem.
+        Input: caminho do arquivo
+        Output: tupla (caminho absoluto, tamanho em bytes, mtime em ns)
+    """
+    info = os.stat( path )
+    return ( os.path.abspath( path ), info.st_size, info.st_mtime_ns )
+
+def snapshot_path( key ):
+    """ Caminho do snapshot de uma versão do arquivo: nome + tamanho + mtime """
+    nome = os.path.splitext( os.path.basename( key[0] ) )[0]
+    return os.path.join( CACHE_DIR, '{}-{}-{}-v{}.arrow'.format( nome, key[1], key[2], SNAPSHOT_VERSION ) )
+
+def _tail_path( destino ):
+    # Arquivo com a última linha provisória de uma versão ( ver ingest )
+    return destino[:-len( '.arrow' )] + '.tail.arrow'
+
+def _read_files( arquivos, columns=None ):
+    # Junta os arquivos de uma versão, em ordem. Com um só arquivo ( ou um só
+    # com linhas ) as colunas continuam apontando para o memory-map
+    partes = [ read_snapshot( arquivo, columns ) for arquivo in arquivos ]
+    partes = [ parte for parte in partes if len( parte ) ] or partes[:1]
+    return partes[0] if len( partes ) == 1 else append_compact( *partes )
+
+def read_version( key, columns=None, own=False ):
+    """ Linhas de uma versão do arquivo: o snapshot base, os segmentos dos
+        acréscimos seguintes e a última linha provisória, em ordem ( ver
+        ingest ). Até a próxima compactação os segmentos são juntados na
+        leitura ( uma cópia das colunas pedidas ).
+
+        Input: chave da versão ( ver file_key ), colunas ( None = todas ),
+               own: só os arquivos gravados pela própria versão
+        Output: Dataframe
+    """
+    destino = snapshot_path( key )
+    info = snapshot_metadata( destino )
+    arquivos = [] if own else [ os.path.join( CACHE_DIR, nome ) for nome in info.get( 'segments', [] ) ]
+    arquivos.append( destino )
+    if info.get( 'tail' ):
+        arquivos.append( _tail_path( destino ) )
+    return _read_files( arquivos, columns )
+
+def _read_bytes( path, inicio, fim ):
+    with open( path, 'rb' ) as arquivo:
+        arquivo.seek( inicio )
+        return arquivo.read( fim - inicio )
+
+def _complete_lines( dados ):
+    # Só linhas completas: quem escreve no CSV pode estar no meio de uma linha
+    return dados[:dados.rfind( b'\n' ) + 1]
+
+def _split_tail( dados, header ):
+    # ( linhas completas, última linha sem quebra de linha ). A última linha
+    # só é mantida se tem os campos do cabeçalho; mesmo assim é provisória:
+    # o offset gravado fica antes dela e o próximo acréscimo a lê de novo
+    # ( ver ingest ).
+    completas = _complete_lines( dados )
+    resto = dados[len( completas ):]
+    if not resto.strip():
+        return completas, b''
+    campos = next( csv.reader( [resto.decode( 'utf-8', errors='replace' )] ), [] )
+    return completas, resto if len( campos ) == len( header ) else b''
+
+def _clean_bytes( dados, inicio, **kwargs ):
+    # Lê, limpa e calcula as colunas derivadas de um trecho do CSV. O índice
+    # continua sendo o número da linha no arquivo inteiro ( a partir de 'inicio' ).
+    with stage( 'leitura' ):
+        df = read_orders( io.BytesIO( dados ), **kwargs )
+        df.index = df.index + inicio
+    with stage( 'limpeza' ):
+        df1 = derive_columns( clean_data( df ) )
+    return df1, len( df )
+
+def _previous_version( path, key, destino ):
+    """ Procura o snapshot de uma versão anterior do mesmo arquivo da qual a
+        versão atual seja apenas um acréscimo de linhas no fim ( append-only ):
+        os bytes finais da parte já ingerida precisam ser os mesmos.
+
+        Output: ( caminho do snapshot anterior, metadados ) ou ( None, None )
+    """
+    nome = os.path.splitext( os.path.basename( path ) )[0]
+    padrao = os.path.join( CACHE_DIR, '{}-*-v{}.arrow'.format( nome, SNAPSHOT_VERSION ) )
+    candidatos = [ c for c in glob.glob( padrao ) if c != destino ]
+    for candidato in sorted( candidatos, key=os.path.getmtime, reverse=True ):
+        try:
+            info = snapshot_metadata( candidato )
+        except ( OSError, pa.ArrowInvalid ):
+            continue
+        offset = info.get( 'offset' )
+        if not offset or offset > key[1]:
+            continue
+        inicio = max( 0, offset - FINGERPRINT_BYTES )
+        if _read_bytes( path, inicio, offset ).hex() == info['fingerprint']:
+            return candidato, info
+    return None, None
+
+def ingest( path=DATA_PATH, full=False ):
+    """ Lê e limpa o CSV, calcula as colunas derivadas ( ver derive_columns ),
+        ordena os pedidos por Order_Date ( ver curry/index.py ) e grava o
+        snapshot colunar da versão atual do arquivo, no esquema compacto ( ver
+        curry/schema.py ), removendo os snapshots de versões anteriores.
+        Pode ser executado no deploy ( python -m curry.data train.csv ) para
+        que nenhuma página pague a leitura do CSV.
+
+        Ingestão incremental: se o arquivo só cresceu desde o último snapshot
+        ( linhas novas no fim ), apenas as linhas novas são lidas, limpas e
+        gravadas num segmento ao lado do snapshot anterior, sem reescrevê-lo:
+        o custo é o do acréscimo, não o do histórico. Os metadados registram
+        a cadeia de segmentos ( ver read_version ) e o ponto de corte ( ver
+        snapshot_info ), para que os agregados também sejam atualizados só
+        com a diferença ( ver curry/cube.py ). Cada segmento é ordenado por
+        Order_Date ( a versão fica com alguns trechos ordenados, ver
+        build_index ); depois de SEGMENTOS_MAX segmentos a cadeia é
+        compactada num novo snapshot base ordenado.
+
+        Uma última linha sem quebra de linha ( quem escreve pode estar no meio
+        dela ) só é mantida se tem os campos do cabeçalho, e assim mesmo num
+        arquivo à parte: o offset gravado para na última quebra de linha e o
+        próximo acréscimo a lê de novo.
+
+        Input: caminho do CSV, full: ignora os snapshots anteriores
+        Output: caminho do snapshot
+    """
+    key = file_key( path )
+    destino = snapshot_path( key )
+    if not os.path.exists( destino ):
+        anterior, info = ( None, None ) if full else _previous_version( path, key, destino )
+        if anterior is None:
+            dados = _read_bytes( path, 0, key[1] )
+            header = list( pd.read_csv( io.BytesIO( dados ), nrows=0 ).columns )
+            dados, resto = _split_tail( dados, header )
+            if not dados:
+                # Nenhuma quebra de linha: o arquivo é só o cabeçalho
+                dados, resto = resto, b''
+            novos, linhas = _clean_bytes( dados + resto, 0 )
+            info = { 'header' : header, 'offset' : 0, 'raw_rows' : 0, 'key' : None }
+            segmentos = None
+        else:
+            dados, resto = _split_tail( _read_bytes( path, info['offset'], key[1] ), info['header'] )
+            if dados or resto:
+                novos, linhas = _clean_bytes( dados + resto, info['raw_rows'], header=None, names=info['header'] )
+            else:
+                novos, linhas = read_snapshot( anterior ).iloc[:0], 0
+            # A cadeia da versão anterior, sem a linha provisória dela ( que
+            # foi lida de novo acima )
+            segmentos = info.get( 'segments', [] ) + [os.path.basename( anterior )]
+
+        # A linha provisória ( índice depois das linhas completas ) fica à parte
+        completas = info['raw_rows'] + linhas - ( 1 if resto else 0 )
+        provisoria = compact( novos.loc[novos.index >= completas, :] )
+        novos = novos.loc[novos.index < completas, :]
+
+        if segmentos is None or len( segmentos ) >= SEGMENTOS_MAX:
+            # Snapshot base: tudo, ordenado. Num acréscimo, a compactação
+            # periódica da cadeia ( só as linhas novas são compactadas, ver
+            # curry/schema.py )
+            with stage( 'compactacao' ):
+                if segmentos:
+                    arquivos = [ os.path.join( CACHE_DIR, nome ) for nome in segmentos ]
+                    df1 = append_compact( _read_files( arquivos ), compact( novos ) )
+                else:
+                    df1 = compact( novos )
+                df1 = df1.sort_values( 'Order_Date', kind='stable' )
+            segmentos = []
+        else:
+            # Segmento: só as linhas novas, ordenadas entre si
+            df1 = compact( novos.sort_values( 'Order_Date', kind='stable' ) )
+
+        cauda = len( provisoria ) > 0
+        if cauda:
+            write_snapshot( provisoria, _tail_path( destino ) )
+
+        # O offset para na última quebra de linha: a linha provisória não
+        # conta como ingerida
+        offset = info['offset'] + len( dados )
+        write_snapshot( df1, destino, metadata={
+            'header' : info['header'],
+            'key' : list( key[1:] ),
+            'offset' : offset,
+            'fingerprint' : _read_bytes( path, max( 0, offset - FINGERPRINT_BYTES ), offset ).hex(),
+            'raw_rows' : completas,
+            'segments' : segmentos,
+            'tail' : cauda,
+            # Versão anterior e primeira linha acrescentada, para os agregados.
+            # Se a versão anterior tinha uma linha provisória, os agregados
+            # dela a contaram: são refeitos do zero
+            'previous_key' : None if info.get( 'tail' ) else info['key'],
+            'delta_start' : info['raw_rows'],
+        } )
+
+    # Só os arquivos da cadeia da versão atual continuam em disco
+    info = snapshot_metadata( destino )
+    cadeia = { os.path.join( CACHE_DIR, nome ) for nome in info.get( 'segments', [] ) }
+    cadeia |= { destino, _tail_path( destino ) }
+    nome = os.path.splitext( os.path.basename( path ) )[0]
+    for antigo in glob.glob( os.path.join( CACHE_DIR, nome + '-*.arrow' ) ):
+        if antigo not in cadeia:
+            try:
+                os.remove( antigo )
+            except OSError:
+                pass
+    return destino
+
+def snapshot_info( path=DATA_PATH ):
+    """ Metadados do snapshot da versão atual do arquivo ( ver ingest ):
+        'key' ( tamanho, mtime ), 'previous_key' da versão da qual esta é um
+        acréscimo ( None numa ingestão completa ) e 'delta_start', o índice
+        da primeira linha acrescentada.
+
+        Input: caminho do CSV
+        Output: dicionário
+    """
+    destino = snapshot_path( file_key( path ) )
+    if not os.path.exists( destino ):
+        ingest( path )
+    return snapshot_metadata( destino )
+
+def absorb_batches( drop_dir, path=DATA_PATH ):
+    """ Acrescenta ao fim do CSV principal os arquivos de lote ( *.csv, com o
+        mesmo cabeçalho ) deixados em drop_dir, em ordem de nome, e move cada
+        lote para drop_dir/processados. A próxima carga só ingere as linhas
+        acrescentadas ( ver ingest ).
+
+        Input: pasta de lotes, caminho do CSV principal
+        Output: quantidade de lotes absorvidos
+    """
+    cabecalho = _read_bytes( path, 0, 1 << 16 ).split( b'\n', 1 )[0].rstrip( b'\r' )
+    processados = os.path.join( drop_dir, 'processados' )
+    lotes = sorted( glob.glob( os.path.join( drop_dir, '*.csv' ) ) )
+    for lote in lotes:
+        with open( lote, 'rb' ) as arquivo:
+            primeira, _, corpo = arquivo.read().partition( b'\n' )
+        if primeira.rstrip( b'\r' ) != cabecalho:
+            raise ValueError( 'Cabeçalho de {} difere do de {}'.format( lote, path ) )
+        with open( path, 'r+b' ) as destino:
+            destino.seek( 0, os.SEEK_END )
+            # Garante que o lote começa numa linha nova
+            if destino.tell() > 0:
+                destino.seek( -1, os.SEEK_END )
+                if destino.read( 1 ) != b'\n':
+                    destino.write( b'\n' )
+            destino.write( corpo if corpo.endswith( b'\n' ) or not corpo else corpo + b'\n' )
+        os.makedirs( processados, exist_ok=True )
+        os.replace( lote, os.path.join( processados, os.path.basename( lote ) ) )
+    return len( lotes )
+
+def load_data( path=DATA_PATH, columns=None ):
+    """ Carrega o dataset limpo uma única vez por processo.
+        1. Procura no cache do processo (caminho, tamanho, mtime, colunas)
+        2. Abre o snapshot colunar em disco com memory-map ( ver snapshot.py )
+        3. Se não houver snapshot: lê o CSV, executa clean_data e grava o snapshot
+
+        O DataFrame devolvido é compartilhado entre os reruns: as páginas
+        não devem alterá-lo ( os filtros com .loc já geram cópias ).
+
+        Input: caminho do CSV, lista de colunas usadas pela página ( None = todas )
+        Output: Dataframe limpo
+    """
+    key = file_key( path )
+    chave = key + ( None if columns is None else tuple( columns ), )
+    with _LOCK:
+        df1 = _CACHE.get( chave )
+        if df1 is not None:
+            return df1
+
+        destino = snapshot_path( key )
+        with stage( 'carga' ):
+            try:
+                df1 = read_version( key, columns )
+            except ( OSError, pa.ArrowInvalid ):
+                if os.path.exists( destino ):
+                    # Um arquivo da cadeia corrompido: refaz a partir do CSV
+                    # inteiro. O snapshot sai antes, senão ingest o daria
+                    # como pronto
+                    os.remove( destino )
+                    ingest( path, full=True )
+                else:
+                    # Sem snapshot desta versão ( só acréscimo, se possível )
+                    ingest( path )
+                df1 = read_version( key, columns )
+
+        # Versões antigas do mesmo arquivo não são mais necessárias
+        for antiga in [ k for k in _CACHE if k[0] == key[0] and k[1:3] != key[1:3] ]:
+            del _CACHE[antiga]
+        _CACHE[chave] = df1
+        return df1
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Gera o snapshot limpo do CSV de pedidos' )
+    parser.add_argument( 'csv', nargs='?', default=DATA_PATH )
+    parser.add_argument( '--drop-dir', help='pasta de lotes a acrescentar antes ( ver absorb_batches )' )
+    args = parser.parse_args()
+    if args.drop_dir:
+        print( '{} lote(s) absorvido(s)'.format( absorb_batches( args.drop_dir, args.csv ) ) )
+    print( ingest( args.csv ) )
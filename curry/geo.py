@@ -0,0 +1,93 @@
+#------------------------------------------------------------------------------
+# Curry Company - Cálculos geográficos vetorizados
+#------------------------------------------------------------------------------
+
+# Libraries
+import numpy as np
+import pandas as pd
+from haversine import Unit
+from haversine.haversine import get_avg_earth_radius
+
+#------------------------------------------------------------------------------
+# CONSTANTES
+#------------------------------------------------------------------------------
+
+COLUNAS_COORDENADAS = ['Restaurant_latitude','Restaurant_longitude',
+                       'Delivery_location_latitude','Delivery_location_longitude']
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+def haversine_array( lat1, lng1, lat2, lng2, unit=Unit.KILOMETERS ):
+    """ Mesmo cálculo de haversine.haversine, mas sobre arrays inteiros.
+        ( haversine_vector, da própria biblioteca, valida as coordenadas
+        linha a linha em Python; aqui a validação também é vetorizada. )
+
+        Input: arrays de latitude/longitude em graus dos dois pontos
+        Output: array de distâncias na unidade pedida ( padrão: km )
+    """
+    lat1, lng1, lat2, lng2 = ( np.asarray( a, dtype=float ) for a in ( lat1, lng1, lat2, lng2 ) )
+    for lat, lng in ( ( lat1, lng1 ), ( lat2, lng2 ) ):
+        if ( np.abs( lat ) > 90 ).any() or ( np.abs( lng ) > 180 ).any():
+            raise ValueError( 'Latitude/longitude fora dos intervalos [-90, 90] / [-180, 180]' )
+
+    lat1, lng1, lat2, lng2 = np.radians( lat1 ), np.radians( lng1 ), np.radians( lat2 ), np.radians( lng2 )
+    d = ( np.sin( ( lat2 - lat1 ) * 0.5 ) ** 2
+          + np.cos( lat1 ) * np.cos( lat2 ) * np.sin( ( lng2 - lng1 ) * 0.5 ) ** 2 )
+    return 2 * get_avg_earth_radius( unit ) * np.arcsin( np.sqrt( d ) )
+
+def add_distance( df1 ):
+    """ Acrescenta a coluna 'distance' ( km entre restaurante e local de
+        entrega ), calculada uma única vez na ingestão dos dados.
+
+        Input: Dataframe limpo
+        Output: o mesmo Dataframe, com a coluna 'distance'
+    """
+    df1['distance'] = haversine_array( *( df1[c].to_numpy() for c in COLUNAS_COORDENADAS ) )
+    return df1
+
+def grid_points( lat, lng, precisao=2, max_celulas=None ):
+    """ Agrupa coordenadas numa grade de 10^-precisao graus ( 2 casas: ~1 km )
+        e conta os pontos de cada célula, sem laço em Python. Milhares de
+        entregas viram algumas centenas de células para o mapa. Com
+        max_celulas a grade engrossa ( uma casa decimal a menos por vez ) até
+        caber no limite, para o tamanho do mapa não crescer com o histórico.
+
+        Input: arrays de latitude e longitude, casas decimais da grade,
+               número máximo de células ( opcional )
+        Output: Dataframe com 'lat', 'lng' ( média dos pontos da célula ) e 'count'
+    """
+    lat = np.asarray( lat, dtype=float )
+    lng = np.asarray( lng, dtype=float )
+    escala = 10.0 ** precisao
+    # Chave inteira única por célula: linha da grade * largura + coluna
+    linha = np.round( ( lat + 90 ) * escala ).astype( np.int64 )
+    coluna = np.round( ( lng + 180 ) * escala ).astype( np.int64 )
+    chave = linha * int( 360 * escala + 1 ) + coluna
+
+    celulas, grupo, contagem = np.unique( chave, return_inverse=True, return_counts=True )
+    if max_celulas is not None and len( celulas ) > max_celulas and precisao > -1:
+        return grid_points( lat, lng, precisao - 1, max_celulas )
+    return pd.DataFrame( {
+        'lat' : np.bincount( grupo, weights=lat, minlength=len( celulas ) ) / contagem,
+        'lng' : np.bincount( grupo, weights=lng, minlength=len( celulas ) ) / contagem,
+        'count' : contagem,
+    } )
+
+def to_geojson( df, lat, lng, propriedades=() ):
+    """ Monta uma FeatureCollection GeoJSON de pontos a partir das colunas do
+        Dataframe, para ser desenhada como uma única camada no mapa.
+
+        Input: Dataframe, colunas de latitude e longitude, colunas de propriedades
+        Output: dicionário GeoJSON
+    """
+    props = df.loc[:, list( propriedades )].to_dict( 'records' )
+    pontos = zip( df[lng].to_numpy().tolist(), df[lat].to_numpy().tolist() )
+    return {
+        'type' : 'FeatureCollection',
+        'features' : [ { 'type' : 'Feature',
+                         'geometry' : { 'type' : 'Point', 'coordinates' : [x, y] },
+                         'properties' : p }
+                       for ( x, y ), p in zip( pontos, props ) ],
+    }
@@ -0,0 +1,130 @@
+#------------------------------------------------------------------------------
+# Curry Company - Índices para os filtros da barra lateral
+#------------------------------------------------------------------------------
+
+# Libraries
+import threading
+
+import numpy as np
+import pandas as pd
+
+from curry.data import DATA_PATH, file_key, load_data
+from curry.instrument import stage
+from curry.store import query_rows, use_store
+
+#------------------------------------------------------------------------------
+# CONSTANTES
+#------------------------------------------------------------------------------
+
+# Cache do processo: chave (caminho, tamanho, mtime) -> índice
+_CACHE = {}
+_LOCK = threading.Lock()
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+def build_index( df1 ):
+    """ Monta os índices dos filtros sobre o Dataframe limpo, que a ingestão
+        grava em poucos trechos ordenados por Order_Date ( o snapshot base e
+        um por acréscimo, ver curry/data.py ):
+          - 'Order_Date': array de datas, ordenado dentro de cada trecho
+          - 'runs': posição de início de cada trecho e o fim do último
+          - 'Road_traffic_density': { nível : posições ( ordenadas ) das linhas }
+
+        Input: Dataframe limpo
+        Output: dicionário com os índices
+    """
+    datas = df1['Order_Date'].to_numpy()
+    quebras = np.flatnonzero( datas[1:] < datas[:-1] ) + 1
+    trechos = np.concatenate( [[0], quebras, [len( datas )]] )
+
+    codigos, niveis = pd.factorize( df1['Road_traffic_density'] )
+    # Ordenação estável: dentro de cada nível as posições seguem crescentes
+    ordem = np.argsort( codigos, kind='stable' )
+    limites = np.searchsorted( codigos[ordem], np.arange( len( niveis ) + 1 ) )
+    trafego = { nivel : ordem[limites[i]:limites[i + 1]] for i, nivel in enumerate( niveis ) }
+
+    return { 'Order_Date' : datas, 'runs' : trechos, 'Road_traffic_density' : trafego }
+
+def load_index( path=DATA_PATH ):
+    """ Índices do dataset atual, calculados uma única vez por processo.
+
+        Input: caminho do CSV
+        Output: dicionário com os índices ( ver build_index )
+    """
+    chave = file_key( path )
+    with _LOCK:
+        indice = _CACHE.get( chave )
+        if indice is None:
+            df1 = load_data( path, columns=['Order_Date','Road_traffic_density'] )
+            with stage( 'indice' ):
+                indice = build_index( df1 )
+            for antiga in [ k for k in _CACHE if k[0] == chave[0] ]:
+                del _CACHE[antiga]
+            _CACHE[chave] = indice
+        return indice
+
+def filter_positions( indice, date_limit, traffic_options ):
+    """ Aplica os filtros da barra lateral sem varrer as linhas:
+        1. A data limite vira, em cada trecho ordenado, a fronteira de um
+           intervalo de posições ( busca binária )
+        2. O trânsito vira a união das posições de cada nível escolhido,
+           cada uma cortada nas mesmas fronteiras
+
+        Input: índices, data limite ( exclusiva ), lista de condições de trânsito
+        Output: slice ( um só trecho e todos os níveis escolhidos ) ou array
+                de posições, em ordem de data
+    """
+    limite = pd.Timestamp( date_limit ).to_datetime64()
+    trechos = indice['runs']
+    intervalos = [ ( inicio, inicio + int( np.searchsorted( indice['Order_Date'][inicio:fim], limite, side='left' ) ) )
+                   for inicio, fim in zip( trechos[:-1], trechos[1:] ) ]
+
+    trafego = indice['Road_traffic_density']
+    opcoes = set( traffic_options )
+    escolhidos = [ nivel for nivel in trafego if nivel in opcoes ]
+    if len( escolhidos ) == len( trafego ) and len( intervalos ) <= 1:
+        return slice( 0, intervalos[0][1] if intervalos else 0 )
+
+    partes = [ posicoes[np.searchsorted( posicoes, inicio ):np.searchsorted( posicoes, fim )]
+               for posicoes in ( trafego[nivel] for nivel in escolhidos )
+               for inicio, fim in intervalos ]
+    if not partes:
+        return np.array( [], dtype=np.intp )
+    posicoes = np.sort( np.concatenate( partes ) )
+    if len( intervalos ) > 1:
+        # Vários trechos: de volta à ordem por data ( a de query_rows, ver
+        # curry/store.py ). A ordenação estável junta os trechos já ordenados
+        # e, na mesma data, mantém a ordem das linhas no CSV
+        posicoes = posicoes[np.argsort( indice['Order_Date'][posicoes], kind='stable' )]
+    return posicoes
+
+def take( df1, posicoes, columns=None ):
+    """ Linhas filtradas de um Dataframe carregado por load_data ( mesma versão
+        do arquivo dos índices ), apenas com as colunas pedidas. Cada coluna
+        é recortada sozinha: com slice ( todos os níveis de trânsito ) as
+        colunas apontam para os arrays do snapshot, sem cópia; com posições
+        só as colunas pedidas são copiadas.
+
+        Input: Dataframe, posições ( slice ou array ), lista de colunas
+        Output: Dataframe
+    """
+    colunas = df1.columns if columns is None else list( columns )
+    return pd.concat( [ df1[coluna].iloc[posicoes] for coluna in colunas ], axis=1, copy=False )
+
+def filtered_rows( columns, date_limit, traffic_options, path=DATA_PATH, snapshot_columns=None ):
+    """ Linhas com os filtros da barra lateral, só com 'columns', do backend
+        escolhido ( ver curry/store.py ): índices em memória ou WHERE no
+        SQLite, com o mesmo resultado.
+
+        Input: colunas, data limite ( exclusiva ), condições de trânsito,
+               caminho do CSV, colunas carregadas do snapshot em memória
+               ( as da página, para compartilhar o cache de load_data;
+               padrão: 'columns' )
+        Output: Dataframe
+    """
+    if use_store():
+        return query_rows( columns, date_limit, traffic_options, path )
+    posicoes = filter_positions( load_index( path ), date_limit, traffic_options )
+    return take( load_data( path, columns=snapshot_columns or columns ), posicoes, columns )
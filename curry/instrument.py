@@ -0,0 +1,108 @@
+#------------------------------------------------------------------------------
+# Curry Company - Medição de tempo e memória das etapas de cada rerun
+#------------------------------------------------------------------------------
+
+# Libraries
+import contextlib
+import datetime
+import json
+import os
+import threading
+import time
+import uuid
+
+#------------------------------------------------------------------------------
+# CONSTANTES
+#------------------------------------------------------------------------------
+
+# Arquivo de registros ( uma linha JSON por etapa ), opcional: o padrão
+# vazio desliga o log ( ex.: CURRY_PROFILE_LOG=.cache/profile.jsonl )
+PROFILE_LOG = os.environ.get( 'CURRY_PROFILE_LOG', '' )
+
+# Tamanho máximo do log: ao passar dele o arquivo vira <log>.1 ( substituindo
+# o anterior ) e um novo é começado
+PROFILE_LOG_MAX_BYTES = 10 * 2**20
+
+# Memória residente atual do processo ( Linux ); sem ela a etapa não mede memória
+_STATM = '/proc/self/statm'
+_PAGINA = os.sysconf( 'SC_PAGE_SIZE' ) if hasattr( os, 'sysconf' ) else 4096
+
+# Estado do rerun atual: o Streamlit executa cada rerun numa thread própria
+_LOCAL = threading.local()
+_LOG_LOCK = threading.Lock()
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+def _rss_mb():
+    # Memória residente atual do processo, em MB ( None fora do Linux ). O
+    # pico ( ru_maxrss ) não serve: só cresce e não separa as etapas.
+    try:
+        with open( _STATM ) as arquivo:
+            return int( arquivo.read().split()[1] ) * _PAGINA / 2**20
+    except ( OSError, ValueError, IndexError ):
+        return None
+
+def _escreve( registro ):
+    if not PROFILE_LOG:
+        return
+    with _LOG_LOCK:
+        try:
+            os.makedirs( os.path.dirname( PROFILE_LOG ) or '.', exist_ok=True )
+            if os.path.exists( PROFILE_LOG ) and os.path.getsize( PROFILE_LOG ) > PROFILE_LOG_MAX_BYTES:
+                os.replace( PROFILE_LOG, PROFILE_LOG + '.1' )
+            with open( PROFILE_LOG, 'a', encoding='utf-8' ) as arquivo:
+                arquivo.write( json.dumps( registro, default=str, ensure_ascii=False ) + '\n' )
+        except OSError:
+            # O log nunca pode derrubar a página
+            pass
+
+def start_rerun( page, session=None ):
+    """ Começa a medição de um rerun: descarta as etapas do rerun anterior
+        desta thread. Chamado no início de cada página.
+
+        Input: nome da página, identificador da sessão ( opcional )
+    """
+    _LOCAL.rerun = { 'page' : page, 'session' : session, 'rerun' : uuid.uuid4().hex[:12] }
+    _LOCAL.registros = []
+    _LOCAL.pilha = []
+
+@contextlib.contextmanager
+def stage( nome ):
+    """ Mede uma etapa: tempo de parede e variação da memória residente do
+        processo entre o início e o fim ( rss_delta_mb; negativa se a etapa
+        liberou memória ). Etapas podem ser aninhadas: o nome registrado inclui as
+        etapas externas ( 'visao_gerencial/cubo' ). Fora de um rerun ( ex.:
+        ingestão pela linha de comando ) a etapa só vai para o log.
+
+        Uso:
+            with stage( 'limpeza' ):
+                df1 = clean_data( df )
+    """
+    if not hasattr( _LOCAL, 'pilha' ):
+        _LOCAL.pilha = []
+    pilha = _LOCAL.pilha
+    pilha.append( nome )
+    memoria = _rss_mb()
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        segundos = time.perf_counter() - inicio
+        final = _rss_mb()
+        registro = dict( getattr( _LOCAL, 'rerun', {} ) )
+        registro.update( {
+            'ts' : datetime.datetime.now().isoformat( timespec='milliseconds' ),
+            'stage' : '/'.join( pilha ),
+            'seconds' : round( segundos, 6 ),
+            'rss_delta_mb' : None if memoria is None or final is None else round( final - memoria, 1 ),
+        } )
+        pilha.pop()
+        if hasattr( _LOCAL, 'registros' ):
+            _LOCAL.registros.append( registro )
+        _escreve( registro )
+
+def rerun_records():
+    """ Etapas medidas no rerun atual desta thread, na ordem em que terminaram. """
+    return list( getattr( _LOCAL, 'registros', [] ) )
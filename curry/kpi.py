@@ -0,0 +1,172 @@
+#------------------------------------------------------------------------------
+# Curry Company - Cálculo de vários KPIs numa única passada
+#------------------------------------------------------------------------------
+
+# Libraries
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from curry.moments import Moments
+from curry.parallel import map_partitions
+
+#------------------------------------------------------------------------------
+# CONSTANTES
+#------------------------------------------------------------------------------
+
+# Descrição declarativa de um KPI:
+#   op: 'count', 'nunique', 'sum', 'mean', 'std', 'max' ou 'min'
+#   coluna: coluna do Dataframe
+#   where: { coluna : valor } opcional, restringe as linhas consideradas
+Metrica = namedtuple( 'Metrica', ['op','coluna','where'], defaults=[None] )
+
+OPERACOES = ( 'count', 'nunique', 'sum', 'mean', 'std', 'max', 'min' )
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+def kpi_columns( metricas ):
+    """ Colunas do Dataframe necessárias para calcular as métricas. """
+    colunas = []
+    for m in metricas.values():
+        colunas += [m.coluna] + list( m.where or {} )
+    return list( dict.fromkeys( colunas ) )
+
+def _parciais( df1, metricas, chaves ):
+    # Um único groupby pelas colunas dos 'where': para cada grupo, contagem,
+    # soma, M2 ( soma dos quadrados dos desvios, ver curry/moments.py ),
+    # mínimo e máximo das colunas numéricas e o conjunto de valores distintos
+    # das colunas de 'nunique'.
+    numericas = list( dict.fromkeys( m.coluna for m in metricas.values() if m.op != 'nunique' ) )
+    distintas = list( dict.fromkeys( m.coluna for m in metricas.values() if m.op == 'nunique' ) )
+
+    dados = { ( '_chave', c ) : df1[c] for c in chaves }
+    agregacoes = {}
+    for c in numericas:
+        if all( m.op == 'count' for m in metricas.values() if m.coluna == c ):
+            # Só contagem: a coluna não precisa ser numérica
+            dados[( c, 'v' )] = df1[c]
+            agregacoes[( c, 'v' )] = ['count']
+            continue
+        dados[( c, 'v' )] = df1[c].astype( float )
+        agregacoes[( c, 'v' )] = ['count','sum','min','max','var']
+    for c in distintas:
+        dados[( c, 'd' )] = df1[c]
+        agregacoes[( c, 'd' )] = ['unique']
+
+    tmp = pd.DataFrame( dados )
+    if chaves:
+        grupos = tmp.groupby( [ ( '_chave', c ) for c in chaves ], observed=True, dropna=False )
+    else:
+        grupos = tmp.groupby( np.zeros( len( tmp ), dtype=np.int8 ) )
+    parciais = grupos.agg( agregacoes )
+    for c in parciais.columns:
+        if c[2] == 'var':
+            # Variância do grupo ( estável ) -> M2, que se junta entre grupos
+            n = parciais[( c[0], 'v', 'count' )]
+            parciais[( c[0], 'v', 'm2' )] = ( parciais[c] * ( n - 1 ) ).where( n > 1, 0.0 )
+            parciais = parciais.drop( columns=[c] )
+    if chaves:
+        parciais.index = parciais.index.set_names( chaves )
+    return parciais
+
+def _junta_parciais( lista ):
+    # Parciais de partições diferentes dos mesmos grupos: contagens e somas se
+    # somam, mínimo e máximo se comparam, os M2 se juntam pela fórmula de Chan
+    # ( ver curry/moments.py ) e os conjuntos de distintos se unem
+    if len( lista ) == 1:
+        return lista[0]
+    tmp = pd.concat( lista )
+    niveis = list( range( tmp.index.nlevels ) )
+    funcoes = { 'count' : 'sum', 'sum' : 'sum', 'min' : 'min', 'max' : 'max' }
+    colunas = {}
+    for c in tmp.columns:
+        grupos = tmp[c].groupby( level=niveis, observed=True, dropna=False )
+        if c[2] == 'unique':
+            colunas[c] = grupos.agg( lambda arrays: pd.unique( np.concatenate( arrays.tolist() ) ) )
+        elif c[2] == 'm2':
+            # Os acumuladores de cada partição se juntam ao total um de cada
+            # vez ( Moments.merge ); reduce põe cada grupo na sua posição
+            indice = grupos.size().index
+            total = Moments( np.zeros( len( indice ) ), np.zeros( len( indice ) ), np.zeros( len( indice ) ) )
+            for parcial in lista:
+                n, soma = parcial[( c[0], 'v', 'count' )].to_numpy(), parcial[( c[0], 'v', 'sum' )].to_numpy()
+                with np.errstate( divide='ignore', invalid='ignore' ):
+                    media = np.where( n > 0, soma / n, 0.0 )
+                acumulador = Moments( n, media, parcial[c].to_numpy() )
+                total = total.merge( acumulador.reduce( indice.get_indexer( parcial.index ), len( indice ) ) )
+            colunas[c] = pd.Series( total.m2, index=indice )
+        else:
+            colunas[c] = grupos.agg( funcoes[c[2]] )
+    return pd.DataFrame( colunas )
+
+def _seleciona( parciais, chaves, where ):
+    # Grupos que satisfazem o 'where' da métrica ( todos, se não houver )
+    if not where:
+        return parciais
+    linhas = np.ones( len( parciais ), dtype=bool )
+    for coluna, valor in where.items():
+        linhas &= parciais.index.get_level_values( coluna ) == valor
+    return parciais.loc[linhas]
+
+def _valor( grupos, m ):
+    # Junta os parciais dos grupos selecionados no valor final da métrica
+    if m.op == 'nunique':
+        arrays = grupos[( m.coluna, 'd', 'unique' )].tolist()
+        return len( pd.unique( np.concatenate( arrays ) ) ) if arrays else 0
+
+    n = grupos[( m.coluna, 'v', 'count' )].sum()
+    if m.op == 'count':
+        return int( n )
+    soma = grupos[( m.coluna, 'v', 'sum' )].sum()
+    if m.op == 'sum':
+        return soma
+    if m.op == 'max':
+        return grupos[( m.coluna, 'v', 'max' )].max()
+    if m.op == 'min':
+        return grupos[( m.coluna, 'v', 'min' )].min()
+    if n == 0:
+        return np.nan
+    media = soma / n
+    if m.op == 'mean':
+        return media
+    contagens = grupos[( m.coluna, 'v', 'count' )].to_numpy()
+    with np.errstate( divide='ignore', invalid='ignore' ):
+        medias = np.where( contagens > 0, grupos[( m.coluna, 'v', 'sum' )].to_numpy() / contagens, 0.0 )
+    total = Moments( contagens, medias, grupos[( m.coluna, 'v', 'm2' )].to_numpy() ).total()
+    return float( total.std()[0] )
+
+def compute_kpis( df1, metricas, partition=None ):
+    """ Calcula todas as métricas com uma única passada ( um groupby ) sobre
+        o Dataframe. Os grupos são as combinações das colunas usadas nos
+        'where'; cada métrica é obtida juntando os parciais dos grupos que
+        lhe interessam ( contagem e soma se somam, M2 pela fórmula de Chan;
+        mínimo, máximo e conjuntos de distintos também ).
+
+        Exemplo:
+            kpis = compute_kpis( df1, {
+                'unicos' : Metrica( 'nunique', 'Delivery_person_ID' ),
+                'tempo_festival' : Metrica( 'mean', 'Time_taken(min)', {'Festival':'Yes '} ),
+            } )
+
+        Com 'partition', os parciais são calculados em paralelo por partições
+        dessa coluna ( ver curry/parallel.py ) e depois juntados; contagens,
+        distintos, mínimo e máximo saem idênticos ao cálculo serial, médias e
+        desvios só diferem pela ordem das somas ( ~1e-15 ).
+
+        Input: Dataframe, { nome : Metrica }, coluna de partição ( opcional )
+        Output: { nome : valor }
+    """
+    for nome, m in metricas.items():
+        if m.op not in OPERACOES:
+            raise ValueError( 'Operação desconhecida em {}: {}'.format( nome, m.op ) )
+
+    chaves = sorted( { c for m in metricas.values() for c in ( m.where or {} ) } )
+    if partition is None:
+        parciais = _parciais( df1, metricas, chaves )
+    else:
+        parciais = _junta_parciais( map_partitions( _parciais, df1, partition, metricas, chaves ) )
+    return { nome : _valor( _seleciona( parciais, chaves, m.where ), m )
+             for nome, m in metricas.items() }
@@ -0,0 +1,46 @@
+#------------------------------------------------------------------------------
+# Curry Company - Importação adiada das bibliotecas pesadas
+#------------------------------------------------------------------------------
+
+# Libraries
+import importlib
+
+from curry.instrument import stage
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+class LazyModule:
+    """ Representa um módulo que só é importado no primeiro acesso a um
+        atributo ( px.bar, folium.Map... ). Uma página que não desenha o
+        componente não paga a importação. O tempo da importação aparece
+        como a etapa 'import <módulo>' do rerun ( ver curry/instrument.py ).
+
+        Uso:
+            px = LazyModule( 'plotly.express' )
+            fig = px.bar( df2, x='order_date', y='qtde_entregas' )
+    """
+
+    def __init__( self, nome ):
+        self._nome = nome
+        self._modulo = None
+
+    def __getattr__( self, atributo ):
+        # Só chamado para atributos que não existem no objeto: os do módulo
+        if self._modulo is None:
+            with stage( 'import ' + self._nome ):
+                self._modulo = importlib.import_module( self._nome )
+        return getattr( self._modulo, atributo )
+
+    def __repr__( self ):
+        estado = 'carregado' if self._modulo is not None else 'não carregado'
+        return '<LazyModule {} ( {} )>'.format( self._nome, estado )
+
+def lazy_import( nome ):
+    """ Módulo importado só no primeiro uso ( ver LazyModule ).
+
+        Input: nome do módulo ( 'plotly.express' )
+        Output: LazyModule
+    """
+    return LazyModule( nome )
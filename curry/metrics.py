@@ -0,0 +1,277 @@
+#------------------------------------------------------------------------------
+# Curry Company - Indicadores do Dashboard, independentes do Streamlit
+#------------------------------------------------------------------------------
+
+# Libraries
+import numpy as np
+import pandas as pd
+
+from curry.buckets import bucket_dates, rolling_orders, rolling_orders_per_driver
+from curry.cube import filtered_cube, rollup
+from curry.data import DATA_PATH
+from curry.index import filtered_rows
+from curry.kpi import Metrica, compute_kpis, kpi_columns
+from curry.moments import Moments, combine, rolling
+from curry.quantile import load_quantiles, quantiles, slice_quantiles
+from curry.ranking import TOP_K, driver_means, top_k_by_city
+from curry.sketch import ERRO_PADRAO, distinct, distinct_by, load_sketches, slice_sketches, week_keys
+from curry.store import query_quantiles, use_store
+
+#------------------------------------------------------------------------------
+# CONSTANTES
+#------------------------------------------------------------------------------
+
+# Cubos usados pelas páginas ( as mesmas chaves: o cache é compartilhado )
+CUBO_PEDIDOS = ( ['City'], [] )
+CUBO_ENTREGADORES = ( ['City','Delivery_person_ID'], ['Delivery_person_Ratings','Time_taken(min)'] )
+CUBO_CLIMA = ( ['Weatherconditions'], ['Delivery_person_Ratings'] )
+CUBO_RESTAURANTES = ( ['City','Type_of_order','Festival'], ['Time_taken(min)','distance'] )
+
+# Indicadores do cabeçalho "Overall Metrics" da Visão Restaurantes ( ver curry/kpi.py )
+KPIS_RESTAURANTES = {
+    'delivery_unique' : Metrica( 'nunique', 'Delivery_person_ID' ),
+    'avg_distance' : Metrica( 'mean', 'distance' ),
+    'avg_time_festival' : Metrica( 'mean', 'Time_taken(min)', {'Festival':'Yes '} ),
+    'std_time_festival' : Metrica( 'std', 'Time_taken(min)', {'Festival':'Yes '} ),
+    'avg_time_no_festival' : Metrica( 'mean', 'Time_taken(min)', {'Festival':'No '} ),
+    'std_time_no_festival' : Metrica( 'std', 'Time_taken(min)', {'Festival':'No '} ),
+}
+
+#------------------------------------------------------------------------------
+# FUNÇÕES - Visão Empresa
+#------------------------------------------------------------------------------
+
+def orders_by_day( cubo ):
+    """ Quantidade de pedidos por dia. """
+    df2 = rollup( cubo, ['Order_Date'] )
+    df2.columns = ['order_date','qtde_entregas']
+    return df2
+
+def traffic_share( cubo ):
+    """ Quantidade e percentual de pedidos por condição de trânsito. """
+    df2 = rollup( cubo, ['Road_traffic_density'] )
+    df2['percent_id'] = 100 * ( df2['count'] / df2['count'].sum() )
+    return df2
+
+def traffic_by_city( cubo ):
+    """ Quantidade de pedidos por cidade e condição de trânsito. """
+    return rollup( cubo, ['City','Road_traffic_density'] ).rename( columns={'count':'ID'} )
+
+def _por_semana( df2 ):
+    # Chave inteira da semana ( ver curry/buckets.py ) -> data do domingo
+    df2.insert( 0, 'week_of_year', bucket_dates( df2.pop( 'week' ) ) )
+    return df2
+
+def orders_by_week( df1 ):
+    """ Quantidade de pedidos por semana ( data do domingo que a inicia ). """
+    return _por_semana( df1['ID'].groupby( df1['week'] ).count().reset_index() )
+
+def orders_per_driver_by_week( df1 ):
+    """ Quantidade média de pedidos por entregador, por semana. """
+    grupos = df1.loc[:, ['ID','Delivery_person_ID']].groupby( df1['week'] )
+    df2 = pd.DataFrame( { 'ID' : grupos['ID'].count(),
+                          'Delivery_person_ID' : grupos['Delivery_person_ID'].nunique() } ).reset_index()
+    df2['order_by_deliver'] = df2['ID'] / df2['Delivery_person_ID']
+    return _por_semana( df2 )
+
+def orders_per_driver_by_week_sketch( sketches ):
+    """ Como orders_per_driver_by_week, com os entregadores distintos de
+        cada semana estimados pela união dos sketches das células ( ver
+        curry/sketch.py ), sem passar pelas linhas.
+    """
+    df2 = distinct_by( sketches, week_keys( sketches ) )
+    df2.columns = ['week','ID','Delivery_person_ID']
+    df2['order_by_deliver'] = df2['ID'] / df2['Delivery_person_ID']
+    return _por_semana( df2 )
+
+def moving_orders( df1 ):
+    """ Pedidos por dia com a soma móvel de 7 dias. """
+    return rolling_orders( df1, 7, 'day' )
+
+def moving_weekly_orders( df1 ):
+    """ Pedidos por semana com a soma móvel de 4 semanas. """
+    return rolling_orders( df1, 4, 'week' )
+
+def moving_orders_per_driver( df1 ):
+    """ Pedidos por entregador ativo numa janela móvel de 28 dias. """
+    return rolling_orders_per_driver( df1, 28 )
+
+#------------------------------------------------------------------------------
+# FUNÇÕES - Visão Entregadores
+#------------------------------------------------------------------------------
+
+def top_drivers( cubo, ascending=True, n=TOP_K ):
+    """ Os n entregadores mais rápidos ( ascending=True ) ou mais lentos de
+        cada cidade, pelo tempo médio de entrega ( ver curry/ranking.py ).
+    """
+    return top_k_by_city( driver_means( cubo ), n, ascending )
+
+def ratings_by_driver( cubo ):
+    """ Avaliação média por entregador. """
+    df2 = rollup( cubo, ['Delivery_person_ID'], ['Delivery_person_Ratings'] )
+    df2 = df2.loc[:, ['Delivery_person_ID','Delivery_person_Ratings_mean']]
+    df2.columns = ['Delivery_person_ID','Delivery_person_Ratings']
+    return df2
+
+def ratings_by( cubo, coluna, nomes=( 'ratings_mean', 'ratings_std' ) ):
+    """ Média e desvio padrão das avaliações por 'coluna', com as colunas de
+        resultado renomeadas para 'nomes'.
+    """
+    df2 = rollup( cubo, [coluna], ['Delivery_person_Ratings'] ).drop( columns='count' )
+    df2.columns = [coluna] + list( nomes )
+    return df2
+
+#------------------------------------------------------------------------------
+# FUNÇÕES - Visão Restaurantes
+#------------------------------------------------------------------------------
+
+def unique_drivers( sketches ):
+    """ Entregadores distintos estimados pelos sketches, com o erro padrão
+        relativo da estimativa.
+    """
+    return { 'delivery_unique' : int( round( distinct( sketches ) ) ), 'relative_error' : ERRO_PADRAO }
+
+def _tempo( cubo, by ):
+    df2 = rollup( cubo, by, ['Time_taken(min)'] ).drop( columns='count' )
+    df2.columns = list( by ) + ['avg_time','std_time']
+    return df2
+
+def time_by_city( cubo ):
+    """ Tempo médio e desvio padrão de entrega por cidade. """
+    return _tempo( cubo, ['City'] )
+
+def time_by_city_traffic( cubo ):
+    """ Tempo médio e desvio padrão de entrega por cidade e trânsito. """
+    return _tempo( cubo, ['City','Road_traffic_density'] )
+
+def time_by_city_order( cubo ):
+    """ Tempo médio e desvio padrão de entrega por cidade e tipo de pedido. """
+    return _tempo( cubo, ['City','Type_of_order'] )
+
+def festival_times( cubo ):
+    """ Tempo médio e desvio padrão de entrega com e sem Festival. """
+    return _tempo( cubo, ['Festival'] )
+
+def moving_time( cubo, window=7 ):
+    """ Tempo médio e desvio padrão de entrega numa janela móvel de
+        'window' dias, com os dias sem pedidos contados como vazios. A janela
+        anda um dia por vez: o dia novo entra e o que expirou sai dos
+        acumuladores ( ver curry/moments.py ). NaN enquanto a janela não está
+        cheia.
+    """
+    colunas = ['date','avg_time_{}d'.format( window ),'std_time_{}d'.format( window )]
+    dias = combine( cubo, ['Order_Date'], ['Time_taken(min)'] )
+    if len( dias ) == 0:
+        return pd.DataFrame( columns=colunas )
+    dias = dias.reindex( pd.date_range( dias.index.min(), dias.index.max(), freq='D' ), fill_value=0 )
+    janela = rolling( Moments( dias['count'], dias['Time_taken(min)_mean'], dias['Time_taken(min)_m2'] ), window )
+    cheia = np.arange( len( dias ) ) >= window - 1
+    return pd.DataFrame( dict( zip( colunas, [ dias.index,
+                                               np.where( cheia, janela.mean, np.nan ),
+                                               np.where( cheia, janela.std(), np.nan ) ] ) ) )
+
+def distance_by_city( cubo ):
+    """ Distância média entre restaurante e local de entrega, por cidade. """
+    return rollup( cubo, ['City'], ['distance'] ).rename( columns={'distance_mean':'distance'} )
+
+def time_percentiles( sketches, by=( 'City', ) ):
+    """ Percentis 50 / 90 / 99 do tempo de entrega por 'by', pelos sketches
+        de quantis ( ver curry/quantile.py ), em minutos inteiros como na base.
+    """
+    df2 = quantiles( sketches, 'Time_taken(min)', by )
+    colunas = [ c for c in df2.columns if c.startswith( 'p' ) ]
+    df2[colunas] = df2[colunas].round( 0 )
+    return df2
+
+def distance_percentiles( sketches, by=( 'City', ) ):
+    """ Percentis 50 / 90 / 99 da distância de entrega por 'by' ( sketches ). """
+    return quantiles( sketches, 'distance', by )
+
+def location_medians( sketches ):
+    """ Mediana da latitude e da longitude das entregas por cidade e trânsito
+        ( sketches ): os pinos do mapa da Visão Empresa.
+    """
+    chaves = ['City','Road_traffic_density']
+    latitude = quantiles( sketches, 'Delivery_location_latitude', chaves, qs=( 0.5, ) )
+    longitude = quantiles( sketches, 'Delivery_location_longitude', chaves, qs=( 0.5, ) )
+    return pd.DataFrame( { 'City' : latitude['City'],
+                           'Road_traffic_density' : latitude['Road_traffic_density'],
+                           'Delivery_location_latitude' : latitude['p50'],
+                           'Delivery_location_longitude' : longitude['p50'] } )
+
+#------------------------------------------------------------------------------
+# CONSULTAS COM OS FILTROS DA BARRA LATERAL
+#------------------------------------------------------------------------------
+
+def _cubo( cubo ):
+    # Células do cubo com os filtros ( em memória ou no SQLite, ver curry/store.py )
+    dimensions, measures = cubo
+    def carrega( date_limit, traffic_options, path ):
+        return filtered_cube( dimensions, measures, date_limit, traffic_options, path )
+    return carrega
+
+def _sketches( date_limit, traffic_options, path ):
+    # Sketches de entregadores distintos por célula, filtrados
+    return slice_sketches( load_sketches( path=path ), date_limit, traffic_options )
+
+def filtered_quantiles( date_limit, traffic_options, path=DATA_PATH ):
+    """ Sketches de quantis por célula com os filtros da barra lateral, do
+        backend escolhido ( ver curry/store.py ): fatia dos sketches em
+        memória ou as células guardadas na base SQLite, sem carregar as
+        linhas. Os dois dão os mesmos percentis.
+
+        Input: data limite ( exclusiva ), condições de trânsito, caminho do CSV
+        Output: sketches filtrados ( ver curry/quantile.py )
+    """
+    if use_store():
+        return query_quantiles( date_limit, traffic_options, path )
+    return slice_quantiles( load_quantiles( path=path ), date_limit, traffic_options )
+
+def _linhas( columns ):
+    # Linhas filtradas ( ver curry/index.py ), só com 'columns'
+    def carrega( date_limit, traffic_options, path ):
+        return filtered_rows( columns, date_limit, traffic_options, path )
+    return carrega
+
+# Nome do indicador -> ( carga dos dados filtrados, cálculo )
+CONSULTAS = {
+    'orders_by_day' : ( _cubo( CUBO_PEDIDOS ), orders_by_day ),
+    'orders_by_week' : ( _linhas( ['ID','week'] ), orders_by_week ),
+    'orders_per_driver_by_week' : ( _linhas( ['ID','week','Delivery_person_ID'] ), orders_per_driver_by_week ),
+    'orders_per_driver_by_week_sketch' : ( _sketches, orders_per_driver_by_week_sketch ),
+    'moving_orders' : ( _linhas( ['day'] ), moving_orders ),
+    'moving_weekly_orders' : ( _linhas( ['week'] ), moving_weekly_orders ),
+    'moving_orders_per_driver' : ( _linhas( ['day','Delivery_person_ID'] ), moving_orders_per_driver ),
+    'traffic_share' : ( _cubo( CUBO_PEDIDOS ), traffic_share ),
+    'traffic_by_city' : ( _cubo( CUBO_PEDIDOS ), traffic_by_city ),
+    'fastest_drivers' : ( _cubo( CUBO_ENTREGADORES ), top_drivers ),
+    'slowest_drivers' : ( _cubo( CUBO_ENTREGADORES ), lambda cubo: top_drivers( cubo, ascending=False ) ),
+    'ratings_by_driver' : ( _cubo( CUBO_ENTREGADORES ), ratings_by_driver ),
+    'ratings_by_traffic' : ( _cubo( CUBO_CLIMA ), lambda cubo: ratings_by( cubo, 'Road_traffic_density' ) ),
+    'ratings_by_weather' : ( _cubo( CUBO_CLIMA ), lambda cubo: ratings_by( cubo, 'Weatherconditions' ) ),
+    'time_by_city' : ( _cubo( CUBO_RESTAURANTES ), time_by_city ),
+    'time_by_city_traffic' : ( _cubo( CUBO_RESTAURANTES ), time_by_city_traffic ),
+    'time_by_city_order' : ( _cubo( CUBO_RESTAURANTES ), time_by_city_order ),
+    'festival_times' : ( _cubo( CUBO_RESTAURANTES ), festival_times ),
+    'moving_time' : ( _cubo( CUBO_RESTAURANTES ), moving_time ),
+    'distance_by_city' : ( _cubo( CUBO_RESTAURANTES ), distance_by_city ),
+    'time_percentiles_by_city' : ( filtered_quantiles, time_percentiles ),
+    'time_percentiles_by_city_traffic' : ( filtered_quantiles, lambda q: time_percentiles( q, ['City','Road_traffic_density'] ) ),
+    'distance_percentiles_by_city' : ( filtered_quantiles, distance_percentiles ),
+    'location_medians' : ( filtered_quantiles, location_medians ),
+    'unique_drivers' : ( _sketches, unique_drivers ),
+    'restaurant_kpis' : ( _linhas( kpi_columns( KPIS_RESTAURANTES ) ),
+                          lambda df1: compute_kpis( df1, KPIS_RESTAURANTES, partition='Delivery_person_ID' ) ),
+}
+
+def query( nome, date_limit, traffic_options, path=DATA_PATH ):
+    """ Calcula um indicador com os filtros da barra lateral, sem Streamlit.
+
+        Input: nome do indicador ( ver CONSULTAS ), data limite ( exclusiva ),
+               condições de trânsito, caminho do CSV
+        Output: Dataframe ( ou dicionário, para 'restaurant_kpis' )
+    """
+    if nome not in CONSULTAS:
+        raise KeyError( 'Indicador desconhecido: {}'.format( nome ) )
+    carrega, calcula = CONSULTAS[nome]
+    return calcula( carrega( pd.Timestamp( date_limit ), tuple( traffic_options ), path ) )
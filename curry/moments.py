@@ -0,0 +1,178 @@
+#------------------------------------------------------------------------------
+# Curry Company - Acumuladores de média e desvio padrão ( Welford / Chan )
+#------------------------------------------------------------------------------
+
+# Libraries
+import numpy as np
+import pandas as pd
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+class Moments:
+    """ Vários acumuladores de média e variância de uma vez ( arrays ): a
+        contagem, a média e o M2 ( soma dos quadrados dos desvios à média ) de
+        cada grupo. Diferente de soma e soma dos quadrados, o M2 não perde
+        precisão quando a média é grande perto do desvio.
+
+        Os acumuladores se juntam ( merge, fórmula de Chan ) e se separam
+        ( remove: tira de um total uma parte já somada, ex.: um dia que saiu
+        da janela ).
+
+        Uso:
+            total = Moments.from_values( tempos )
+            total = total.merge( Moments.from_values( tempos_novos ) )
+            total.mean, total.std()
+    """
+
+    def __init__( self, count, mean, m2 ):
+        self.count = np.asarray( count, dtype=float )
+        self.mean = np.asarray( mean, dtype=float )
+        self.m2 = np.asarray( m2, dtype=float )
+
+    def __getitem__( self, posicoes ):
+        return Moments( self.count[posicoes], self.mean[posicoes], self.m2[posicoes] )
+
+    @classmethod
+    def from_values( cls, values, groups=None, n_groups=None ):
+        """ Acumuladores dos valores de cada grupo, em duas passadas
+            vetorizadas ( média, depois desvios ). NaN é ignorado.
+
+            Input: valores, código do grupo de cada valor ( 0..n-1; sem
+                   grupos: um único acumulador ), quantidade de grupos
+            Output: Moments com um acumulador por grupo
+        """
+        valores = np.asarray( values, dtype=float )
+        if groups is None:
+            grupos = np.zeros( len( valores ), dtype=np.int64 )
+            n_groups = 1
+        else:
+            grupos = np.asarray( groups )
+            n_groups = n_groups if n_groups is not None else ( grupos.max() + 1 if len( grupos ) else 0 )
+        validos = ~np.isnan( valores )
+        valores, grupos = valores[validos], grupos[validos]
+        n = np.bincount( grupos, minlength=n_groups ).astype( float )
+        with np.errstate( divide='ignore', invalid='ignore' ):
+            media = np.bincount( grupos, weights=valores, minlength=n_groups ) / n
+        media = np.where( n > 0, media, 0.0 )
+        m2 = np.bincount( grupos, weights=( valores - media[grupos] )**2, minlength=n_groups )
+        return cls( n, media, m2 )
+
+    def merge( self, other ):
+        """ Junta dois conjuntos de acumuladores, posição a posição. """
+        n = self.count + other.count
+        with np.errstate( divide='ignore', invalid='ignore' ):
+            delta = other.mean - self.mean
+            media = np.where( n > 0, self.mean + delta * other.count / n, 0.0 )
+            m2 = self.m2 + other.m2 + np.where( n > 0, delta**2 * self.count * other.count / n, 0.0 )
+        return Moments( n, media, m2 )
+
+    def remove( self, other ):
+        """ Tira de cada acumulador uma parte que foi juntada a ele antes
+            ( inverso de merge ).
+        """
+        n = self.count - other.count
+        with np.errstate( divide='ignore', invalid='ignore' ):
+            media = np.where( n > 0, ( self.count * self.mean - other.count * other.mean ) / n, 0.0 )
+            delta = other.mean - media
+            m2 = self.m2 - other.m2 - np.where( n > 0, delta**2 * n * other.count / self.count, 0.0 )
+        # O que sobra de arredondamento não pode virar variância negativa
+        return Moments( n, media, np.where( n > 0, np.clip( m2, 0, None ), 0.0 ) )
+
+    def reduce( self, groups, n_groups ):
+        """ Junta os acumuladores por grupo ( k de uma vez, vetorizado ).
+
+            Input: código do grupo de cada acumulador ( 0..n-1 ), grupos
+            Output: Moments com um acumulador por grupo
+        """
+        n = np.bincount( groups, weights=self.count, minlength=n_groups )
+        with np.errstate( divide='ignore', invalid='ignore' ):
+            media = np.bincount( groups, weights=self.count * self.mean, minlength=n_groups ) / n
+        media = np.where( n > 0, media, 0.0 )
+        m2 = np.bincount( groups, weights=self.m2 + self.count * ( self.mean - media[groups] )**2,
+                          minlength=n_groups )
+        return Moments( n, media, m2 )
+
+    def total( self ):
+        """ Todos os acumuladores num só. """
+        return self.reduce( np.zeros( len( self.count ), dtype=np.int64 ), 1 )
+
+    def variance( self, ddof=1 ):
+        """ Variância ( amostral com ddof=1, como o .var() do pandas ); NaN
+            com menos de ddof + 1 valores.
+        """
+        with np.errstate( divide='ignore', invalid='ignore' ):
+            return np.where( self.count > ddof, self.m2 / ( self.count - ddof ), np.nan )
+
+    def std( self, ddof=1 ):
+        """ Desvio padrão ( ver variance ). """
+        return np.sqrt( self.variance( ddof ) )
+
+def group_codes( df2, by ):
+    """ Código do grupo de cada linha ( 0..n-1, na ordem de 'by' ); -1 nas
+        linhas com NaN em 'by', que ficam de fora como no groupby.
+
+        Input: Dataframe, dimensões do agrupamento ( vazio: tudo junto )
+        Output: array de códigos
+    """
+    chave = list( by ) or np.zeros( len( df2 ), dtype=np.int8 )
+    return df2.groupby( chave, observed=True, sort=True ).ngroup().to_numpy()
+
+def combine( df2, by, measures, parts=None ):
+    """ Junta linhas de acumuladores de um Dataframe ( colunas count,
+        <medida>_mean e <medida>_m2, ex.: as células do cubo ) por 'by'.
+        Com 'parts' ( a parte de cada linha, ex.: o cubo anterior e o das
+        linhas novas ), cada parte é juntada por grupo e as partes se somam
+        ao total uma a uma ( merge ), como numa atualização incremental.
+
+        Input: Dataframe, dimensões do agrupamento ( vazio: tudo junto ),
+               medidas, parte de cada linha ( opcional )
+        Output: Dataframe com 'by' no índice ( ordenado ), count,
+                <medida>_mean e <medida>_m2
+    """
+    by = list( by )
+    codigos = group_codes( df2, by )
+    if ( codigos < 0 ).any():
+        validas = codigos >= 0
+        df2, codigos = df2.loc[validas, :], codigos[validas]
+        parts = None if parts is None else np.asarray( parts )[validas]
+    primeira = np.unique( codigos, return_index=True )[1]
+
+    n_grupos = len( primeira )
+    colunas = { 'count' : np.bincount( codigos, weights=df2['count'], minlength=n_grupos ).astype( np.int64 ) }
+    for m in measures:
+        celulas = Moments( df2['count'], df2[m + '_mean'], df2[m + '_m2'] )
+        if parts is None:
+            grupos = celulas.reduce( codigos, n_grupos )
+        else:
+            grupos = None
+            for parte in np.unique( parts ):
+                linhas = np.asarray( parts ) == parte
+                parcial = celulas[linhas].reduce( codigos[linhas], n_grupos )
+                grupos = parcial if grupos is None else grupos.merge( parcial )
+        colunas[m + '_mean'] = grupos.mean
+        colunas[m + '_m2'] = grupos.m2
+    if by:
+        indice = pd.MultiIndex.from_frame( df2[by].iloc[primeira] ) if len( by ) > 1 else pd.Index( df2[by[0]].iloc[primeira] )
+    else:
+        indice = pd.RangeIndex( n_grupos )
+    return pd.DataFrame( colunas, index=indice ).sort_index()
+
+def rolling( moments, window ):
+    """ Acumuladores de janelas móveis de 'window' posições seguidas ( ex.:
+        dias ): a cada passo o dia novo entra na janela ( merge ) e o que
+        expirou sai dela ( remove ), sem somar a janela inteira de novo.
+
+        Input: Moments com um acumulador por posição, tamanho da janela
+        Output: Moments com o acumulador da janela que termina em cada posição
+    """
+    n = len( moments.count )
+    count, mean, m2 = np.zeros( n ), np.zeros( n ), np.zeros( n )
+    janela = Moments( 0.0, 0.0, 0.0 )
+    for i in range( n ):
+        janela = janela.merge( moments[i] )
+        if i >= window:
+            janela = janela.remove( moments[i - window] )
+        count[i], mean[i], m2[i] = janela.count, janela.mean, janela.m2
+    return Moments( count, mean, m2 )
@@ -0,0 +1,71 @@
+#------------------------------------------------------------------------------
+# Curry Company - Agregação paralela por partições ( pool de processos )
+#------------------------------------------------------------------------------
+
+# Libraries
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+#------------------------------------------------------------------------------
+# CONSTANTES
+#------------------------------------------------------------------------------
+
+# Processos do pool ( 1 = tudo no processo da página, sem pool )
+WORKERS = int( os.environ.get( 'CURRY_WORKERS', '1' ) )
+
+# Abaixo disso o custo de enviar as partições aos processos não compensa
+PARALLEL_MIN_ROWS = 200000
+
+# Pool do processo: quantidade de processos -> executor
+_POOLS = {}
+_LOCK = threading.Lock()
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+def _pool( workers ):
+    # Um pool por processo, criado na primeira chamada. 'spawn' porque o
+    # servidor do Streamlit tem várias threads ( fork poderia herdar locks )
+    with _LOCK:
+        if workers not in _POOLS:
+            contexto = multiprocessing.get_context( 'spawn' )
+            _POOLS[workers] = ProcessPoolExecutor( workers, mp_context=contexto )
+        return _POOLS[workers]
+
+def partitions( df1, by, n ):
+    """ Divide as linhas em até n partições pelos valores de 'by': todas as
+        linhas de um mesmo valor ficam na mesma partição, valores vizinhos
+        ( ordenados ) ficam juntos e as partições têm tamanhos parecidos.
+        Dentro de cada partição a ordem original das linhas é mantida.
+
+        Input: Dataframe, coluna de partição, quantidade de partições
+        Output: lista de Dataframes
+    """
+    codigos, valores = pd.factorize( df1[by], sort=True )
+    tamanhos = np.bincount( codigos[codigos >= 0], minlength=len( valores ) )
+    # Partição de cada valor: corta a soma acumulada em n faixas iguais
+    acumulado = np.cumsum( tamanhos ) - tamanhos
+    particao = np.minimum( acumulado * n // max( len( df1 ), 1 ), n - 1 )
+    # Linhas sem valor ( NaN ) vão para a última partição
+    destino = np.where( codigos >= 0, particao[codigos], n - 1 )
+    return [ df1.iloc[np.flatnonzero( destino == p )] for p in np.unique( destino ) ]
+
+def map_partitions( func, df1, by, *args, workers=WORKERS ):
+    """ Aplica func( partição, *args ) a cada partição de df1 ( ver partitions ),
+        em paralelo no pool de processos quando houver linhas suficientes.
+        func precisa ser uma função de módulo ( serializável ).
+
+        Input: função, Dataframe, coluna de partição, argumentos, processos
+        Output: lista com o resultado de cada partição, na ordem de 'by'
+    """
+    if workers <= 1 or len( df1 ) < PARALLEL_MIN_ROWS:
+        return [ func( df1, *args ) ]
+    partes = partitions( df1, by, workers )
+    futuros = [ _pool( workers ).submit( func, parte, *args ) for parte in partes ]
+    return [ f.result() for f in futuros ]
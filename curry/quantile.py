@@ -0,0 +1,193 @@
+#------------------------------------------------------------------------------
+# Curry Company - Sketches de quantis ( percentis ) por célula, somáveis
+#------------------------------------------------------------------------------
+
+# Libraries
+import threading
+
+import numpy as np
+import pandas as pd
+
+from curry.cells import cell_mask, incremental_cache
+from curry.data import DATA_PATH
+from curry.moments import group_codes
+from curry.schema import plain
+from curry.sketch import DIMENSOES_SKETCH
+
+#------------------------------------------------------------------------------
+# CONSTANTES
+#------------------------------------------------------------------------------
+
+# Erro relativo máximo de cada quantil estimado, por medida, enquanto a
+# célula tem até MAX_BALDES baldes. Os tempos são minutos inteiros ( 10 a
+# 54 ): com 0.5% cada minuto tem o seu balde e o quantil arredondado é exato.
+# Nas coordenadas, 1e-4 de ~20 graus dá ~0.002 grau ( ~200 m ).
+PRECISAO_RELATIVA = {
+    'Time_taken(min)' : 0.005,
+    'distance' : 0.005,
+    'Delivery_location_latitude' : 1e-4,
+    'Delivery_location_longitude' : 1e-4,
+}
+
+# Máximo de baldes por célula e medida. Acima dele os baldes vizinhos se
+# juntam dois a dois ( gama -> gama², o erro relativo dobra; como no
+# UDDSketch ) até caber: o tamanho dos sketches fica limitado pelas células,
+# não pelas linhas. No train.csv nenhuma célula chega ao limite; com 1M de
+# linhas do bench/generate.py ( coordenadas uniformes em ~20 graus ) a
+# latitude colapsa 6 vezes: erro de até ~0.6% ( ~0.12 grau ) na mediana.
+MAX_BALDES = 128
+
+QUANTIS = ( 0.5, 0.9, 0.99 )
+
+# Cache do processo: chave (arquivo, medidas) -> sketches
+_CACHE = {}
+_LOCK = threading.Lock()
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+def _gama( alfa ):
+    return ( 1 + alfa ) / ( 1 - alfa )
+
+def _baldes( valores, alfa ):
+    # Balde logarítmico de cada valor ( como no DDSketch ): o balde i cobre
+    # ( gama**(i-1), gama**i ]. Sinal nos 2 bits de baixo: 1 positivo,
+    # 2 negativo, 0 zero.
+    absoluto = np.abs( valores )
+    with np.errstate( divide='ignore' ):
+        indice = np.ceil( np.log( absoluto ) / np.log( _gama( alfa ) ) )
+    indice = np.where( absoluto > 0, indice, 0 ).astype( np.int64 )
+    sinal = np.where( valores > 0, 1, np.where( valores < 0, 2, 0 ) )
+    return indice * 4 + sinal
+
+def _valores( baldes, alfa, niveis=0 ):
+    # Valor representativo de cada balde: erro relativo de no máximo alfa
+    # para qualquer valor do balde ( a cada nível de colapso, gama ao quadrado )
+    gama = _gama( alfa ) ** ( 2.0 ** np.asarray( niveis ) )
+    sinal = np.where( baldes & 3 == 1, 1.0, np.where( baldes & 3 == 2, -1.0, 0.0 ) )
+    return sinal * 2 * gama**( baldes >> 2 ) / ( gama + 1 )
+
+def _sobe( baldes, passos ):
+    # Balde de cada valor depois de 'passos' colapsos: o balde i de gama vai
+    # para o balde ceil( i / 2 ) de gama²
+    indice = -( -( baldes >> 2 ) >> passos )
+    return indice * 4 + ( baldes & 3 )
+
+def _colapsa( df2, chaves ):
+    # Põe cada grupo de 'chaves' ( célula e medida ) no maior nível entre as
+    # suas linhas, soma as contagens de cada balde e colapsa os grupos com
+    # mais de MAX_BALDES baldes até caberem. Tudo em arrays, pelo código do
+    # grupo de cada linha.
+    grupos = group_codes( df2, chaves )
+    validas = np.flatnonzero( grupos >= 0 )
+    grupos = grupos[validas]
+    primeira = np.unique( grupos, return_index=True )[1]
+    baldes = df2['bucket'].to_numpy()[validas]
+    contagens = df2['count'].to_numpy()[validas]
+    nivel = np.zeros( len( primeira ), dtype=np.int64 )
+    np.maximum.at( nivel, grupos, df2['level'].to_numpy()[validas] )
+    passos = nivel[grupos] - df2['level'].to_numpy()[validas]
+    while True:
+        baldes = _sobe( baldes, passos )
+        ordem = np.lexsort( ( baldes, grupos ) )
+        grupos, baldes, contagens = grupos[ordem], baldes[ordem], contagens[ordem]
+        novo = np.ones( len( grupos ), dtype=bool )
+        novo[1:] = ( grupos[1:] != grupos[:-1] ) | ( baldes[1:] != baldes[:-1] )
+        inicio = np.flatnonzero( novo )
+        grupos, baldes, contagens = grupos[inicio], baldes[inicio], np.add.reduceat( contagens, inicio )
+        cheios = np.bincount( grupos, minlength=len( nivel ) ) > MAX_BALDES
+        if not cheios.any():
+            break
+        nivel += cheios
+        passos = cheios[grupos].astype( np.int64 )
+
+    df3 = df2[chaves].iloc[validas[primeira[grupos]]].reset_index( drop=True )
+    df3['level'] = nivel[grupos].astype( np.int8 )
+    df3['bucket'] = baldes
+    df3['count'] = contagens
+    return df3
+
+def build_quantiles( df1, measures=tuple( PRECISAO_RELATIVA ), dimensions=DIMENSOES_SKETCH ):
+    """ Sketch de quantis de cada medida por célula ( dia x trânsito x cidade ):
+        a contagem de valores por balde logarítmico ( ver _baldes ), com no
+        máximo MAX_BALDES baldes por célula e medida ( 'level': quantas vezes
+        os baldes foram colapsados ). Como no cubo ( ver curry/cube.py ), as
+        contagens são somáveis: qualquer seleção de células dá os quantis com
+        erro relativo de no máximo PRECISAO_RELATIVA x 2**level, sem voltar
+        às linhas.
+
+        Input: Dataframe limpo, medidas, dimensões das células
+        Output: Dataframe com as dimensões, measure, level, bucket e count
+    """
+    dimensoes = list( dimensions )
+    partes = []
+    for medida in measures:
+        valores = df1[medida].to_numpy( dtype=float )
+        validas = ~np.isnan( valores )
+        df2 = df1.loc[validas, dimensoes]
+        df2['bucket'] = _baldes( valores[validas], PRECISAO_RELATIVA[medida] )
+        df2['level'] = np.int8( 0 )
+        df2['count'] = 1
+        df2 = _colapsa( df2, dimensoes )
+        df2.insert( len( dimensoes ), 'measure', medida )
+        partes.append( df2 )
+    return pd.concat( partes, ignore_index=True ).astype( { 'measure' : 'category' } )
+
+def merge_quantiles( *partes ):
+    """ Junta sketches de quantis ( ex.: partições por data, ou a versão
+        anterior e as linhas acrescentadas ), somando as contagens de cada
+        célula no maior nível de colapso das partes ( ver build_quantiles ).
+    """
+    chaves = [ c for c in partes[0].columns if c not in ( 'level','bucket','count' ) ]
+    return _colapsa( pd.concat( partes, ignore_index=True ), chaves ).astype( { 'measure' : 'category' } )
+
+def load_quantiles( measures=tuple( PRECISAO_RELATIVA ), path=DATA_PATH ):
+    """ Sketches de quantis do dataset atual, calculados uma única vez por
+        processo e versão do arquivo, por partições de datas; se a versão atual
+        só acrescentou linhas, só as novas são processadas ( como load_cube ).
+
+        Input: medidas, caminho do CSV
+        Output: Dataframe dos sketches ( ver build_quantiles )
+    """
+    return incremental_cache( _CACHE, _LOCK, build_quantiles, merge_quantiles, path,
+                              DIMENSOES_SKETCH + list( measures ), tuple( measures ), name='quantis' )
+
+def slice_quantiles( sketches, date_limit, traffic_options ):
+    """ Aplica os filtros da barra lateral ( data limite e trânsito ) às
+        células dos sketches de quantis.
+    """
+    return sketches.loc[cell_mask( sketches, date_limit, traffic_options ), :]
+
+def quantiles( sketches, measure, by=(), qs=QUANTIS ):
+    """ Quantis de uma medida por 'by', juntando as células de cada grupo.
+        O quantil q é o valor na posição q x ( n - 1 ) dos valores ordenados
+        ( sem interpolar entre dois valores ), com erro relativo de no máximo
+        PRECISAO_RELATIVA[measure] x 2**level ( o maior nível das células do
+        grupo ).
+
+        Input: sketches ( ou fatia ), medida, dimensões do agrupamento
+               ( vazio: todas as células juntas ), quantis
+        Output: Dataframe com 'by', count e p50 / p90 / p99 ...
+    """
+    by = list( by ) or ['_todas']
+    df2 = sketches.loc[sketches['measure'] == measure, :].assign( _todas=0 )
+    # As células de um grupo vão para o mesmo nível antes de somar ( sem o
+    # limite de baldes: o resultado é só desta consulta )
+    nivel = df2.groupby( by, observed=True )['level'].transform( 'max' ).to_numpy()
+    df2['bucket'] = _sobe( df2['bucket'].to_numpy(), nivel - df2['level'].to_numpy() )
+    df2['level'] = nivel
+    df2 = plain( df2.groupby( by + ['level','bucket'], observed=True )['count'].sum().reset_index() )
+    df2['value'] = _valores( df2['bucket'].to_numpy(), PRECISAO_RELATIVA[measure], df2['level'].to_numpy() )
+    df2 = df2.sort_values( by + ['value'], kind='stable' )
+    grupos = df2.groupby( by )
+    acumulado = grupos['count'].cumsum()
+    total = grupos['count'].transform( 'sum' )
+
+    resultado = grupos['count'].sum().to_frame()
+    for q in qs:
+        # Primeiro balde em que a contagem acumulada passa da posição do quantil
+        primeiro = df2.loc[acumulado > q * ( total - 1 ), :].groupby( by ).first()
+        resultado['p{:g}'.format( 100 * q )] = primeiro['value']
+    resultado = resultado.reset_index()
+    return resultado.drop( columns='_todas' ) if by == ['_todas'] else resultado
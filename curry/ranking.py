@@ -0,0 +1,120 @@
+#------------------------------------------------------------------------------
+# Curry Company - Ranking dos entregadores mais rápidos / lentos por cidade
+#------------------------------------------------------------------------------
+
+# Libraries
+import numpy as np
+import pandas as pd
+
+from curry.cube import rollup
+
+#------------------------------------------------------------------------------
+# CONSTANTES
+#------------------------------------------------------------------------------
+
+TOP_K = 10
+
+COLUNAS_RANKING = ['City','Delivery_person_ID','Time_taken(min)']
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+def _menores( valores, k ):
+    # Posições dos k menores valores, sem ordenar o array inteiro: a seleção
+    # parcial acha o k-ésimo valor e só os candidatos até ele são ordenados.
+    # Empates ficam na ordem original ( a mesma de um sort estável ).
+    if len( valores ) > k:
+        limite = np.partition( valores, k - 1 )[k - 1]
+        candidatos = np.flatnonzero( valores <= limite )
+    else:
+        candidatos = np.arange( len( valores ) )
+    ordem = np.lexsort( ( candidatos, valores[candidatos] ) )
+    return candidatos[ordem][:k]
+
+def top_k_by_city( medias, k=TOP_K, ascending=True ):
+    """ Os k entregadores de menor ( ascending=True ) ou maior tempo médio
+        de cada cidade. As cidades vêm dos dados, da com mais pedidos para
+        a com menos.
+
+        Input: Dataframe com City, Delivery_person_ID, Time_taken(min) e
+               count ( um entregador por linha e cidade ), k, sentido
+        Output: Dataframe com COLUNAS_RANKING, k linhas por cidade
+    """
+    codigos, cidades = pd.factorize( medias['City'] )
+    pedidos = np.bincount( codigos, weights=medias['count'].to_numpy(), minlength=len( cidades ) )
+    tempo = medias['Time_taken(min)'].to_numpy( dtype=float )
+    if not ascending:
+        tempo = -tempo
+    posicoes = []
+    for cidade in np.argsort( -pedidos, kind='stable' ):
+        linhas = np.flatnonzero( codigos == cidade )
+        posicoes.append( linhas[_menores( tempo[linhas], k )] )
+    posicoes = np.concatenate( posicoes ) if posicoes else np.array( [], dtype=int )
+    return medias.iloc[posicoes].loc[:, COLUNAS_RANKING].reset_index( drop=True )
+
+def driver_means( cubo ):
+    """ Tempo médio de entrega e quantidade de pedidos por cidade e
+        entregador, somando as células do cubo.
+    """
+    return ( rollup( cubo, ['City','Delivery_person_ID'], ['Time_taken(min)'] )
+                .rename( columns={'Time_taken(min)_mean':'Time_taken(min)'} )
+                .drop( columns='Time_taken(min)_std' ) )
+
+def rank_drivers( cubo, k=TOP_K ):
+    """ Mais rápidos e mais lentos de cada cidade com um único rollup.
+
+        Input: cubo ( ou fatia ) com City e Delivery_person_ID
+        Output: ( mais rápidos, mais lentos )
+    """
+    medias = driver_means( cubo )
+    return top_k_by_city( medias, k, ascending=True ), top_k_by_city( medias, k, ascending=False )
+
+class DriverRanking:
+    """ Ranking mantido enquanto os pedidos chegam em lotes ( ex.: blocos do
+        CSV, ver curry/stream.py ). Guarda a soma e a quantidade de tempos
+        por cidade e entregador e os k primeiros de cada ponta por cidade;
+        a cada lote só as cidades que receberam pedidos são reclassificadas.
+
+        Uso:
+            ranking = DriverRanking( k=10 )
+            for df1 in blocos:
+                ranking.update( df1 )
+            rapidos, lentos = ranking.fastest(), ranking.slowest()
+    """
+
+    def __init__( self, k=TOP_K ):
+        self.k = k
+        # Soma e quantidade de tempos por ( cidade, entregador )
+        self._soma = None
+        self._rapidos = {}
+        self._lentos = {}
+
+    def update( self, df1 ):
+        """ Junta um lote de pedidos limpos ( City, Delivery_person_ID,
+            Time_taken(min) ).
+        """
+        parcial = ( df1['Time_taken(min)'].astype( float )
+                       .groupby( [df1['City'], df1['Delivery_person_ID']], observed=True )
+                       .agg( ['sum','count'] ) )
+        self._soma = parcial if self._soma is None else self._soma.add( parcial, fill_value=0 )
+        for cidade in parcial.index.unique( 'City' ):
+            linhas = self._soma.xs( cidade, level='City', drop_level=False ).reset_index()
+            linhas['Time_taken(min)'] = linhas['sum'] / linhas['count']
+            self._rapidos[cidade] = top_k_by_city( linhas, self.k, ascending=True )
+            self._lentos[cidade] = top_k_by_city( linhas, self.k, ascending=False )
+
+    def _junta( self, partes ):
+        if self._soma is None:
+            return pd.DataFrame( columns=COLUNAS_RANKING )
+        pedidos = self._soma['count'].groupby( level='City' ).sum().sort_values( ascending=False, kind='stable' )
+        tabelas = [ partes[c] for c in pedidos.index ]
+        return pd.concat( tabelas ).reset_index( drop=True )
+
+    def fastest( self ):
+        """ Os k mais rápidos de cada cidade até aqui. """
+        return self._junta( self._rapidos )
+
+    def slowest( self ):
+        """ Os k mais lentos de cada cidade até aqui. """
+        return self._junta( self._lentos )
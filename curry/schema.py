@@ -0,0 +1,142 @@
+#------------------------------------------------------------------------------
+# Curry Company - Esquema compacto do Dataframe de pedidos
+#------------------------------------------------------------------------------
+
+# Libraries
+import numpy as np
+import pandas as pd
+
+#------------------------------------------------------------------------------
+# CONSTANTES
+#------------------------------------------------------------------------------
+
+# Colunas de texto com poucos valores distintos: dicionário + códigos inteiros
+CATEGORICAS = ['Delivery_person_ID','Weatherconditions','Road_traffic_density','Type_of_order',
+               'Type_of_vehicle','Festival','City','Time_Orderd','Time_Order_picked']
+
+# Inteiros pequenos ( idade, condição do veículo, entregas, minutos )
+INTEIROS = ['Delivery_person_Age','Vehicle_condition','multiple_deliveries','Time_taken(min)']
+
+# Coordenadas: float32 ( ~1 m de precisão ) basta para o mapa. A avaliação e a
+# distância continuam float64, para que médias e desvios não mudem.
+COORDENADAS = ['Restaurant_latitude','Restaurant_longitude',
+               'Delivery_location_latitude','Delivery_location_longitude']
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+# Valor de cada caractere hexadecimal ( tabela por código; -1: inválido )
+_HEXA = np.full( 128, -1, dtype=np.int64 )
+for _i, _c in enumerate( '0123456789abcdef' ):
+    _HEXA[ord( _c )] = _HEXA[ord( _c.upper() )] = _i
+
+# Dígitos hexadecimais que cabem num int64 sem estourar
+_DIGITOS_ID = 15
+
+def _ids_inteiros( serie ):
+    # IDs dos pedidos ( '0x4607' ) como inteiros, se todos forem hexadecimais
+    # e nenhum par de textos diferentes virar o mesmo número. Vetorizado: os
+    # textos viram uma matriz de códigos ( uma linha por ID ) e cada dígito é
+    # multiplicado pela potência de 16 da sua posição.
+    if len( serie ) == 0 or pd.api.types.infer_dtype( serie, skipna=False ) != 'string':
+        return serie
+    textos = serie.to_numpy().astype( str )
+    largura = textos.dtype.itemsize // 4
+    if largura < 3 or largura > _DIGITOS_ID + 2:
+        return serie
+    codigos = textos.view( np.uint32 ).reshape( -1, largura )
+    tamanho = np.count_nonzero( codigos, axis=1 )
+    if ( tamanho < 3 ).any() or ( codigos[:, 0] != ord( '0' ) ).any() or \
+       ( ( codigos[:, 1] | 0x20 ) != ord( 'x' ) ).any():
+        return serie
+    posicao = np.arange( 2, largura )
+    dentro = posicao < tamanho[:, None]
+    digitos = _HEXA[np.minimum( codigos[:, 2:], 127 )]
+    if ( dentro & ( digitos < 0 ) ).any():
+        return serie
+    expoente = np.where( dentro, tamanho[:, None] - 1 - posicao, 0 )
+    valores = np.where( dentro, digitos * 16**expoente, 0 ).sum( axis=1 )
+    if len( np.unique( valores ) ) != serie.nunique():
+        return serie
+    return pd.Series( valores, index=serie.index, name=serie.name )
+
+def compact( df1 ):
+    """ Converte o Dataframe limpo para o esquema compacto:
+          - textos de poucos valores distintos ( cidade, trânsito, clima,
+            entregador... ) viram category ( códigos inteiros + dicionário );
+            os agrupamentos por essas colunas usam os códigos
+          - o ID do pedido vira o inteiro do seu valor hexadecimal
+          - inteiros e coordenadas com a menor largura que comporta os valores
+
+        Os valores não mudam ( 'Yes ', 'Urban', ... ); só a representação.
+
+        Input: Dataframe limpo
+        Output: o mesmo Dataframe, compactado
+    """
+    for coluna in CATEGORICAS:
+        if coluna in df1 and df1[coluna].dtype == object:
+            df1[coluna] = df1[coluna].astype( 'category' )
+    for coluna in INTEIROS:
+        if coluna in df1:
+            df1[coluna] = pd.to_numeric( df1[coluna], downcast='integer' )
+    for coluna in COORDENADAS:
+        if coluna in df1:
+            df1[coluna] = df1[coluna].astype( np.float32 )
+    if 'ID' in df1:
+        df1['ID'] = _ids_inteiros( df1['ID'] )
+    return df1
+
+def append_compact( *partes ):
+    """ Junta partes já compactadas ( ex.: o snapshot anterior e as linhas
+        novas, ou os segmentos de uma versão ) sem recompactar nenhuma: as
+        categorias de cada coluna viram a união das partes ( as da primeira
+        primeiro, para que os códigos antigos não mudem ) e o concat mantém o
+        tipo category.
+
+        Input: Dataframes compactos ( ver compact ), na ordem
+        Output: Dataframe compacto com todas as partes
+    """
+    partes = list( partes )
+    for coluna in CATEGORICAS:
+        if all( coluna in parte for parte in partes ):
+            uniao = partes[0][coluna].astype( 'category' ).cat.categories
+            for parte in partes[1:]:
+                uniao = uniao.append( parte[coluna].astype( 'category' ).cat.categories.difference( uniao ) )
+            for parte in partes:
+                parte[coluna] = parte[coluna].astype( 'category' ).cat.set_categories( uniao )
+    if all( 'ID' in parte for parte in partes ) and len( { parte['ID'].dtype == object for parte in partes } ) > 1:
+        # Partes com IDs inteiros e outras em texto ( não hexadecimal ):
+        # tudo volta a texto
+        for parte in partes:
+            if parte['ID'].dtype != object:
+                parte['ID'] = parte['ID'].map( '0x{:04x}'.format )
+    return pd.concat( partes )
+
+def plain( df2 ):
+    """ Colunas category de volta a texto, para resultados pequenos ( agregados )
+        que vão para gráficos e JSON: o plotly e o to_json não lidam bem com
+        categorias sem linhas depois dos filtros.
+    """
+    for coluna in df2.columns:
+        if isinstance( df2[coluna].dtype, pd.CategoricalDtype ):
+            df2[coluna] = df2[coluna].astype( object )
+    return df2
+
+def memory_report( antes, depois ):
+    """ Bytes por linha de cada coluna antes e depois da compactação
+        ( memory_usage com deep=True: conta o conteúdo dos textos ).
+
+        Input: Dataframe original, Dataframe compacto
+        Output: Dataframe com uma linha por coluna e o total
+    """
+    linhas = max( len( antes ), 1 )
+    df2 = pd.DataFrame( {
+        'dtype_antes' : antes.dtypes.astype( str ),
+        'bytes_linha_antes' : antes.memory_usage( index=False, deep=True ) / linhas,
+        'dtype_depois' : depois.dtypes.astype( str ),
+        'bytes_linha_depois' : depois.memory_usage( index=False, deep=True ) / linhas,
+    } )
+    df2.loc['TOTAL'] = ['', df2['bytes_linha_antes'].sum(), '', df2['bytes_linha_depois'].sum()]
+    df2['reducao'] = 1 - df2['bytes_linha_depois'] / df2['bytes_linha_antes']
+    return df2
@@ -0,0 +1,168 @@
+#------------------------------------------------------------------------------
+# Curry Company - Serviço HTTP dos indicadores em JSON ( sem Streamlit )
+#
+# Uso ( a partir da raiz do projeto ):
+#     python -m curry.service --port 8600
+#
+#     GET /metrics                         -> lista de indicadores
+#     GET /metrics/<nome>?date=2022-04-13&traffic=Low,Medium
+#------------------------------------------------------------------------------
+
+# Libraries
+import argparse
+import asyncio
+import collections
+import json
+import urllib.parse
+
+import numpy as np
+import pandas as pd
+
+from curry.data import DATA_PATH, file_key
+from curry.metrics import CONSULTAS, query
+
+#------------------------------------------------------------------------------
+# CONSTANTES
+#------------------------------------------------------------------------------
+
+# Filtros padrão da barra lateral das páginas
+DATA_PADRAO = '2022-04-13'
+TRANSITO_PADRAO = ( 'Low', 'Medium' )
+
+# Quantas respostas ( indicador x filtros x versão do arquivo ) ficam em cache
+CACHE_ENTRIES = 256
+
+STATUS = { 200 : 'OK', 400 : 'Bad Request', 404 : 'Not Found', 405 : 'Method Not Allowed',
+           500 : 'Internal Server Error' }
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+def _json_default( valor ):
+    # Tipos do numpy / pandas que o json não conhece
+    if isinstance( valor, np.generic ):
+        return valor.item()
+    if isinstance( valor, pd.Timestamp ):
+        return valor.isoformat()
+    raise TypeError( repr( valor ) )
+
+def to_json( resultado ):
+    """ Resultado de metrics.query em JSON: Dataframes viram listas de
+        registros, com datas em ISO 8601 e NaN como null.
+    """
+    if isinstance( resultado, pd.DataFrame ):
+        return resultado.to_json( orient='records', date_format='iso' )
+    valores = { k : ( None if isinstance( v, float ) and np.isnan( v ) else v )
+                for k, v in resultado.items() }
+    return json.dumps( valores, default=_json_default )
+
+class MetricsService:
+    """ Responde às consultas de indicadores ( ver curry/metrics.py ) com os
+        mesmos filtros das páginas: data limite e condições de trânsito.
+        - As respostas ficam num cache LRU por ( indicador, filtros, versão
+          do CSV ): um train.csv novo invalida o cache sozinho.
+        - Pedidos simultâneos da mesma consulta esperam um único cálculo.
+        - O cálculo ( pandas ) roda numa thread, sem bloquear o loop.
+    """
+
+    def __init__( self, path=DATA_PATH, cache_entries=CACHE_ENTRIES ):
+        self.path = path
+        self.cache_entries = cache_entries
+        self._cache = collections.OrderedDict()
+        self._em_andamento = {}
+
+    async def metric( self, nome, date_limit, traffic_options ):
+        """ JSON do indicador ( do cache, se houver ). """
+        chave = ( nome, date_limit, traffic_options, file_key( self.path ) )
+        if chave in self._cache:
+            self._cache.move_to_end( chave )
+            return self._cache[chave]
+        if chave not in self._em_andamento:
+            loop = asyncio.get_running_loop()
+            self._em_andamento[chave] = loop.run_in_executor(
+                None, lambda: to_json( query( nome, date_limit, traffic_options, self.path ) ) )
+        try:
+            corpo = await asyncio.shield( self._em_andamento[chave] )
+        finally:
+            self._em_andamento.pop( chave, None )
+        self._cache[chave] = corpo
+        while len( self._cache ) > self.cache_entries:
+            self._cache.popitem( last=False )
+        return corpo
+
+    async def handle( self, metodo, alvo ):
+        """ Input: método e alvo ( caminho + query string ) do pedido HTTP
+            Output: ( status, corpo JSON )
+        """
+        if metodo != 'GET':
+            return 405, json.dumps( { 'error' : 'use GET' } )
+        url = urllib.parse.urlsplit( alvo )
+        partes = [ p for p in url.path.split( '/' ) if p ]
+        if partes == ['metrics']:
+            return 200, json.dumps( sorted( CONSULTAS ) )
+        if len( partes ) != 2 or partes[0] != 'metrics' or partes[1] not in CONSULTAS:
+            return 404, json.dumps( { 'error' : 'indicador desconhecido', 'metrics' : sorted( CONSULTAS ) } )
+
+        parametros = urllib.parse.parse_qs( url.query )
+        try:
+            date_limit = pd.Timestamp( parametros.get( 'date', [DATA_PADRAO] )[0] )
+        except ValueError:
+            return 400, json.dumps( { 'error' : 'date inválida ( use AAAA-MM-DD )' } )
+        if 'traffic' in parametros:
+            traffic_options = tuple( t for t in parametros['traffic'][0].split( ',' ) if t )
+        else:
+            traffic_options = TRANSITO_PADRAO
+        return 200, await self.metric( partes[1], date_limit, traffic_options )
+
+    async def connection( self, reader, writer ):
+        # HTTP/1.1 mínimo, com keep-alive: cada conexão pode fazer vários pedidos
+        try:
+            while True:
+                linha = await reader.readline()
+                if not linha:
+                    break
+                try:
+                    metodo, alvo, versao = linha.decode( 'latin-1' ).split()
+                except ValueError:
+                    break
+                cabecalhos = {}
+                while True:
+                    cabecalho = await reader.readline()
+                    if cabecalho in ( b'\r\n', b'\n', b'' ):
+                        break
+                    nome, _, valor = cabecalho.decode( 'latin-1' ).partition( ':' )
+                    cabecalhos[nome.strip().lower()] = valor.strip().lower()
+
+                try:
+                    status, corpo = await self.handle( metodo, alvo )
+                except Exception as erro:
+                    status, corpo = 500, json.dumps( { 'error' : repr( erro ) } )
+                dados = corpo.encode( 'utf-8' )
+                fechar = cabecalhos.get( 'connection' ) == 'close' or versao == 'HTTP/1.0'
+                writer.write( ( 'HTTP/1.1 {} {}\r\n'
+                                'Content-Type: application/json; charset=utf-8\r\n'
+                                'Content-Length: {}\r\n'
+                                'Connection: {}\r\n\r\n' ).format(
+                                    status, STATUS[status], len( dados ),
+                                    'close' if fechar else 'keep-alive' ).encode( 'latin-1' ) + dados )
+                await writer.drain()
+                if fechar:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve( self, host='127.0.0.1', port=8600 ):
+        servidor = await asyncio.start_server( self.connection, host, port )
+        async with servidor:
+            await servidor.serve_forever()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Serviço HTTP dos indicadores do Dashboard' )
+    parser.add_argument( '--host', default='127.0.0.1' )
+    parser.add_argument( '--port', type=int, default=8600 )
+    parser.add_argument( '--csv', default=DATA_PATH )
+    args = parser.parse_args()
+    asyncio.run( MetricsService( args.csv ).serve( args.host, args.port ) )
@@ -0,0 +1,205 @@
+#------------------------------------------------------------------------------
+# Curry Company - Contagem aproximada de distintos ( HyperLogLog ) por célula
+#------------------------------------------------------------------------------
+
+# Libraries
+import os
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from curry.buckets import add_buckets
+from curry.cells import cell_mask, incremental_cache
+from curry.data import DATA_PATH
+
+#------------------------------------------------------------------------------
+# CONSTANTES
+#------------------------------------------------------------------------------
+
+# Células dos sketches: um por dia x trânsito x cidade ( as dimensões de
+# filtro da barra lateral, ver curry/cube.py, mais a cidade )
+DIMENSOES_SKETCH = ['Order_Date','Road_traffic_density','City']
+
+# 2**PRECISAO registradores de 1 byte por célula. Erro padrão relativo da
+# estimativa: 1.04 / sqrt( 2**PRECISAO ) = 1.6%. Para poucos distintos
+# ( até ~2.5 x 4096 ) a contagem linear usada é bem mais precisa que isso.
+PRECISAO = 12
+ERRO_PADRAO = 1.04 / np.sqrt( 2**PRECISAO )
+
+# Agregados das páginas pelos sketches ( distintos aqui, quantis em
+# curry/quantile.py ) ou pelas linhas: 'exact', 'sketch' ou 'auto' ( sketch a
+# partir de SKETCH_MIN_ROWS linhas filtradas )
+SKETCH_MODE = os.environ.get( 'CURRY_SKETCHES', 'auto' )
+SKETCH_MIN_ROWS = 1000000
+
+# Células ( Dataframe com as dimensões e 'count' ) e os registradores de cada
+# uma ( array células x 2**precisão, uint8 ), na mesma ordem
+Sketches = namedtuple( 'Sketches', ['cells','registers'] )
+
+# Cache do processo: chave (arquivo, coluna) -> Sketches
+_CACHE = {}
+_LOCK = threading.Lock()
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+def use_sketches( rows, mode=None ):
+    """ Se os agregados devem vir dos sketches ( True ) ou das linhas.
+
+        Input: quantidade de linhas filtradas, modo ( padrão: SKETCH_MODE,
+               da variável de ambiente CURRY_SKETCHES )
+    """
+    mode = mode or SKETCH_MODE
+    if mode not in ( 'exact', 'sketch', 'auto' ):
+        raise ValueError( 'CURRY_SKETCHES deve ser exact, sketch ou auto: {}'.format( mode ) )
+    return mode == 'sketch' or ( mode == 'auto' and rows >= SKETCH_MIN_ROWS )
+
+def _hashes( serie ):
+    # Hash de 64 bits estável dos valores ( o mesmo para texto e category ) e
+    # a máscara das linhas com valor
+    if isinstance( serie.dtype, pd.CategoricalDtype ):
+        codigos = serie.cat.codes.to_numpy()
+        validos = codigos >= 0
+        categorias = pd.util.hash_array( serie.cat.categories.to_numpy( dtype=object ) )
+        return categorias[np.where( validos, codigos, 0 )], validos
+    valores = serie.to_numpy( dtype=object )
+    validos = ~pd.isna( valores )
+    return pd.util.hash_array( np.where( validos, valores, '' ) ), validos
+
+def _bits( x ):
+    # Quantidade de bits significativos de cada uint64 ( 0 para 0 ), exata:
+    # cada metade de 32 bits cabe sem arredondamento num float64
+    def metade( v ):
+        with np.errstate( divide='ignore' ):
+            return np.where( v > 0, np.floor( np.log2( v.astype( float ) ) ) + 1, 0 ).astype( np.int64 )
+    alto = x >> np.uint64( 32 )
+    return np.where( alto > 0, 32 + metade( alto ), metade( x & np.uint64( 0xFFFFFFFF ) ) )
+
+def _celulas( df2, dimensoes ):
+    # Código de célula de cada linha ( -1 se faltar alguma dimensão ) e as
+    # células distintas, em ordem
+    chave = np.zeros( len( df2 ), dtype=np.int64 )
+    valido = np.ones( len( df2 ), dtype=bool )
+    for coluna in dimensoes:
+        codigos, valores = pd.factorize( df2[coluna], sort=True )
+        chave = chave * ( len( valores ) + 1 ) + codigos
+        valido &= codigos >= 0
+    unicas, celula = np.unique( np.where( valido, chave, -1 ), return_inverse=True )
+    if len( unicas ) and unicas[0] == -1:
+        celula = celula - 1
+    primeira = np.unique( celula[celula >= 0], return_index=True )[1]
+    linhas = np.flatnonzero( celula >= 0 )[primeira]
+    return celula, df2.iloc[linhas].loc[:, list( dimensoes )].reset_index( drop=True )
+
+def build_sketches( df1, column='Delivery_person_ID', dimensions=DIMENSOES_SKETCH, precision=PRECISAO ):
+    """ Um sketch HyperLogLog dos valores de 'column' por célula ( dia x
+        trânsito x cidade ): cada valor vira um hash de 64 bits; os primeiros
+        'precision' bits escolhem o registrador e ele guarda a maior posição
+        do primeiro bit 1 do restante. Valores repetidos não mudam nada, e a
+        união de células é o máximo registrador a registrador ( ver
+        merge_sketches ). Memória: células x 2**precision bytes.
+
+        Input: Dataframe limpo, coluna, dimensões das células, precisão
+        Output: Sketches
+    """
+    m = 2**precision
+    celula, cells = _celulas( df1, dimensions )
+    hashes, validos = _hashes( df1[column] )
+    validos &= celula >= 0
+
+    hashes = hashes[validos]
+    registrador = ( hashes >> np.uint64( 64 - precision ) ).astype( np.int64 )
+    resto = hashes & np.uint64( 2**( 64 - precision ) - 1 )
+    posicao = ( 64 - precision ) - _bits( resto ) + 1
+
+    registers = np.zeros( ( len( cells ), m ), dtype=np.uint8 )
+    maximos = pd.Series( posicao ).groupby( celula[validos] * m + registrador ).max()
+    registers.reshape( -1 )[maximos.index.to_numpy()] = maximos.to_numpy()
+    cells['count'] = np.bincount( celula[celula >= 0], minlength=len( cells ) )
+    return Sketches( cells, registers )
+
+def _une( registers, grupos ):
+    # Máximo dos registradores por grupo ( grupos: código 0..n-1 por linha )
+    ordem = np.argsort( grupos, kind='stable' )
+    inicios = np.flatnonzero( np.diff( np.append( -1, grupos[ordem] ) ) )
+    if len( ordem ) == 0:
+        return registers[:0]
+    return np.maximum.reduceat( registers[ordem], inicios, axis=0 )
+
+def merge_sketches( *partes ):
+    """ Junta sketches das mesmas dimensões e precisão ( ex.: partições por
+        data, ou a versão anterior e as linhas acrescentadas ): células iguais
+        viram uma só, com o máximo dos registradores e a soma das contagens.
+
+        Input: Sketches
+        Output: Sketches
+    """
+    cells = pd.concat( [ p.cells for p in partes ], ignore_index=True )
+    registers = np.concatenate( [ p.registers for p in partes ] )
+    dimensoes = [ c for c in cells.columns if c != 'count' ]
+    celula, unicas = _celulas( cells, dimensoes )
+    unicas['count'] = np.bincount( celula, weights=cells['count'], minlength=len( unicas ) ).astype( np.int64 )
+    return Sketches( unicas, _une( registers, celula ) )
+
+def load_sketches( column='Delivery_person_ID', path=DATA_PATH ):
+    """ Sketches do dataset atual, calculados uma única vez por processo e
+        versão do arquivo. Como no cubo ( ver curry/cube.py ), se a versão
+        atual só acrescentou linhas, só as novas são processadas.
+
+        Input: coluna, caminho do CSV
+        Output: Sketches
+    """
+    return incremental_cache( _CACHE, _LOCK, build_sketches, merge_sketches, path,
+                              DIMENSOES_SKETCH + [column], column, name='sketches' )
+
+def slice_sketches( sketches, date_limit, traffic_options ):
+    """ Aplica os filtros da barra lateral ( data limite e trânsito ) às
+        células dos sketches.
+    """
+    linhas = cell_mask( sketches.cells, date_limit, traffic_options )
+    return Sketches( sketches.cells.loc[linhas, :].reset_index( drop=True ), sketches.registers[linhas] )
+
+def estimate( registers ):
+    """ Estimativa de distintos de um ou vários sketches ( uma linha cada ):
+        HyperLogLog, com contagem linear enquanto houver muitos registradores
+        vazios. Erro padrão relativo: ERRO_PADRAO ( para a PRECISAO padrão ).
+
+        Input: registradores ( 1 ou 2 dimensões )
+        Output: float ou array de floats
+    """
+    registros = np.atleast_2d( registers )
+    m = registros.shape[1]
+    alfa = 0.7213 / ( 1 + 1.079 / m )
+    bruta = alfa * m * m / np.exp2( -registros.astype( float ) ).sum( axis=1 )
+    vazios = np.count_nonzero( registros == 0, axis=1 )
+    with np.errstate( divide='ignore' ):
+        linear = m * np.log( m / vazios )
+    resultado = np.where( ( bruta <= 2.5 * m ) & ( vazios > 0 ), linear, bruta )
+    return resultado if np.ndim( registers ) == 2 else float( resultado[0] )
+
+def distinct( sketches ):
+    """ Distintos estimados na união de todas as células. """
+    if len( sketches.cells ) == 0:
+        return 0.0
+    return estimate( sketches.registers.max( axis=0 ) )
+
+def distinct_by( sketches, keys ):
+    """ Distintos estimados por grupo de células.
+
+        Input: Sketches, chave do grupo de cada célula ( array ou Series )
+        Output: Dataframe com key, count ( linhas ) e distinct
+    """
+    codigos, valores = pd.factorize( np.asarray( keys ), sort=True )
+    registers = _une( sketches.registers, codigos )
+    return pd.DataFrame( {
+        'key' : valores,
+        'count' : np.bincount( codigos, weights=sketches.cells['count'], minlength=len( valores ) ).astype( np.int64 ),
+        'distinct' : estimate( registers ) if len( valores ) else np.array( [] ),
+    } )
+
+def week_keys( sketches ):
+    """ Chave inteira da semana de cada célula ( ver curry/buckets.py ). """
+    return add_buckets( sketches.cells.loc[:, ['Order_Date']] )['week'].to_numpy()
@@ -0,0 +1,75 @@
+#------------------------------------------------------------------------------
+# Curry Company - Snapshot colunar ( Arrow IPC ) do dataset limpo
+#------------------------------------------------------------------------------
+
+# Libraries
+import json
+import os
+
+import pyarrow as pa
+import pyarrow.feather as feather
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+# Chave dos metadados da Curry Company no schema Arrow
+_METADATA_KEY = b'curry'
+
+def write_snapshot( df1, path, metadata=None ):
+    """ Grava o Dataframe limpo num arquivo Arrow IPC sem compressão, com os
+        tipos já resolvidos ( int, float, datetime ). Sem compressão para que
+        o arquivo possa ser mapeado em memória por read_snapshot.
+
+        Input: Dataframe limpo, caminho do snapshot, metadados ( dicionário
+               serializável em JSON, lido de volta por snapshot_metadata )
+        Output: caminho do snapshot
+    """
+    pasta = os.path.dirname( path )
+    if pasta:
+        os.makedirs( pasta, exist_ok=True )
+    tabela = pa.Table.from_pandas( df1, preserve_index=True )
+    if metadata is not None:
+        schema = dict( tabela.schema.metadata or {} )
+        schema[_METADATA_KEY] = json.dumps( metadata ).encode()
+        tabela = tabela.replace_schema_metadata( schema )
+    # Escreve num arquivo temporário e renomeia: outro processo nunca lê
+    # um snapshot pela metade.
+    temporario = '{}.{}.tmp'.format( path, os.getpid() )
+    feather.write_feather( tabela, temporario, compression='uncompressed' )
+    os.replace( temporario, path )
+    return path
+
+def read_snapshot( path, columns=None ):
+    """ Abre o snapshot com memory-map. As colunas numéricas e de data viram
+        arrays numpy apontando direto para o arquivo ( zero-copy ): vários
+        processos do Dashboard no mesmo host compartilham as mesmas páginas
+        do cache do sistema operacional. Só as colunas de texto são
+        materializadas.
+
+        Input: caminho do snapshot, lista de colunas ( None = todas )
+        Output: Dataframe
+    """
+    with pa.memory_map( path, 'r' ) as origem:
+        tabela = pa.ipc.open_file( origem ).read_all()
+
+    if columns is not None:
+        # As colunas do índice original sempre acompanham a seleção
+        metadados = tabela.schema.pandas_metadata or {}
+        indice = [ c for c in metadados.get( 'index_columns', [] ) if isinstance( c, str ) ]
+        tabela = tabela.select( list( columns ) + indice )
+
+    # split_blocks: um bloco por coluna, sem consolidar ( e copiar ) colunas
+    # de mesmo tipo num array 2D.
+    return tabela.to_pandas( split_blocks=True )
+
+def snapshot_metadata( path ):
+    """ Metadados gravados por write_snapshot, sem ler as colunas.
+
+        Input: caminho do snapshot
+        Output: dicionário ( vazio se não houver metadados )
+    """
+    with pa.memory_map( path, 'r' ) as origem:
+        schema = pa.ipc.open_file( origem ).schema
+    valor = ( schema.metadata or {} ).get( _METADATA_KEY )
+    return json.loads( valor ) if valor else {}
@@ -0,0 +1,313 @@
+#------------------------------------------------------------------------------
+# Curry Company - Base SQLite opcional, com filtros e agregações em SQL
+#------------------------------------------------------------------------------
+
+# Libraries
+import argparse
+import contextlib
+import glob
+import os
+import queue
+import shutil
+import sqlite3
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+import pandas as pd
+
+from curry.data import CACHE_DIR, DATA_PATH, SNAPSHOT_VERSION, file_key, read_version, snapshot_info, snapshot_path
+from curry.instrument import stage
+from curry.quantile import build_quantiles, merge_quantiles
+from curry.schema import plain
+
+#------------------------------------------------------------------------------
+# CONSTANTES
+#------------------------------------------------------------------------------
+
+# De onde as páginas tiram células do cubo e linhas filtradas: 'memory'
+# ( snapshot + índices em memória, ver curry/cube.py e curry/index.py ) ou
+# 'sqlite' ( uma base em disco compartilhada por todos os processos, com os
+# filtros e agrupamentos executados pelo SQLite )
+BACKEND = os.environ.get( 'CURRY_BACKEND', 'memory' )
+
+TABELA = 'orders'
+
+# Média de cada coluna numérica na criação da base ( ver query_cube )
+TABELA_DESLOCAMENTOS = 'shifts'
+
+# Sketches de quantis por célula ( ver curry/quantile.py e query_quantiles )
+TABELA_QUANTIS = 'quantiles'
+
+# Colunas indexadas: as dos filtros da barra lateral e as dos agrupamentos
+INDICES = ['Order_Date','Road_traffic_density','City','Delivery_person_ID']
+
+# Linhas gravadas por INSERT na criação da base
+LOTE = 50000
+
+# Conexões somente leitura guardadas por base e processo
+POOL_SIZE = 4
+
+# Pools: chave (pid, caminho da base) -> fila de conexões
+_POOLS = {}
+_LOCK = threading.Lock()
+
+# Bases prontas neste processo: chave do arquivo ( file_key ) -> caminho.
+# A criação é serializada pelo lock ( threads ) e por um arquivo de trava
+# ( outros processos )
+_BASES = {}
+_LOCK_BASE = threading.Lock()
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+def use_store( mode=None ):
+    """ Se as páginas devem consultar a base SQLite ( True ) ou a memória.
+
+        Input: modo ( padrão: BACKEND, da variável de ambiente CURRY_BACKEND )
+    """
+    mode = mode or BACKEND
+    if mode not in ( 'memory', 'sqlite' ):
+        raise ValueError( 'CURRY_BACKEND deve ser memory ou sqlite: {}'.format( mode ) )
+    return mode == 'sqlite'
+
+def store_path( key ):
+    """ Caminho da base de uma versão do arquivo ( como snapshot_path ). """
+    return os.path.splitext( snapshot_path( key ) )[0] + '.sqlite'
+
+def _nome( coluna ):
+    # Nome de coluna em SQL ( Time_taken(min) precisa de aspas )
+    return '"{}"'.format( coluna.replace( '"', '""' ) )
+
+def _grava( conexao, df1 ):
+    # Linhas do snapshot na tabela: csv_row é o número da linha no CSV ( o
+    # índice do Dataframe ), category vira texto e Order_Date texto ISO, que
+    # ordena e compara como data
+    df2 = plain( df1 ).rename_axis( 'csv_row' ).reset_index()
+    df2['Order_Date'] = df2['Order_Date'].dt.strftime( '%Y-%m-%d %H:%M:%S' )
+    for inicio in range( 0, len( df2 ), LOTE ):
+        df2.iloc[inicio:inicio + LOTE].to_sql( TABELA, conexao, if_exists='append', index=False )
+
+def _grava_quantis( conexao, df1, incremental ):
+    # Sketches de quantis das linhas gravadas; numa base copiada da versão
+    # anterior, juntados aos que já estavam nela ( ver merge_quantiles )
+    quantis = build_quantiles( df1 )
+    if incremental:
+        anteriores = pd.read_sql_query( 'SELECT * FROM {}'.format( TABELA_QUANTIS ), conexao,
+                                        parse_dates=['Order_Date'] )
+        quantis = merge_quantiles( anteriores, quantis )
+    df2 = plain( quantis )
+    df2['Order_Date'] = df2['Order_Date'].dt.strftime( '%Y-%m-%d %H:%M:%S' )
+    df2.to_sql( TABELA_QUANTIS, conexao, if_exists='replace', index=False )
+    conexao.execute( 'CREATE INDEX {} ON {} ( Order_Date )'.format( _nome( 'ix_quantiles_Order_Date' ), TABELA_QUANTIS ) )
+
+@contextlib.contextmanager
+def _trava( caminho ):
+    # Trava exclusiva entre processos, no arquivo 'caminho'
+    with open( caminho, 'a+b' ) as arquivo:
+        if fcntl is not None:
+            fcntl.flock( arquivo.fileno(), fcntl.LOCK_EX )
+        else:
+            arquivo.seek( 0 )
+            msvcrt.locking( arquivo.fileno(), msvcrt.LK_LOCK, 1 )
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock( arquivo.fileno(), fcntl.LOCK_UN )
+            else:
+                arquivo.seek( 0 )
+                msvcrt.locking( arquivo.fileno(), msvcrt.LK_UNLCK, 1 )
+
+def _cria( path, key, destino ):
+    # Grava a base num arquivo temporário único da mesma pasta e troca de
+    # uma vez: quem lê nunca vê uma base pela metade
+    info = snapshot_info( path )
+    anterior = store_path( ( key[0], ) + tuple( info['previous_key'] ) ) if info.get( 'previous_key' ) else None
+    incremental = anterior is not None and os.path.exists( anterior )
+    descritor, temporario = tempfile.mkstemp( suffix='.tmp', dir=os.path.dirname( destino ) or '.' )
+    os.close( descritor )
+    try:
+        with stage( 'base sqlite' ):
+            df1 = read_version( key, own=incremental )
+            if incremental:
+                shutil.copyfile( anterior, temporario )
+                df1 = df1.loc[df1.index >= info['delta_start'], :]
+            conexao = sqlite3.connect( temporario )
+            try:
+                if not incremental:
+                    numericas = df1.select_dtypes( 'number' ).mean()
+                    pd.DataFrame( { 'measure' : numericas.index, 'value' : numericas.to_numpy() } ).to_sql(
+                        TABELA_DESLOCAMENTOS, conexao, index=False )
+                _grava( conexao, df1 )
+                _grava_quantis( conexao, df1, incremental )
+                for coluna in INDICES:
+                    conexao.execute( 'CREATE INDEX IF NOT EXISTS {} ON {} ( {} )'.format(
+                        _nome( 'ix_' + coluna ), TABELA, _nome( coluna ) ) )
+                conexao.execute( 'ANALYZE' )
+                conexao.commit()
+            finally:
+                conexao.close()
+        os.replace( temporario, destino )
+    except BaseException:
+        os.remove( temporario )
+        raise
+
+def build_store( path=DATA_PATH ):
+    """ Cria a base SQLite da versão atual do arquivo a partir do snapshot
+        limpo ( ver curry/data.py ), com índices em INDICES, uma única vez:
+        threads e processos que pedem a mesma base ao mesmo tempo esperam
+        a primeira criação. Se a base da versão anterior existe e a atual
+        só acrescentou linhas, a base é copiada e recebe só as linhas novas.
+        A base guarda também os sketches de quantis ( TABELA_QUANTIS ), para
+        que percentis e medianas não precisem do snapshot em memória.
+        Pode ser executado no deploy ( python -m curry.store train.csv ).
+
+        Input: caminho do CSV
+        Output: caminho da base
+    """
+    key = file_key( path )
+    with _LOCK_BASE:
+        destino = _BASES.get( key )
+        if destino is not None:
+            return destino
+        destino = store_path( key )
+        os.makedirs( os.path.dirname( destino ) or '.', exist_ok=True )
+        nome = os.path.splitext( os.path.basename( path ) )[0]
+        with _trava( os.path.join( os.path.dirname( destino ) or '.', nome + '.sqlite.lock' ) ):
+            if not os.path.exists( destino ):
+                _cria( path, key, destino )
+                # Bases de versões anteriores não são mais necessárias ( quem
+                # ainda tem uma aberta continua lendo até trocar de conexão )
+                for antiga in glob.glob( os.path.join( CACHE_DIR, '{}-*-v{}.sqlite'.format( nome, SNAPSHOT_VERSION ) ) ):
+                    if antiga != destino:
+                        try:
+                            os.remove( antiga )
+                        except OSError:
+                            pass
+        for antiga in [ k for k in _BASES if k[0] == key[0] ]:
+            del _BASES[antiga]
+        _BASES[key] = destino
+        return destino
+
+@contextlib.contextmanager
+def connect( path=DATA_PATH ):
+    """ Conexão somente leitura com a base da versão atual do arquivo ( criada
+        se preciso ), emprestada de um pool por processo: cada worker ( ver
+        curry/parallel.py ) abre as suas e os reruns reaproveitam as
+        conexões abertas.
+
+        Uso:
+            with connect() as conexao:
+                pd.read_sql_query( 'SELECT ...', conexao )
+    """
+    # Só a chave do arquivo é conferida; a base é criada uma vez ( build_store )
+    base = _BASES.get( file_key( path ) ) or build_store( path )
+    chave = ( os.getpid(), base )
+    with _LOCK:
+        pool = _POOLS.get( chave )
+        if pool is None:
+            # Conexões da versão anterior da base ( ou herdadas de outro
+            # processo ) não servem mais
+            for antiga in [ k for k in _POOLS if k[0] != chave[0] or k[1] != base ]:
+                _fecha( _POOLS.pop( antiga ), fechar=antiga[0] == chave[0] )
+            pool = _POOLS[chave] = queue.LifoQueue( POOL_SIZE )
+    try:
+        conexao = pool.get_nowait()
+    except queue.Empty:
+        uri = 'file:{}?mode=ro'.format( os.path.abspath( base ).replace( '?', '%3f' ) )
+        conexao = sqlite3.connect( uri, uri=True, check_same_thread=False )
+        conexao.execute( 'PRAGMA query_only = ON' )
+    try:
+        yield conexao
+    finally:
+        try:
+            pool.put_nowait( conexao )
+        except queue.Full:
+            conexao.close()
+
+def _fecha( pool, fechar=True ):
+    # Conexões abertas por outro processo ( fork ) não são fechadas aqui
+    while not pool.empty():
+        conexao = pool.get_nowait()
+        if fechar:
+            conexao.close()
+
+def _filtro( date_limit, traffic_options ):
+    # Cláusula WHERE e parâmetros dos filtros da barra lateral ( data limite
+    # exclusiva e trânsito ): as duas colunas são indexadas
+    marcas = ','.join( '?' * len( traffic_options ) )
+    clausula = 'WHERE Order_Date < ? AND Road_traffic_density IN ( {} )'.format( marcas or 'NULL' )
+    return clausula, [ pd.Timestamp( date_limit ).strftime( '%Y-%m-%d %H:%M:%S' ) ] + list( traffic_options )
+
+def query_cube( dimensions, measures, date_limit, traffic_options, path=DATA_PATH ):
+    """ As células do cubo ( ver curry/cube.py ) já filtradas, calculadas pelo
+        SQLite numa única passada: o filtro usa os índices e o GROUP BY
+        devolve só as células de 'dimensions' ( todas, inclusive as de
+        filtro ). O M2 sai das somas dos valores deslocados pela média da
+        medida na base toda ( TABELA_DESLOCAMENTOS ): perto da média, soma
+        dos quadrados menos quadrado da soma não perde precisão.
+
+        Input: dimensões, medidas, data limite ( exclusiva ), condições de
+               trânsito, caminho do CSV
+        Output: Dataframe no formato de slice_cube( load_cube( ... ) ), com
+                as dimensões em texto
+    """
+    clausula, parametros = _filtro( date_limit, traffic_options )
+    dimensoes = ', '.join( _nome( c ) for c in dimensions )
+    with stage( 'sql' ), connect( path ) as conexao:
+        deslocamentos = dict( conexao.execute( 'SELECT measure, value FROM {}'.format( TABELA_DESLOCAMENTOS ) ).fetchall() )
+        colunas = ''.join( ', AVG( {0} ) AS {1}, SUM( {0} - {4} ) AS {2}, SUM( ( {0} - {4} ) * ( {0} - {4} ) ) AS {3}'.format(
+                               _nome( m ), _nome( m + '_mean' ), _nome( m + '_s1' ), _nome( m + '_s2' ),
+                               repr( float( deslocamentos.get( m ) or 0.0 ) ) )
+                           for m in measures )
+        sql = 'SELECT {0}, COUNT(*) AS count{1} FROM {2} {3} GROUP BY {0} ORDER BY {0}'.format(
+            dimensoes, colunas, TABELA, clausula )
+        df2 = pd.read_sql_query( sql, conexao, params=parametros, parse_dates=['Order_Date'] )
+    for m in measures:
+        m2 = df2.pop( m + '_s2' ) - df2.pop( m + '_s1' )**2 / df2['count']
+        df2[m + '_m2'] = m2.clip( lower=0 )
+    return df2
+
+def query_quantiles( date_limit, traffic_options, path=DATA_PATH ):
+    """ Células dos sketches de quantis ( ver curry/quantile.py ) guardados
+        na base, com os filtros da barra lateral.
+
+        Input: data limite ( exclusiva ), condições de trânsito, caminho do CSV
+        Output: Dataframe no formato de slice_quantiles( load_quantiles() ),
+                com as dimensões em texto
+    """
+    clausula, parametros = _filtro( date_limit, traffic_options )
+    sql = 'SELECT * FROM {} {}'.format( TABELA_QUANTIS, clausula )
+    with stage( 'sql' ), connect( path ) as conexao:
+        df2 = pd.read_sql_query( sql, conexao, params=parametros, parse_dates=['Order_Date'] )
+    # Sem linhas o SQLite não informa os tipos
+    return df2.astype( { 'level' : 'int8', 'bucket' : 'int64', 'count' : 'int64' } )
+
+def query_rows( columns, date_limit, traffic_options, path=DATA_PATH ):
+    """ Linhas filtradas, só com 'columns', na mesma ordem e com o mesmo
+        índice ( número da linha no CSV ) de curry/index.take.
+
+        Input: colunas, data limite ( exclusiva ), condições de trânsito,
+               caminho do CSV
+        Output: Dataframe
+    """
+    clausula, parametros = _filtro( date_limit, traffic_options )
+    sql = 'SELECT csv_row, {} FROM {} {} ORDER BY Order_Date, csv_row'.format(
+        ', '.join( _nome( c ) for c in columns ), TABELA, clausula )
+    datas = ['Order_Date'] if 'Order_Date' in columns else None
+    with stage( 'sql' ), connect( path ) as conexao:
+        return pd.read_sql_query( sql, conexao, params=parametros, index_col='csv_row', parse_dates=datas ).rename_axis( None )
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Gera a base SQLite do CSV de pedidos' )
+    parser.add_argument( 'csv', nargs='?', default=DATA_PATH )
+    args = parser.parse_args()
+    print( build_store( args.csv ) )
@@ -0,0 +1,97 @@
+#------------------------------------------------------------------------------
+# Curry Company - Agregação em streaming ( arquivos maiores que a memória )
+#
+# Uso ( a partir da raiz do projeto ):
+#     python -m curry.stream train.csv --chunk-rows 200000
+#------------------------------------------------------------------------------
+
+# Libraries
+import argparse
+
+from curry.buckets import bucket_dates
+from curry.cube import build_cube, merge_cubes, rollup
+from curry.data import DATA_PATH, clean_data, derive_columns, read_orders
+from curry.ranking import DriverRanking
+
+#------------------------------------------------------------------------------
+# CONSTANTES
+#------------------------------------------------------------------------------
+
+CHUNK_ROWS = 200000
+
+MEDIDAS_RESUMO = ['Time_taken(min)','Delivery_person_Ratings']
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+def iter_chunks( path=DATA_PATH, chunk_rows=CHUNK_ROWS, columns=None ):
+    """ Lê o CSV em blocos de 'chunk_rows' linhas, limpando cada bloco com as
+        mesmas regras de clean_data. O índice continua sendo o número da
+        linha no arquivo, como no snapshot.
+
+        Input: caminho do CSV, linhas por bloco, colunas desejadas ( None = todas )
+        Output: gerador de Dataframes limpos
+    """
+    with read_orders( path, chunksize=chunk_rows ) as leitor:
+        for df in leitor:
+            df1 = derive_columns( clean_data( df ) )
+            yield df1 if columns is None else df1.loc[:, list( columns )]
+
+def stream_cube( dimensions, measures, path=DATA_PATH, chunk_rows=CHUNK_ROWS, filters=() ):
+    """ Mesmo resultado de build_cube sobre o arquivo inteiro, mas somando os
+        cubos parciais de cada bloco: o pico de memória é um bloco mais o
+        cubo acumulado, e não o dataset.
+
+        Input: lista de dimensões, lista de medidas, caminho do CSV,
+               linhas por bloco, dimensões de filtro ( ver build_cube )
+        Output: Dataframe do cubo
+    """
+    colunas = list( dict.fromkeys( list( filters ) + list( dimensions ) + list( measures ) ) )
+    cubo = None
+    for df1 in iter_chunks( path, chunk_rows, colunas ):
+        parcial = build_cube( df1, dimensions, measures, filters=filters )
+        cubo = parcial if cubo is None else merge_cubes( cubo, parcial )
+    return cubo
+
+def stream_summary( path=DATA_PATH, chunk_rows=CHUNK_ROWS, measures=MEDIDAS_RESUMO ):
+    """ Resumo do histórico inteiro numa única leitura em blocos:
+          - daily / weekly: quantidade de pedidos por dia e por semana ( data
+            do domingo que começa a semana, ver curry/buckets.py )
+          - driver / city: quantidade, média e desvio padrão das medidas
+            por entregador e por cidade
+          - fastest / slowest: ranking dos entregadores por cidade, atualizado
+            a cada bloco ( ver curry/ranking.py )
+
+        Input: caminho do CSV, linhas por bloco, medidas
+        Output: dicionário de Dataframes
+    """
+    medidas = list( measures )
+    colunas = list( dict.fromkeys( ['Order_Date','week','Delivery_person_ID','City','Time_taken(min)'] + medidas ) )
+    parciais = { 'Order_Date' : None, 'week' : None, 'Delivery_person_ID' : None, 'City' : None }
+    ranking = DriverRanking()
+    for df1 in iter_chunks( path, chunk_rows, colunas ):
+        ranking.update( df1 )
+        for dimensao, cubo in parciais.items():
+            parcial = build_cube( df1, [dimensao], [] if dimensao in ( 'Order_Date', 'week' ) else medidas, filters=() )
+            parciais[dimensao] = parcial if cubo is None else merge_cubes( cubo, parcial )
+
+    semanal = rollup( parciais['week'], ['week'] )
+    semanal.insert( 0, 'week_of_year', bucket_dates( semanal.pop( 'week' ) ) )
+    return {
+        'daily' : rollup( parciais['Order_Date'], ['Order_Date'] ),
+        'weekly' : semanal,
+        'driver' : rollup( parciais['Delivery_person_ID'], ['Delivery_person_ID'], medidas ),
+        'city' : rollup( parciais['City'], ['City'], medidas ),
+        'fastest' : ranking.fastest(),
+        'slowest' : ranking.slowest(),
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser( description='Resumo do CSV de pedidos lido em blocos' )
+    parser.add_argument( 'csv', nargs='?', default=DATA_PATH )
+    parser.add_argument( '--chunk-rows', type=int, default=CHUNK_ROWS )
+    args = parser.parse_args()
+    for nome, df in stream_summary( args.csv, args.chunk_rows ).items():
+        print( '#', nome, len( df ) )
+        print( df.head().to_string( index=False ) )
@@ -0,0 +1,102 @@
+#------------------------------------------------------------------------------
+# Curry Company - Tabelas paginadas e ordenadas no servidor
+#------------------------------------------------------------------------------
+
+# Libraries
+import numpy as np
+
+#------------------------------------------------------------------------------
+# CONSTANTES
+#------------------------------------------------------------------------------
+
+# Linhas por página enviadas ao navegador
+PAGE_SIZE = 25
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+class SortedTable:
+    """ Um Dataframe ( ex.: a avaliação média de cada entregador ) com a
+        ordem das linhas já calculada para cada coluna, nos dois sentidos, e
+        um índice da coluna de busca. Cada página é só uma fatia dessas
+        ordens: o navegador recebe as linhas visíveis, não a tabela inteira.
+        Depois de criada a tabela não muda ( pode ser compartilhada entre
+        sessões, ver curry/ui.py ).
+
+        Uso:
+            tabela = SortedTable( ratings_by_driver( cubo ), search='Delivery_person_ID' )
+            linhas, total = tabela.page( 'Delivery_person_Ratings', ascending=False, number=1 )
+    """
+
+    def __init__( self, df2, search=None ):
+        self.df = df2.reset_index( drop=True )
+        self.search = search
+        # Ordem estável das linhas por coluna, crescente e decrescente ( com
+        # os empates na ordem original nos dois sentidos ). NaN fica sempre
+        # no fim.
+        self._ordens = {}
+        for coluna in self.df.columns:
+            crescente, decrescente = self._ordena( self.df[coluna] )
+            self._ordens[coluna, True] = crescente
+            self._ordens[coluna, False] = decrescente
+        # Índice da busca: os valores em maiúsculas, ordenados, e a linha de
+        # cada um ( busca por prefixo com searchsorted )
+        if search is not None:
+            chaves = self.df[search].astype( str ).str.upper().to_numpy( dtype=object )
+            self._linhas_busca = np.argsort( chaves, kind='stable' )
+            self._chaves_busca = chaves[self._linhas_busca]
+
+    def __len__( self ):
+        return len( self.df )
+
+    @staticmethod
+    def _ordena( serie ):
+        vazios = serie.isna().to_numpy()
+        cheias = np.flatnonzero( ~vazios )
+        valores = serie.to_numpy()[cheias]
+        ordem = np.argsort( valores, kind='stable' )
+        crescente = cheias[ordem]
+        # Decrescente estável: inverte os grupos de valores iguais, não as
+        # linhas dentro de cada grupo
+        ordenados = valores[ordem]
+        grupo = np.cumsum( np.append( True, ordenados[1:] != ordenados[:-1] ) ) if len( cheias ) else cheias
+        decrescente = crescente[np.argsort( -grupo, kind='stable' )]
+        vazios = np.flatnonzero( vazios )
+        return np.concatenate( [crescente, vazios] ), np.concatenate( [decrescente, vazios] )
+
+    def matches( self, text ):
+        """ Linhas cujo valor da coluna de busca começa com 'text' ( sem
+            diferenciar maiúsculas ); None se não há busca.
+        """
+        texto = ( text or '' ).strip().upper()
+        if self.search is None or not texto:
+            return None
+        inicio = np.searchsorted( self._chaves_busca, texto, side='left' )
+        fim = np.searchsorted( self._chaves_busca, texto + '\uffff', side='left' )
+        return self._linhas_busca[inicio:fim]
+
+    def page( self, sort_by=None, ascending=True, search=None, number=1, size=PAGE_SIZE ):
+        """ Uma página da tabela.
+
+            Input: coluna de ordenação ( None: ordem original ), sentido,
+                   texto buscado na coluna de busca ( prefixo ), número da
+                   página ( 1 em diante; fora do intervalo vai para a
+                   primeira / última ), linhas por página
+            Output: ( Dataframe com as linhas da página, total de linhas
+                      que atendem à busca )
+        """
+        ordem = np.arange( len( self.df ) ) if sort_by is None else self._ordens[sort_by, bool( ascending )]
+        achadas = self.matches( search )
+        if achadas is not None:
+            marcadas = np.zeros( len( self.df ), dtype=bool )
+            marcadas[achadas] = True
+            ordem = ordem[marcadas[ordem]]
+        total = len( ordem )
+        number = min( max( int( number ), 1 ), page_count( total, size ) )
+        linhas = ordem[( number - 1 ) * size : number * size]
+        return self.df.iloc[linhas], total
+
+def page_count( total, size=PAGE_SIZE ):
+    """ Quantidade de páginas para 'total' linhas ( pelo menos 1 ). """
+    return max( 1, -( -total // size ) )
@@ -0,0 +1,87 @@
+#------------------------------------------------------------------------------
+# Curry Company - Componentes de interface compartilhados pelas páginas
+#------------------------------------------------------------------------------
+
+# Libraries
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from curry.charts import figure_cache
+from curry.instrument import rerun_records, start_rerun
+from curry.table import PAGE_SIZE, page_count
+
+#------------------------------------------------------------------------------
+# FUNÇÕES
+#------------------------------------------------------------------------------
+
+def lazy_tabs( labels, key ):
+    """ Substitui st.tabs: o st.tabs desenha o conteúdo de todas as abas a
+        cada rerun, mesmo as que o usuário não está vendo. Aqui a aba é um
+        seletor horizontal e a página só calcula o conteúdo da aba escolhida.
+
+        Input: nomes das abas, chave única do widget na página
+        Output: nome da aba selecionada
+    """
+    return st.radio( 'Aba', labels, key=key, horizontal=True, label_visibility='collapsed' )
+
+def memo_por_filtro( func ):
+    """ Memoriza o conteúdo de uma aba por estado dos filtros. A função
+        decorada deve receber apenas argumentos hasheáveis: data limite,
+        tupla de trânsito e a versão do arquivo ( curry.data.file_key ), para
+        que um train.csv novo invalide o que foi memorizado. Os objetos
+        devolvidos ( figuras, Dataframes ) são compartilhados entre sessões e
+        não devem ser alterados. O cache é o LRU de figuras de curry/charts.py,
+        independente do Streamlit.
+    """
+    return figure_cache( func )
+
+def paged_table( tabela, key, size=PAGE_SIZE ):
+    """ Substitui st.dataframe para tabelas grandes ( ex.: uma linha por
+        entregador ): ordenação, busca e página são escolhidas em widgets e
+        resolvidas no servidor ( ver curry/table.py ); só as linhas da página
+        são enviadas ao navegador.
+
+        Input: SortedTable, chave única dos widgets na página, linhas por
+               página
+    """
+    ordem = '( original )'
+    col1, col2, col3 = st.columns( [2, 1, 1] )
+    with col1:
+        busca = None
+        if tabela.search is not None:
+            busca = st.text_input( 'Buscar {}'.format( tabela.search ), key=key + '_busca' )
+    with col2:
+        coluna = st.selectbox( 'Ordenar por', [ordem] + list( tabela.df.columns ), key=key + '_ordem' )
+        crescente = st.checkbox( 'Crescente', value=True, key=key + '_crescente' )
+    # O total depende da busca: a página pedida é limitada depois ( SortedTable.page )
+    linhas, total = tabela.page( None if coluna == ordem else coluna, crescente, busca,
+                                 st.session_state.get( key + '_pagina', 1 ), size )
+    with col3:
+        pagina = st.number_input( 'Página ( de {} )'.format( page_count( total, size ) ),
+                                  min_value=1, step=1, key=key + '_pagina' )
+    pagina = min( pagina, page_count( total, size ) )
+    st.dataframe( linhas, use_container_width=True )
+    st.caption( '{} a {} de {} linhas'.format( min( ( pagina - 1 ) * size + 1, total ),
+                                               min( pagina * size, total ), total ) )
+
+def start_profile( page ):
+    """ Início da medição das etapas do rerun ( ver curry/instrument.py ),
+        identificando a sessão do Streamlit nos registros do log.
+
+        Input: nome da página
+    """
+    contexto = get_script_run_ctx()
+    start_rerun( page, session=contexto.session_id if contexto else None )
+
+def profile_panel():
+    """ Painel opcional na barra lateral com o tempo de cada etapa deste
+        rerun. Chamado no fim da página, depois de todas as etapas.
+    """
+    if not st.sidebar.checkbox( 'Mostrar tempos das etapas', key='perfil' ):
+        return
+    df = pd.DataFrame( rerun_records(), columns=['stage','seconds','rss_delta_mb'] )
+    total = df.loc[~df['stage'].str.contains( '/' ), 'seconds'].sum()
+    st.sidebar.markdown( '### Tempos deste rerun: {:.3f} s'.format( total ) )
+    st.sidebar.dataframe( df.rename( columns={'stage':'etapa','seconds':'s','rss_delta_mb':'Δ MB'} ),
+                          use_container_width=True )
@@ -5,151 +5,161 @@
 
 # Libraries
 import pandas as pd
-import numpy as np
-from haversine import haversine
-import plotly.express as px
-import plotly.graph_objects as go
 import streamlit as st
-from streamlit_folium import folium_static
+import streamlit.components.v1 as components
 from PIL import Image
-import folium
+
+from curry.charts import downsample, use_webgl
+from curry.cube import filtered_cube
+from curry.data import DATA_PATH, file_key
+from curry.geo import grid_points, to_geojson
+from curry.index import filtered_rows
+from curry.instrument import stage
+from curry.lazy import lazy_import
+from curry.metrics import ( CUBO_PEDIDOS, filtered_quantiles, location_medians, moving_orders, moving_orders_per_driver,
+                             orders_by_day, orders_by_week, orders_per_driver_by_week, orders_per_driver_by_week_sketch,
+                             traffic_by_city, traffic_share )
+from curry.schema import plain
+from curry.sketch import load_sketches, slice_sketches, use_sketches
+from curry.ui import lazy_tabs, memo_por_filtro, profile_panel, start_profile
+
+# Importadas só quando um gráfico ( ou o mapa ) é desenhado: com as figuras
+# em cache, um rerun nem chega a carregá-las ( ver curry/lazy.py )
+px = lazy_import( 'plotly.express' )
+folium = lazy_import( 'folium' )
+plugins = lazy_import( 'folium.plugins' )
 
 st.set_page_config( page_title='Visão Empresa', page_icon='🏯', layout='wide' )
+# Tempo de cada etapa deste rerun ( ver curry/instrument.py )
+start_profile( 'Visão Empresa' )
+
+# Limite de células da camada de calor do mapa ( ver country_map )
+MAX_PONTOS_MAPA = 5000
 
 #------------------------------------------------------------------------------
 # FUNÇÕES
 #------------------------------------------------------------------------------
 
-def clean_data( df1 ):
-    """ Esta função tem a reaponsabilidade de limpar o dataframe
-        Tipos de limpeza:
-        1. Remoção dos dados NaN
-        2. Mudança do tipo da coluna de dados
-        3. Remoção dos espaços das variáveis de texto
-        4. Formatação da coluna de datas
-        5. Limpeza da coluna de tempo ( remoção de texto em variável numérica )
-
-        Input: Dataframe
-        Output: Dataframe
-    """
-    # Limpeza dos dados: Todas as filtragens e conversões de dados necessárias.
-    linhas = ( (df['Delivery_person_Age']!='NaN ') & 
-            (df['Delivery_person_Ratings']!='NaN ') & 
-            (df['Road_traffic_density']!='NaN ') &
-            (df['City']!='NaN ') &
-            (df['multiple_deliveries']!='NaN ') &
-            (df['Weatherconditions']!='conditions NaN')
-            )
-    df1 = df.loc[linhas, :].copy()
-
-    # Removendo os espaços dentro de strings/texto/objects
-    df1.loc[:, 'ID'] = df1.loc[:, 'ID'].str.strip()
-    df1.loc[:, 'Road_traffic_density'] = df1.loc[:, 'Road_traffic_density'].str.strip()
-    df1.loc[:, 'Type_of_order'] = df1.loc[:, 'Type_of_order'].str.strip()
-    df1.loc[:, 'Type_of_vehicle'] = df1.loc[:, 'Type_of_vehicle'].str.strip()
-    df1.loc[:, 'City'] = df1.loc[:, 'City'].str.strip()
-
-    # Converte colunas para int, float, datetime, etc
-    df1['Delivery_person_Age'] = df1['Delivery_person_Age'].astype(int)
-    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype(int)
-    df1['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype(float)
-
-    # Converte o TIME-TAKEN
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].apply( lambda x: x.split( '(min) ' )[1] )
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].astype(int)
-
-    # Converte DATA de string para DateTime
-    df1['Order_Date'] = pd.to_datetime( df1['Order_Date'], format='%d-%m-%Y' )
-
-    return df1
-
-def order_metric( df1):
-    # ..... Cálculo .1. Quantidade de pedidos por dia
-    df2 = ( df1.loc[:, ['ID','Order_Date']]
-               .groupby('Order_Date')
-               .count()
-               .reset_index() )
-    df2['Order_Date'] = pd.to_datetime(df2['Order_Date'], format='%d-%m-%Y')
-    df2.columns = ['order_date','qtde_entregas']
-    fig = px.bar( df2, x='order_date', y='qtde_entregas' )
+def order_metric( cubo ):
+    # ..... Cálculo .1. Quantidade de pedidos por dia ( ver curry/metrics.py )
+    df2 = orders_by_day( cubo )
+    # Históricos longos: só os picos e vales de cada trecho vão ao navegador
+    fig = px.bar( downsample( df2, 'order_date', 'qtde_entregas' ), x='order_date', y='qtde_entregas' )
     return fig
 
-def traffic_order_share( df1 ):
-    colunas = ['ID','Road_traffic_density']
-    df2 = ( df1.loc[:, colunas]
-               .groupby('Road_traffic_density')
-               .count()
-               .reset_index() )
-    df2['percent_id'] = 100 * (df2['ID'] / df2['ID'].sum())
+def traffic_order_share( cubo ):
+    df2 = traffic_share( cubo )
     fig = px.pie( df2, values='percent_id', names='Road_traffic_density' )
     return fig
 
-def traffic_order_city( df1 ):
-    colunas = ['ID','City','Road_traffic_density']
-    df2 = ( df1.loc[:,colunas]
-               .groupby(['City','Road_traffic_density'])
-               .count()
-               .reset_index() )
+def traffic_order_city( cubo ):
+    df2 = traffic_by_city( cubo )
     fig = px.scatter(df2, x='City', y='Road_traffic_density', size='ID', color='Road_traffic_density')
     return fig
 
 def order_by_week( df1 ):
-    # Não existe a coluna 'semana do ano': criar nova coluna
-    df1['week_of_year'] = df1['Order_Date'].dt.strftime( '%U' )
     # Agrupar os pedidos por semana do ano
-    df2 = ( df1.loc[:, ['ID','week_of_year'] ]
-               .groupby('week_of_year')
-               .count()
-               .reset_index() )
+    df2 = orders_by_week( df1 )
     # Gráfico
-    fig = px.line(df2, x='week_of_year', y='ID')
-    return fig
-
-def order_share_by_week( df1 ):
-    # ..... Quantidade de ordens por entregador e por semana
-    colunas = ['ID','Order_Date','Delivery_person_ID']
-    # Calcula qtde de entregas por semana
-    df2 = ( df1.loc[:,['ID','week_of_year']]
-               .groupby('week_of_year')
-               .count()
-               .reset_index() )
-    # Calcula qtde de entregadores únicos por semana
-    df3 = ( df1.loc[:,['Delivery_person_ID','week_of_year']]
-               .groupby('week_of_year')
-               .nunique()
-               .reset_index() )
-    # Junta os resultados num único DataFrame
-    df4 = pd.merge(df2, df3, how='inner')
-    # Cálculo final: qtde média de ordens por entregador
-    df4['order_by_deliver'] = df4['ID'] / df4['Delivery_person_ID']
+    fig = px.line(downsample( df2, 'week_of_year', 'ID' ), x='week_of_year', y='ID')
+    return use_webgl( fig )
+
+def order_share_by_week( df1, sketches=None ):
+    # ..... Quantidade média de ordens por entregador e por semana: exata
+    # pelas linhas, ou estimada pelos sketches ( ver curry/sketch.py )
+    if sketches is None:
+        df4 = orders_per_driver_by_week( df1 )
+    else:
+        df4 = orders_per_driver_by_week_sketch( sketches )
     # Gráfico
-    fig = px.line(df4, x='week_of_year', y='order_by_deliver')
-    return fig
-
-def country_map( df1 ):
-    colunas = ['City','Road_traffic_density','Delivery_location_latitude','Delivery_location_longitude']
-    linhas = (df['City']!='NaN ') & (df['Road_traffic_density']!='NaN ')
-    df1 = df.loc[linhas,colunas]
-    df2 = ( df1.loc[:,:].groupby(['City','Road_traffic_density'])
-                        .median()
-                        .reset_index() )
-    # Desenhar MAPA
+    fig = px.line(downsample( df4, 'week_of_year', 'order_by_deliver' ), x='week_of_year', y='order_by_deliver')
+    return use_webgl( fig )
+
+def order_trend( df1 ):
+    # ..... Tendências: pedidos por dia ( soma móvel de 7 dias ) e pedidos
+    # por entregador ativo nos últimos 28 dias ( ver curry/buckets.py )
+    df2 = moving_orders( df1 )
+    df3 = moving_orders_per_driver( df1 )
+    # Séries diárias reduzidas ( ver curry/charts.py )
+    fig_pedidos = px.line( downsample( df2, 'date', ['orders','orders_7d'] ), x='date', y=['orders','orders_7d'] )
+    fig_entregador = px.line( downsample( df3, 'date', 'order_by_deliver' ), x='date', y='order_by_deliver' )
+    return use_webgl( fig_pedidos ), use_webgl( fig_entregador )
+
+def country_map( df1, medianas=None ):
+    # Recebe as linhas já filtradas pela barra lateral. As medianas dos pinos
+    # podem vir prontas dos sketches de quantis ( ver curry/quantile.py )
+    if medianas is None:
+        colunas = ['City','Road_traffic_density','Delivery_location_latitude','Delivery_location_longitude']
+        medianas = plain( df1.loc[:,colunas].groupby(['City','Road_traffic_density'], observed=True)
+                                .median()
+                                .reset_index() )
+    df2 = medianas
+    # Todas as entregas, agregadas numa grade ( ver curry/geo.py )
+    pontos = grid_points( df1['Delivery_location_latitude'], df1['Delivery_location_longitude'],
+                          max_celulas=MAX_PONTOS_MAPA )
+
+    # Desenhar MAPA: uma camada de calor com as entregas e uma única camada
+    # GeoJSON com os pinos das medianas ( em vez de um Marker por pino )
     CityMap = folium.Map( zoom_start=11 )
-    for index, location_info in df2.iterrows():
-        # Insere, um por um, os pinos no mapa.
-        folium.Marker( [location_info['Delivery_location_latitude'],
-                        location_info['Delivery_location_longitude']],
-                        popup=location_info[['City','Road_traffic_density']] ).add_to(CityMap)
-    folium_static( CityMap, width=1024, height=600 )
+    if len( pontos ) > 0:
+        plugins.HeatMap( pontos[['lat','lng','count']].to_numpy().tolist(), name='Entregas' ).add_to(CityMap)
+        folium.GeoJson( to_geojson( df2, 'Delivery_location_latitude', 'Delivery_location_longitude',
+                                    ['City','Road_traffic_density'] ),
+                        name='Medianas',
+                        popup=folium.GeoJsonPopup( fields=['City','Road_traffic_density'] ) ).add_to(CityMap)
+        CityMap.fit_bounds( [ [pontos['lat'].min(), pontos['lng'].min()],
+                              [pontos['lat'].max(), pontos['lng'].max()] ] )
+    return CityMap
+
+#...... Conteúdo de cada aba, memorizado por estado dos filtros ................
+
+@memo_por_filtro
+def visao_gerencial( date_slider, traffic_options, versao ):
+    # Contagens por dia x cidade x trânsito ( ver curry/cube.py )
+    with stage( 'filtro' ):
+        cubo = filtered_cube( *CUBO_PEDIDOS, date_slider, traffic_options )
+    with stage( 'graficos' ):
+        return order_metric( cubo ), traffic_order_share( cubo ), traffic_order_city( cubo )
+
+@memo_por_filtro
+def visao_tatica( date_slider, traffic_options, versao ):
+    # Filtro de dados e de trânsito: busca binária na data e união das posições
+    # de cada nível de trânsito ( ver curry/index.py ), sem varrer as linhas;
+    # com CURRY_BACKEND=sqlite, um WHERE nos índices da base ( curry/store.py )
+    with stage( 'filtro' ):
+        df1 = filtered_rows( ['ID','day','week','Delivery_person_ID'], date_slider, traffic_options,
+                             snapshot_columns=COLUNAS )
+        # Muitas linhas: entregadores distintos por semana pelos sketches
+        sketches = None
+        if use_sketches( len( df1 ) ):
+            sketches = slice_sketches( load_sketches(), date_slider, traffic_options )
+    with stage( 'graficos' ):
+        return ( order_by_week( df1 ), order_share_by_week( df1, sketches ) ) + order_trend( df1 )
+
+@memo_por_filtro
+def visao_geografica( date_slider, traffic_options, versao ):
+    with stage( 'filtro' ):
+        colunas = ['City','Road_traffic_density','Delivery_location_latitude','Delivery_location_longitude']
+        df1 = filtered_rows( colunas, date_slider, traffic_options, snapshot_columns=COLUNAS )
+        # Muitas linhas: medianas pelos sketches, sem ordenar as coordenadas
+        medianas = None
+        if use_sketches( len( df1 ) ):
+            medianas = location_medians( filtered_quantiles( date_slider, traffic_options ) )
+    # Memoriza o HTML já renderizado: o rerun só reenvia o texto
+    with stage( 'mapa' ):
+        return country_map( df1, medianas ).get_root().render()
 
 
 #------------------------------------------------------------------------------
 # ..... VISÃO EMPRESA ..... (ver Aula 37)
 #------------------------------------------------------------------------------
 
-# Read dataset
-df = pd.read_csv('train.csv')
-df1 = clean_data( df )
+# Read dataset ( limpo e em cache: ver curry/data.py )
+# Colunas usadas por esta página ( o snapshot só materializa estas )
+COLUNAS = ['ID','Order_Date','day','week','City','Road_traffic_density','Delivery_person_ID',
+           'Delivery_location_latitude','Delivery_location_longitude']
+# Versão do arquivo: faz parte da chave do que é memorizado por aba
+versao = file_key( DATA_PATH )
 
 #------------------------------------------------------------------------------
 #...... Barra Lateral no Streamlit ............................................
@@ -181,54 +191,64 @@ st.sidebar.markdown("""---""")
 
 st.sidebar.markdown('### Powered by Comunidade DS')
 
-# Criação dos filtros para ligar o Dashboard à base de dados
-# Filtro de dados
-linhas_selecionadas = df1['Order_Date'] < date_slider
-df1 = df1.loc[linhas_selecionadas, :]
-
-# Filtro de trânsito
-linhas_selecionadas = df1['Road_traffic_density'].isin( traffic_options )
-df1 = df1.loc[linhas_selecionadas, :]
-
-#st.dataframe( df1 )
+# Os filtros ligam o Dashboard à base de dados dentro das funções de cada aba
+traffic_options = tuple( traffic_options )
 
 #------------------------------------------------------------------------------
 #...... Layout no Streamlit ...................................................
 #------------------------------------------------------------------------------
-tab1, tab2, tab3 = st.tabs( ['Visão Gerencial', 'Visão Tática', 'Visão Geográfica'] )
-
-with tab1:
-    with st.container():
-        fig = order_metric( df1 )
-        st.header('Orders by Day')
-        st.plotly_chart(fig, use_container_width=True)
-
-    # ..... Duas colunas para dois gráficos
-    with st.container():
-        col1, col2 = st.columns( 2 )
-        with col1:
-            fig = traffic_order_share( df1 )
-            st.header( 'Traffic Order Share' )
-            st.plotly_chart( fig, use_container_width=True )
-
-        with col2:
-            fig = traffic_order_city( df1 )
-            st.header( 'Traffic Order City' )
-            st.plotly_chart( fig, use_container_width=True )
-
-with tab2:
-    # ..... Quantidade de ordens por semana
-    with st.container():
-        fig = order_by_week( df1 )
-        st.markdown('# Order by Week')
-        st.plotly_chart( fig, use_container_width=True )
-
-    with st.container():
-        fig = order_share_by_week( df1 )
-        st.markdown('# Order Share by Week')
-        st.plotly_chart( fig, use_container_width=True )
-
-with tab3:
+# Só a aba selecionada é calculada ( ver curry/ui.py )
+aba = lazy_tabs( ['Visão Gerencial', 'Visão Tática', 'Visão Geográfica'], key='aba_empresa' )
+
+if aba == 'Visão Gerencial':
+    with stage( 'visao_gerencial' ):
+        fig_dia, fig_share, fig_city = visao_gerencial( date_slider, traffic_options, versao )
+    with stage( 'render' ):
+        with st.container():
+            st.header('Orders by Day')
+            st.plotly_chart(fig_dia, use_container_width=True)
+
+        # ..... Duas colunas para dois gráficos
+        with st.container():
+            col1, col2 = st.columns( 2 )
+            with col1:
+                st.header( 'Traffic Order Share' )
+                st.plotly_chart( fig_share, use_container_width=True )
+
+            with col2:
+                st.header( 'Traffic Order City' )
+                st.plotly_chart( fig_city, use_container_width=True )
+
+elif aba == 'Visão Tática':
+    with stage( 'visao_tatica' ):
+        fig_semana, fig_share_semana, fig_tendencia, fig_tendencia_entregador = visao_tatica(
+            date_slider, traffic_options, versao )
+    with stage( 'render' ):
+        # ..... Quantidade de ordens por semana
+        with st.container():
+            st.markdown('# Order by Week')
+            st.plotly_chart( fig_semana, use_container_width=True )
+
+        with st.container():
+            st.markdown('# Order Share by Week')
+            st.plotly_chart( fig_share_semana, use_container_width=True )
+
+        # ..... Tendências em janelas móveis
+        with st.container():
+            col1, col2 = st.columns( 2 )
+            with col1:
+                st.markdown('# Orders - 7 Day Moving Sum')
+                st.plotly_chart( fig_tendencia, use_container_width=True )
+
+            with col2:
+                st.markdown('# Orders by Deliver - 28 Days')
+                st.plotly_chart( fig_tendencia_entregador, use_container_width=True )
+
+else:
     st.markdown('# Country Map')
-    country_map( df1 )
+    with stage( 'visao_geografica' ):
+        mapa = visao_geografica( date_slider, traffic_options, versao )
+    with stage( 'render' ):
+        components.html( mapa, width=1024, height=610 )
 
+profile_panel()
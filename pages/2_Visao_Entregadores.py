@@ -5,84 +5,69 @@
 
 # Libraries
 import pandas as pd
-import numpy as np
-from haversine import haversine
-import plotly.express as px
-import plotly.graph_objects as go
 import streamlit as st
-from streamlit_folium import folium_static
 from PIL import Image
-import folium
+
+from curry.cube import filtered_cube
+from curry.data import DATA_PATH, file_key
+from curry.index import filtered_rows
+from curry.instrument import stage
+from curry.metrics import CUBO_CLIMA, CUBO_ENTREGADORES, ratings_by, ratings_by_driver
+from curry.ranking import rank_drivers
+from curry.table import SortedTable
+from curry.ui import lazy_tabs, memo_por_filtro, paged_table, profile_panel, start_profile
 
 st.set_page_config( page_title='Visão Entregadores', page_icon='🚗', layout='wide' )
+# Tempo de cada etapa deste rerun ( ver curry/instrument.py )
+start_profile( 'Visão Entregadores' )
 
 #------------------------------------------------------------------------------
 # FUNÇÕES
 #------------------------------------------------------------------------------
 
-def clean_data( df1 ):
-    """ Esta função tem a reaponsabilidade de limpar o dataframe
-        Tipos de limpeza:
-        1. Remoção dos dados NaN
-        2. Mudança do tipo da coluna de dados
-        3. Remoção dos espaços das variáveis de texto
-        4. Formatação da coluna de datas
-        5. Limpeza da coluna de tempo ( remoção de texto em variável numérica )
-
-        Input: Dataframe
-        Output: Dataframe
-    """
-    # Limpeza dos dados: Todas as filtragens e conversões de dados necessárias.
-    linhas = ( (df['Delivery_person_Age']!='NaN ') & 
-            (df['Delivery_person_Ratings']!='NaN ') & 
-            (df['Road_traffic_density']!='NaN ') &
-            (df['City']!='NaN ') &
-            (df['multiple_deliveries']!='NaN ') &
-            (df['Weatherconditions']!='conditions NaN')
-            )
-    df1 = df.loc[linhas, :].copy()
-
-    # Removendo os espaços dentro de strings/texto/objects
-    df1.loc[:, 'ID'] = df1.loc[:, 'ID'].str.strip()
-    df1.loc[:, 'Road_traffic_density'] = df1.loc[:, 'Road_traffic_density'].str.strip()
-    df1.loc[:, 'Type_of_order'] = df1.loc[:, 'Type_of_order'].str.strip()
-    df1.loc[:, 'Type_of_vehicle'] = df1.loc[:, 'Type_of_vehicle'].str.strip()
-    df1.loc[:, 'City'] = df1.loc[:, 'City'].str.strip()
-
-    # Converte colunas para int, float, datetime, etc
-    df1['Delivery_person_Age'] = df1['Delivery_person_Age'].astype(int)
-    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype(int)
-    df1['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype(float)
-
-    # Converte o TIME-TAKEN
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].apply( lambda x: x.split( '(min) ' )[1] )
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].astype(int)
-
-    # Converte DATA de string para DateTime
-    df1['Order_Date'] = pd.to_datetime( df1['Order_Date'], format='%d-%m-%Y' )
-
-    return df1
-
-def top_delivers( df1, AscendingTrueDescendingFalse ):
-    colunas = ['City','Delivery_person_ID','Time_taken(min)']
-    df2 = (df1.loc[:, colunas]
-              .groupby(['City','Delivery_person_ID'])
-              .mean()
-              .sort_values(['City','Time_taken(min)'], ascending=AscendingTrueDescendingFalse)
-              .reset_index())
-    df_aux1 = df2.loc[df2['City']=='Metropolitian', :].head(10)
-    df_aux2 = df2.loc[df2['City']=='Urban', :].head(10)
-    df_aux3 = df2.loc[df2['City']=='Semi-Urban', :].head(10)
-    df3 = pd.concat([df_aux1, df_aux2, df_aux3]).reset_index(drop=True)
-    return df3
+#...... Conteúdo de cada aba, memorizado por estado dos filtros ................
+
+@memo_por_filtro
+def visao_gerencial( date_slider, traffic_options, versao ):
+    # Filtro de dados e de trânsito: busca binária na data e união das posições
+    # de cada nível de trânsito ( ver curry/index.py ), sem varrer as linhas;
+    # com CURRY_BACKEND=sqlite, um WHERE nos índices da base ( curry/store.py )
+    with stage( 'filtro' ):
+        df = filtered_rows( COLUNAS, date_slider, traffic_options )
+        idade = df['Delivery_person_Age']
+        condicao = df['Vehicle_condition']
+
+        # Cubos de agregados ( ver curry/cube.py ): avaliações por clima e
+        # avaliações / tempo de entrega por cidade e entregador
+        cubo_clima = filtered_cube( *CUBO_CLIMA, date_slider, traffic_options )
+        cubo_entregador = filtered_cube( *CUBO_ENTREGADORES, date_slider, traffic_options )
+
+    with stage( 'agregacao' ):
+        # Um único tempo médio por entregador para os dois rankings ( ver curry/ranking.py )
+        mais_rapidos, mais_lentos = rank_drivers( cubo_entregador )
+        # As tabelas por entregador vão para o navegador página a página,
+        # já ordenadas para cada coluna ( ver curry/table.py )
+        return {
+            'maior_idade' : idade.max(),
+            'menor_idade' : idade.min(),
+            'melhor_condicao' : condicao.max(),
+            'pior_condicao' : condicao.min(),
+            'avaliacao_entregador' : SortedTable( ratings_by_driver( cubo_entregador ), search='Delivery_person_ID' ),
+            'avaliacao_transito' : ratings_by( cubo_clima, 'Road_traffic_density', ['delivery_mean','delivery_std'] ),
+            'avaliacao_clima' : ratings_by( cubo_clima, 'Weatherconditions', ['weather_mean','weather_std'] ),
+            'mais_rapidos' : SortedTable( mais_rapidos, search='Delivery_person_ID' ),
+            'mais_lentos' : SortedTable( mais_lentos, search='Delivery_person_ID' ),
+        }
 
 #------------------------------------------------------------------------------
 # ..... VISÃO ENTREGADORES ..... (ver Aula 39)
 #------------------------------------------------------------------------------
 
-# Read dataset
-df = pd.read_csv('train.csv')
-df1 = clean_data( df )
+# Read dataset ( limpo e em cache: ver curry/data.py )
+# Colunas usadas por esta página ( o snapshot só materializa estas )
+COLUNAS = ['Delivery_person_Age','Vehicle_condition']
+# Versão do arquivo: faz parte da chave do que é memorizado por aba
+versao = file_key( DATA_PATH )
 
 #------------------------------------------------------------------------------
 #...... Barra Lateral no Streamlit ............................................
@@ -114,86 +99,59 @@ st.sidebar.markdown("""---""")
 
 st.sidebar.markdown('### Powered by Comunidade DS')
 
-# Criação dos filtros para ligar o Dashboard à base de dados
-# Filtro de dados
-linhas_selecionadas = df1['Order_Date'] < date_slider
-df1 = df1.loc[linhas_selecionadas, :]
-
-# Filtro de trânsito
-linhas_selecionadas = df1['Road_traffic_density'].isin( traffic_options )
-df1 = df1.loc[linhas_selecionadas, :]
-
-#st.dataframe( df1 )
+# Os filtros ligam o Dashboard à base de dados dentro das funções de cada aba
+traffic_options = tuple( traffic_options )
 
 #------------------------------------------------------------------------------
 #...... Layout no Streamlit ...................................................
 #------------------------------------------------------------------------------
-tab1, tab2, tab3 = st.tabs( ['Visão Gerencial', '_', '_'] )
-
-with tab1:
-    with st.container():
-        st.title( 'Overall Metrics' )
-
-        col1, col2, col3, col4 = st.columns( 4, gap='large' )
-        with col1:
-            maior_idade = df1.loc[:,'Delivery_person_Age'].max()
-            col1.metric( 'Maior Idade', maior_idade )
-        with col2:
-            menor_idade = df1.loc[:,'Delivery_person_Age'].min()
-            col2.metric( 'Menor Idade', menor_idade )
-        with col3:
-            Melhor_Condicao = df1['Vehicle_condition'].max()
-            col3.metric( 'Melhor condição', Melhor_Condicao )
-        with col4:
-            Pior_Condicao = df1['Vehicle_condition'].min()
-            col4.metric( 'Pior condição', Pior_Condicao )
-
-    with st.container():
-        st.markdown( """---""" )
-        st.title('Avaliações')
+# Só a aba selecionada é calculada ( ver curry/ui.py )
+aba = lazy_tabs( ['Visão Gerencial', '_', '_'], key='aba_entregadores' )
+
+if aba == 'Visão Gerencial':
+    with stage( 'visao_gerencial' ):
+        visao = visao_gerencial( date_slider, traffic_options, versao )
+    with stage( 'render' ):
+        with st.container():
+            st.title( 'Overall Metrics' )
+
+            col1, col2, col3, col4 = st.columns( 4, gap='large' )
+            with col1:
+                col1.metric( 'Maior Idade', visao['maior_idade'] )
+            with col2:
+                col2.metric( 'Menor Idade', visao['menor_idade'] )
+            with col3:
+                col3.metric( 'Melhor condição', visao['melhor_condicao'] )
+            with col4:
+                col4.metric( 'Pior condição', visao['pior_condicao'] )
+
+        with st.container():
+            st.markdown( """---""" )
+            st.title('Avaliações')
         
-        col1, col2 = st.columns( 2 )
-        with col1:
-            st.markdown('##### Avaliação média por Entregador')
-            colunas = ['Delivery_person_ID','Delivery_person_Ratings']
-            df2 = ( df1.loc[:, colunas]
-                       .groupby('Delivery_person_ID')
-                       .mean()
-                       .reset_index() )
-            st.dataframe( df2 )
-
-        with col2:
-            st.markdown('##### Avaliação média por Trânsito')
-            colunas = ['Road_traffic_density','Delivery_person_Ratings']
-            # DICA: função de agregação ".agg" recebe um dicionário {} aonde...
-            df2 = ( df1.loc[:, colunas]
-                       .groupby('Road_traffic_density')
-                       .agg( {'Delivery_person_Ratings' : ['mean','std']} ) )
-            # renomeando as colunas...
-            df2.columns = ['delivery_mean','delivery_std']
-            df2 = df2.reset_index()
-            st.dataframe( df2 )
-            #
-            st.markdown('##### Avaliação média por Clima')
-            colunas = ['Weatherconditions','Delivery_person_Ratings']
-            df2 = ( df1.loc[:, colunas].groupby('Weatherconditions')
-                       .agg( {'Delivery_person_Ratings' : ['mean','std']} ) )
-            df2.columns = ['weather_mean','weather_std']
-            df2 = df2.reset_index()
-            st.dataframe( df2 )
-
-    with st.container():
-        st.markdown( """---""" )
-        st.title('Velocidade de Entrega')
-
-        col1, col2 = st.columns( 2 )
-        with col1:
-            st.markdown('##### Top Entregadores mais rápidos')
-            df3 = top_delivers( df1, AscendingTrueDescendingFalse=True )
-            st.dataframe( df3 )
-
-        with col2:
-            st.markdown('##### Top Entregadores mais lentos')
-            df3 = top_delivers( df1, AscendingTrueDescendingFalse=False )
-            st.dataframe( df3 )
-
+            col1, col2 = st.columns( 2 )
+            with col1:
+                st.markdown('##### Avaliação média por Entregador')
+                paged_table( visao['avaliacao_entregador'], key='avaliacao_entregador' )
+
+            with col2:
+                st.markdown('##### Avaliação média por Trânsito')
+                st.dataframe( visao['avaliacao_transito'] )
+                #
+                st.markdown('##### Avaliação média por Clima')
+                st.dataframe( visao['avaliacao_clima'] )
+
+        with st.container():
+            st.markdown( """---""" )
+            st.title('Velocidade de Entrega')
+
+            col1, col2 = st.columns( 2 )
+            with col1:
+                st.markdown('##### Top Entregadores mais rápidos')
+                paged_table( visao['mais_rapidos'], key='mais_rapidos' )
+
+            with col2:
+                st.markdown('##### Top Entregadores mais lentos')
+                paged_table( visao['mais_lentos'], key='mais_lentos' )
+
+profile_panel()
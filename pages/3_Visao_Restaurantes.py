@@ -6,132 +6,110 @@
 # Libraries
 import pandas as pd
 import numpy as np
-from haversine import haversine
-import plotly.express as px
 import plotly.graph_objects as go
 import streamlit as st
-from streamlit_folium import folium_static
 from PIL import Image
-import folium
+
+from curry.cube import filtered_cube
+from curry.data import DATA_PATH, file_key
+from curry.index import filtered_rows
+from curry.instrument import stage
+from curry.lazy import lazy_import
+from curry.kpi import compute_kpis, kpi_columns
+from curry.metrics import ( CUBO_RESTAURANTES, KPIS_RESTAURANTES, distance_by_city, filtered_quantiles, moving_time,
+                             time_by_city, time_by_city_order, time_by_city_traffic, time_percentiles, unique_drivers )
+from curry.sketch import load_sketches, slice_sketches, use_sketches
+from curry.table import SortedTable
+from curry.ui import lazy_tabs, memo_por_filtro, paged_table, profile_panel, start_profile
+
+# Importada só quando o gráfico de trânsito é desenhado ( ver curry/lazy.py )
+px = lazy_import( 'plotly.express' )
 
 st.set_page_config( page_title='Visão Restaurantes', page_icon='🍒', layout='wide' )
+# Tempo de cada etapa deste rerun ( ver curry/instrument.py )
+start_profile( 'Visão Restaurantes' )
 
 #------------------------------------------------------------------------------
 # FUNÇÕES
 #------------------------------------------------------------------------------
 
-def clean_data( df1 ):
-    """ Esta função tem a reaponsabilidade de limpar o dataframe
-        Tipos de limpeza:
-        1. Remoção dos dados NaN
-        2. Mudança do tipo da coluna de dados
-        3. Remoção dos espaços das variáveis de texto
-        4. Formatação da coluna de datas
-        5. Limpeza da coluna de tempo ( remoção de texto em variável numérica )
-
-        Input: Dataframe
-        Output: Dataframe
-    """
-    # Limpeza dos dados: Todas as filtragens e conversões de dados necessárias.
-    linhas = ( (df['Delivery_person_Age']!='NaN ') & 
-            (df['Delivery_person_Ratings']!='NaN ') & 
-            (df['Road_traffic_density']!='NaN ') &
-            (df['City']!='NaN ') &
-            (df['multiple_deliveries']!='NaN ') &
-            (df['Weatherconditions']!='conditions NaN')
-            )
-    df1 = df.loc[linhas, :].copy()
-
-    # Removendo os espaços dentro de strings/texto/objects
-    df1.loc[:, 'ID'] = df1.loc[:, 'ID'].str.strip()
-    df1.loc[:, 'Road_traffic_density'] = df1.loc[:, 'Road_traffic_density'].str.strip()
-    df1.loc[:, 'Type_of_order'] = df1.loc[:, 'Type_of_order'].str.strip()
-    df1.loc[:, 'Type_of_vehicle'] = df1.loc[:, 'Type_of_vehicle'].str.strip()
-    df1.loc[:, 'City'] = df1.loc[:, 'City'].str.strip()
-
-    # Converte colunas para int, float, datetime, etc
-    df1['Delivery_person_Age'] = df1['Delivery_person_Age'].astype(int)
-    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype(int)
-    df1['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype(float)
-
-    # Converte o TIME-TAKEN
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].apply( lambda x: x.split( '(min) ' )[1] )
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].astype(int)
-
-    # Converte DATA de string para DateTime
-    df1['Order_Date'] = pd.to_datetime( df1['Order_Date'], format='%d-%m-%Y' )
-
-    return df1
-
-def distance( df1, fig ):
-    # Calculate distances
-    colunas = ['Restaurant_latitude','Restaurant_longitude',
-               'Delivery_location_latitude','Delivery_location_longitude']
-    df1['distance'] = df1.loc[:,colunas].apply( lambda x: 
-                            haversine( 
-                            (x['Restaurant_latitude'],x['Restaurant_longitude']), 
-                            (x['Delivery_location_latitude'],x['Delivery_location_longitude']) ), axis=1 )
-
-    # diferent returns
-    if fig==False:
-        # return distance
-        avg_distance = np.round( df1['distance'].mean(), 2 )
-        return avg_distance
-    else:
-        # return figure
-        avg_distance = df1.loc[:, ['City','distance']].groupby( 'City' ).mean().reset_index()
-        fig = go.Figure( data=[ go.Pie( labels=avg_distance['City'], values=avg_distance['distance'], pull=[0, 0.1, 0] ) ] )
-        return fig
-
-def avg_std_time_delivery( df1, festival, op ):
-    """
-    Esta função calcula o tempo médio e o desvio padrão do tempo de entrega.
-    Parâmetros:
-      Input:
-        - df: Dataframe com os dados necessários para o cálculo
-        - op: Tipo de operação que precisa ser calculada:
-              'avg_time': calcula o tempo médio
-              'std_time': calcula o desvio padrão do tempo
-      Output:
-        - df: Dataframe com 2 colunas e 1 linha.
-    """
-    df2 = (df1.loc[:,['Time_taken(min)', 'Festival']]
-              .groupby('Festival')
-              .agg( { 'Time_taken(min)' : ['mean','std'] } ))
-    df2.columns = ['avg_time', 'std_time']
-    df2 = df2.reset_index()
-    df2 = np.round( df2.loc[df2['Festival'] == festival, op], 2 )
-    return df2
-
-def avg_std_time_graph( df1 ):
-    colunas = ['Time_taken(min)','City']
-    df2 = df1.loc[:, colunas].groupby('City').agg({'Time_taken(min)':['mean','std']})
-    df2.columns = ['avg_time','std_time']
-    df2 = df2.reset_index()
+def distance( cubo ):
+    # A distância já vem calculada da ingestão ( ver curry/geo.py ) e somada
+    # nas células do cubo
+    avg_distance = distance_by_city( cubo )
+    fig = go.Figure( data=[ go.Pie( labels=avg_distance['City'], values=avg_distance['distance'], pull=[0, 0.1, 0] ) ] )
+    return fig
+
+def avg_std_time_graph( cubo ):
+    df2 = time_by_city( cubo )
     fig = go.Figure()
     fig.add_trace( go.Bar( name='Control', x=df2['City'], y=df2['avg_time'], 
                         error_y=dict( type='data', array=df2['std_time'] ) ) )
     fig.update_layout( barmode='group' )
     return fig
 
-def avg_std_time_on_traffic( df1 ):
-    colunas = ['Time_taken(min)', 'City', 'Road_traffic_density']
-    df2 = df1.loc[:, colunas].groupby(['City','Road_traffic_density']).agg({'Time_taken(min)':['mean','std']})
-    df2.columns = ['avg_time','std_time']
-    df2 = df2.reset_index()
+def avg_std_time_on_traffic( cubo ):
+    df2 = time_by_city_traffic( cubo )
     fig = px.sunburst(df2, path=['City','Road_traffic_density'], values='avg_time', 
                     color='std_time', color_continuous_scale='RdBu', 
                     color_continuous_midpoint=np.average(df2['std_time']))
     return fig
 
+def avg_time_moving( cubo ):
+    # Janela móvel de 7 dias: cada dia entra e o que expirou sai dos
+    # acumuladores ( ver curry/moments.py )
+    df2 = moving_time( cubo, 7 )
+    fig = px.line( df2, x='date', y='avg_time_7d', error_y='std_time_7d' )
+    return fig
+
+#...... Conteúdo de cada aba, memorizado por estado dos filtros ................
+
+@memo_por_filtro
+def visao_gerencial( date_slider, traffic_options, versao ):
+    # Filtro de dados e de trânsito: busca binária na data e união das posições
+    # de cada nível de trânsito ( ver curry/index.py ), sem varrer as linhas;
+    # com CURRY_BACKEND=sqlite, um WHERE nos índices da base ( curry/store.py )
+    with stage( 'filtro' ):
+        df1 = filtered_rows( COLUNAS, date_slider, traffic_options )
+        # Os mesmos filtros, aplicados às células do cubo e dos sketches de quantis
+        cubo = filtered_cube( *CUBO_RESTAURANTES, date_slider, traffic_options )
+        quantis = filtered_quantiles( date_slider, traffic_options )
+
+    with stage( 'agregacao' ):
+        # Os seis indicadores saem de uma única passada sobre as linhas filtradas.
+        # Com muitas linhas os entregadores únicos vêm dos sketches ( ver
+        # curry/sketch.py ), sem o conjunto de IDs
+        if use_sketches( len( df1 ) ):
+            metricas = { k : m for k, m in KPIS_RESTAURANTES.items() if k != 'delivery_unique' }
+            kpis = compute_kpis( df1, metricas )
+            kpis['delivery_unique'] = unique_drivers(
+                slice_sketches( load_sketches(), date_slider, traffic_options ) )['delivery_unique']
+        else:
+            kpis = compute_kpis( df1, KPIS_RESTAURANTES, partition='Delivery_person_ID' )
+        return {
+            'kpis' : kpis,
+            'tempo_cidade' : avg_std_time_graph( cubo ),
+            # Paginada e ordenada no servidor ( ver curry/table.py )
+            'tempo_cidade_pedido' : SortedTable( time_by_city_order( cubo ).set_axis(
+                ['City','Type_of_order','TimeTaken_mean','TimeTaken_std'], axis=1 ) ),
+            'distancia_cidade' : distance( cubo ),
+            'tempo_transito' : avg_std_time_on_traffic( cubo ),
+            'tempo_movel' : avg_time_moving( cubo ),
+            # Cauda do tempo de entrega ( p90 / p99 ) por cidade e trânsito
+            'percentis_tempo' : time_percentiles( quantis, ['City','Road_traffic_density'] ),
+        }
+
 
 #------------------------------------------------------------------------------
 # ..... VISÃO RESTAURANTES ..... (ver Aula 41)
 #------------------------------------------------------------------------------
 
-# Read dataset
-df = pd.read_csv('train.csv')
-df1 = clean_data( df )
+# Read dataset ( limpo e em cache: ver curry/data.py )
+# Colunas usadas por esta página ( o snapshot só materializa estas ): as dos
+# indicadores do cabeçalho "Overall Metrics" ( ver curry/metrics.py )
+COLUNAS = kpi_columns( KPIS_RESTAURANTES )
+# Versão do arquivo: faz parte da chave do que é memorizado por aba
+versao = file_key( DATA_PATH )
 
 #...... Barra Lateral no Streamlit ............................................
 st.header('Marketplace - Visão Restaurantes')
@@ -161,80 +139,73 @@ st.sidebar.markdown("""---""")
 
 st.sidebar.markdown('### Powered by Comunidade DS')
 
-# .......... Criação dos filtros para ligar o Dashboard à base de dados
-# Filtro de dados
-linhas_selecionadas = df1['Order_Date'] < date_slider
-df1 = df1.loc[linhas_selecionadas, :]
-
-# Filtro de trânsito
-linhas_selecionadas = df1['Road_traffic_density'].isin( traffic_options )
-df1 = df1.loc[linhas_selecionadas, :]
-
-#st.dataframe( df1 )
+# .......... Os filtros ligam o Dashboard à base de dados dentro das funções de cada aba
+traffic_options = tuple( traffic_options )
 
 #------------------------------------------------------------------------------
 #...... Layout no Streamlit ...................................................
 #------------------------------------------------------------------------------
-tab1, tab2, tab3 = st.tabs( ['Visão Gerencial', '_', '_'] )
+# Só a aba selecionada é calculada ( ver curry/ui.py )
+aba = lazy_tabs( ['Visão Gerencial', '_', '_'], key='aba_restaurantes' )
+
+if aba == 'Visão Gerencial':
+    with stage( 'visao_gerencial' ):
+        visao = visao_gerencial( date_slider, traffic_options, versao )
+    with stage( 'render' ):
+        kpis = visao['kpis']
+        with st.container():
+            st.title('Overall Metrics')
+
+            col1, col2, col3, col4, col5, col6 = st.columns(6)
+            with col1:
+                col1.metric( 'Entregadores únicos', kpis['delivery_unique'] )
 
-with tab1:
-    with st.container():
-        st.title('Overall Metrics')
+            with col2:
+                col2.metric( 'A distância média das entregas', np.round( kpis['avg_distance'], 2 ) )
 
-        col1, col2, col3, col4, col5, col6 = st.columns(6)
-        with col1:
-            delivery_unique = len( df1.loc[:, 'Delivery_person_ID'].unique() )  
-            col1.metric( 'Entregadores únicos', delivery_unique )
+            with col3:
+                col3.metric( 'Tempo Médio de Entrega c/ Festival', np.round( kpis['avg_time_festival'], 2 ) )
 
-        with col2:
-            avg_distance = distance( df1, fig=False )
-            col2.metric( 'A distância média das entregas', avg_distance )
+            with col4:
+                col4.metric( 'STD Entrega c/ Festival', np.round( kpis['std_time_festival'], 2 ) )
 
-        with col3:
-            #col3.dataframe(df2)
-            df2 = avg_std_time_delivery( df1, 'Yes ', 'avg_time' )
-            col3.metric( 'Tempo Médio de Entrega c/ Festival', df2 )
+            with col5:
+                col5.metric( 'Tempo Médio de Entrega s/ Festival', np.round( kpis['avg_time_no_festival'], 2 ) )
 
-        with col4:
-            df2 = avg_std_time_delivery( df1, 'Yes ', 'std_time' )
-            col4.metric( 'STD Entrega c/ Festival', df2 )
+            with col6:
+                col6.metric( 'STD Entrega s/ Festival', np.round( kpis['std_time_no_festival'], 2 ) )
 
-        with col5:
-            df2 = avg_std_time_delivery( df1, 'No ', 'avg_time' )
-            col5.metric( 'Tempo Médio de Entrega s/ Festival', df2 )
+        with st.container():
+            st.markdown("""---""")
 
-        with col6:
-            df2 = avg_std_time_delivery( df1, 'No ', 'std_time' )
-            col6.metric( 'STD Entrega s/ Festival', df2 )
+            col1, col2 = st.columns( 2 )
 
-    with st.container():
-        st.markdown("""---""")
+            with col1:
+                st.plotly_chart( visao['tempo_cidade'], use_container_width=True )
 
-        col1, col2 = st.columns( 2 )
+            with col2:
+                paged_table( visao['tempo_cidade_pedido'], key='tempo_cidade_pedido' )
 
-        with col1:
-            fig = avg_std_time_graph( df1 )
-            st.plotly_chart( fig, use_container_width=True )
+        with st.container():
+            st.markdown("""---""")
+            st.title('Distribuição do tempo')
 
-        with col2:
-            colunas = ['Time_taken(min)', 'City', 'Type_of_order']
-            df2 = (df1.loc[:, colunas].groupby(['City','Type_of_order'])
-                                    .agg({'Time_taken(min)':['mean','std']}))
-            df2.columns = ['TimeTaken_mean','TimeTaken_std']
-            df2 = df2.reset_index()
-            st.dataframe( df2 )
+            col1, col2 = st.columns( 2 )
 
-    with st.container():
-        st.markdown("""---""")
-        st.title('Distribuição do tempo')
+            with col1:
+                st.plotly_chart( visao['distancia_cidade'], use_container_width=True )
 
-        col1, col2 = st.columns( 2 )
+            with col2:
+                st.plotly_chart( visao['tempo_transito'], use_container_width=True )
 
-        with col1:
-            fig = distance( df1, fig=True)
-            st.plotly_chart( fig, use_container_width=True )
+        with st.container():
+            st.markdown("""---""")
+            st.title('Tempo médio de entrega, janela de 7 dias')
+            st.plotly_chart( visao['tempo_movel'], use_container_width=True )
 
-        with col2:
-            fig = avg_std_time_on_traffic( df1 )
-            st.plotly_chart( fig, use_container_width=True )
+        with st.container():
+            st.markdown("""---""")
+            st.title('Percentis do tempo de entrega')
+            st.dataframe( visao['percentis_tempo'], use_container_width=True )
 
+profile_panel()